@@ -0,0 +1,14 @@
+#!/bin/sh
+
+set -e
+
+# Figure out abspath of this script
+SCRIPT=$(readlink -f "$0")
+SCRIPTPATH=$(dirname "$SCRIPT")
+
+# wait for required services
+${SCRIPTPATH}/wait_for_db.sh
+${SCRIPTPATH}/wait_for_rabbitmq.sh
+
+echo "Starting outbox relay"
+python src/manage.py relay_outbox
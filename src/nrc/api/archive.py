@@ -0,0 +1,357 @@
+"""
+Cold archive of the events and their delivery logs.
+
+The events are written in the order of their primary keys to compressed JSON
+Lines segments, one event with its event responses per line, while they are
+read through a server-side cursor. The index of the archive lists the
+segments with their id and time ranges, so restoring a time range only reads
+the segments overlapping it. Segments and the index are written under a
+temporary name and renamed once complete. Every segment is read in its own
+transaction, an interrupted archive run keeps the completed segments and the
+next run continues after them.
+"""
+import gzip
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from nrc.api.counters import count_responses
+from nrc.api.retention import get_expired_id
+from nrc.datamodel.models import Domain, Event, EventResponse, Subscription
+from nrc.utils.iterators import chunked
+from nrc.utils.json import dumps, loads
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.json"
+
+SEGMENT_SUFFIXES = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+
+
+def open_segment(path: Path, mode: str) -> IO[bytes]:
+    if path.name.endswith(SEGMENT_SUFFIXES["zstd"]):
+        if zstandard is None:
+            raise RuntimeError("zstandard must be installed for zstd segments")
+        return zstandard.open(path, mode)
+
+    return gzip.open(path, mode)
+
+
+def read_index(directory: Path) -> List[dict]:
+    path = directory / INDEX_FILE
+    if not path.exists():
+        return []
+
+    return loads(path.read_bytes())
+
+
+def get_archived_id(directory: Path) -> int:
+    """
+    Return the primary key of the last archived event
+    """
+    return max((segment["last_id"] for segment in read_index(directory)), default=0)
+
+
+def write_index(directory: Path, index: List[dict]) -> None:
+    path = directory / INDEX_FILE
+    temporary = path.with_name(f"{path.name}.tmp")
+    temporary.write_bytes(dumps(index))
+    os.replace(temporary, path)
+
+
+def serialize_events(events: List[Event]) -> Iterator[dict]:
+    responses = {event.pk: [] for event in events}
+    for response in (
+        EventResponse.objects.filter(event_id__in=responses)
+        .order_by("pk")
+        .values(
+            "event_id",
+            "subscription__uuid",
+            "response_status",
+            "exception",
+            "attempt",
+            "created_on",
+        )
+    ):
+        event_id = response.pop("event_id")
+        subscription = response.pop("subscription__uuid")
+        responses[event_id].append(
+            {
+                **response,
+                "subscription": subscription,
+                "created_on": response["created_on"].isoformat(),
+            }
+        )
+
+    for event in events:
+        yield {
+            "id": event.pk,
+            # keeping the microseconds, which the JSON encoder drops
+            "created_on": event.created_on.isoformat(),
+            "domain": event.domain.name,
+            "source": event.source,
+            "cloudevent_id": event.cloudevent_id,
+            "forwarded_msg": event.forwarded_msg,
+            "responses": responses[event.pk],
+        }
+
+
+class Segment:
+    """
+    A segment file which is being written
+    """
+
+    def __init__(self, directory: Path, compression: str):
+        self.directory = directory
+        self.suffix = SEGMENT_SUFFIXES[compression]
+        self.temporary = directory / f"segment{self.suffix}.tmp"
+        self.file = open_segment(self.temporary, "wb")
+        self.count = 0
+        self.first_id = self.last_id = None
+        self.start = self.end = None
+
+    def write(self, record: dict) -> None:
+        self.file.write(dumps(record) + b"\n")
+
+        self.count += 1
+        self.first_id = self.first_id or record["id"]
+        self.last_id = record["id"]
+        # the times are in UTC, so they are ordered as strings
+        self.start = min(self.start or record["created_on"], record["created_on"])
+        self.end = max(self.end or record["created_on"], record["created_on"])
+
+    def close(self) -> dict:
+        """
+        Complete the segment and return its index entry
+        """
+        self.file.close()
+
+        name = f"events-{self.first_id:012d}-{self.last_id:012d}{self.suffix}"
+        os.replace(self.temporary, self.directory / name)
+
+        return {
+            "file": name,
+            "first_id": self.first_id,
+            "last_id": self.last_id,
+            "start": self.start,
+            "end": self.end,
+            "count": self.count,
+        }
+
+
+def archive_events(
+    before: datetime,
+    directory: Path,
+    segment_size: int = None,
+    compression: str = None,
+) -> Tuple[int, int]:
+    """
+    Write the events created before the given time to the archive
+
+    The events which are archived already are skipped, so the archive can be
+    extended by archiving again. The events are not deleted.
+
+    Returns the number of archived events and written segments.
+    """
+    segment_size = segment_size or settings.ARCHIVE_SEGMENT_SIZE
+    compression = compression or settings.ARCHIVE_COMPRESSION
+    chunk_size = settings.ARCHIVE_CHUNK_SIZE
+
+    if compression not in SEGMENT_SUFFIXES:
+        raise ValueError(f"Unknown compression {compression}")
+
+    directory.mkdir(parents=True, exist_ok=True)
+    index = read_index(directory)
+    last_id = get_archived_id(directory)
+    # the events are archived in the order of their primary keys, which is
+    # the order in which they are created
+    expired_id = get_expired_id(before) or 0
+
+    count = 0
+    segments = 0
+
+    while True:
+        segment = None
+
+        # a transaction per segment, so no snapshot is held during the whole
+        # export. Outside of a transaction Postgres would materialize the
+        # whole result of the server-side cursor, instead of streaming it.
+        with transaction.atomic():
+            events = (
+                Event.objects.filter(pk__gt=last_id, pk__lte=expired_id)
+                .select_related("domain")
+                .order_by("pk")[:segment_size]
+                .iterator(chunk_size=chunk_size)
+            )
+
+            for chunk in chunked(events, chunk_size):
+                segment = segment or Segment(directory, compression)
+
+                for record in serialize_events(chunk):
+                    segment.write(record)
+
+        if not segment:
+            break
+
+        index.append(segment.close())
+        write_index(directory, index)
+
+        last_id = segment.last_id
+        count += segment.count
+        segments += 1
+
+    logger.info(f"Archived {count} event(s) in {segments} segment(s)")
+
+    return count, segments
+
+
+def restore_records(records: List[dict]) -> Tuple[int, int]:
+    existing = set(
+        Event.objects.filter(pk__in=[record["id"] for record in records]).values_list(
+            "pk", flat=True
+        )
+    )
+    records = [record for record in records if record["id"] not in existing]
+
+    # the same event might be published again after it was purged
+    published = set(
+        Event.objects.filter(
+            source__in={record["source"] for record in records},
+            cloudevent_id__in={record["cloudevent_id"] for record in records},
+        ).values_list("source", "cloudevent_id")
+    )
+    for record in records:
+        if (record["source"], record["cloudevent_id"]) in published:
+            logger.warning(
+                f"Event {record['id']} is not restored, it was published again"
+            )
+    records = [
+        record
+        for record in records
+        if (record["source"], record["cloudevent_id"]) not in published
+    ]
+
+    domains: Dict[str, Domain] = Domain.objects.in_bulk(
+        {record["domain"] for record in records}, field_name="name"
+    )
+    subscriptions: Dict[str, int] = {
+        str(uuid): pk
+        for uuid, pk in Subscription.objects.filter(
+            uuid__in={
+                response["subscription"]
+                for record in records
+                for response in record["responses"]
+            }
+        ).values_list("uuid", "pk")
+    }
+
+    restored_on = timezone.now()
+    events = []
+    responses = []
+    for record in records:
+        domain = domains.get(record["domain"])
+        if not domain:
+            logger.warning(
+                f"Event {record['id']} is not restored, domain "
+                f"{record['domain']} does not exist"
+            )
+            continue
+
+        events.append(
+            Event(
+                pk=record["id"],
+                created_on=parse_datetime(record["created_on"]),
+                domain=domain,
+                source=record["source"],
+                cloudevent_id=record["cloudevent_id"],
+                forwarded_msg=record["forwarded_msg"],
+                restored_on=restored_on,
+            )
+        )
+
+        # the responses of deleted subscriptions can't be restored
+        responses.extend(
+            EventResponse(
+                event_id=record["id"],
+                subscription_id=subscriptions[response["subscription"]],
+                response_status=response["response_status"],
+                exception=response["exception"],
+                attempt=response["attempt"],
+                created_on=parse_datetime(response["created_on"]),
+            )
+            for response in record["responses"]
+            if response["subscription"] in subscriptions
+        )
+
+    counts = count_responses(responses)
+    for event in events:
+        (
+            event.responses_total,
+            event.responses_succeeded,
+            event.responses_failed,
+        ) = counts.get(event.pk, (0, 0, 0))
+
+    with transaction.atomic():
+        Event.objects.bulk_create(events)
+        EventResponse.objects.bulk_create(responses)
+
+    return len(events), len(responses)
+
+
+def restore_events(
+    directory: Path, start: Optional[datetime] = None, end: Optional[datetime] = None
+) -> Tuple[int, int]:
+    """
+    Restore the archived events created in the given time range, including
+    their event responses
+
+    Events which exist already are skipped, so a time range can be restored
+    again, like events which were published again after they were purged.
+    The restored events are not delivered, and are kept for the retention
+    period from their restoration on.
+
+    Returns the number of restored events and event responses.
+    """
+    chunk_size = settings.ARCHIVE_CHUNK_SIZE
+
+    def in_range(created_on: datetime) -> bool:
+        return (start is None or created_on >= start) and (
+            end is None or created_on < end
+        )
+
+    restored = (0, 0)
+
+    for segment in read_index(directory):
+        if (start and parse_datetime(segment["end"]) < start) or (
+            end and parse_datetime(segment["start"]) >= end
+        ):
+            continue
+
+        with open_segment(directory / segment["file"], "rb") as file:
+            records = (loads(line) for line in file)
+
+            for chunk in chunked(records, chunk_size):
+                counts = restore_records(
+                    [
+                        record
+                        for record in chunk
+                        if in_range(parse_datetime(record["created_on"]))
+                    ]
+                )
+                restored = (restored[0] + counts[0], restored[1] + counts[1])
+
+    logger.info(f"Restored {restored[0]} event(s) from the archive")
+
+    return restored
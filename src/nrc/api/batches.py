@@ -0,0 +1,33 @@
+from typing import Optional
+
+from django.conf import settings
+
+BATCH_CONTENT_TYPE = "application/cloudevents-batch+json"
+
+BATCH_CACHE_KEY_PREFIX = "nrc:batch"
+
+
+class BatchPolicy:
+    """
+    Determines how the events of a subscription are grouped in batches.
+
+    Subscriptions opt in to batched delivery by setting ``batch`` in their
+    protocol settings.
+    """
+
+    def __init__(self, max_size: int, window: int):
+        self.max_size = max_size
+        self.window = window
+
+    @classmethod
+    def from_subscription(cls, subscription) -> Optional["BatchPolicy"]:
+        protocol_settings = subscription.protocol_settings or {}
+        batch_settings = protocol_settings.get("batch")
+
+        if batch_settings is None:
+            return None
+
+        return cls(
+            max_size=batch_settings.get("max_size", settings.BATCH_MAX_SIZE),
+            window=batch_settings.get("window", settings.BATCH_WINDOW),
+        )
@@ -0,0 +1,111 @@
+"""
+Circuit breakers for the sinks of the subscriptions.
+
+A sink which is down would otherwise hold a worker thread for the full request
+timeout for every event. The breaker of a sink opens after a number of
+consecutive failures, after which deliveries are skipped until a single probe
+request succeeds. The state is kept in the cache, so it is shared between the
+workers when the cache is (e.g. Redis).
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+import requests
+
+from nrc.api.sessions import get_origin
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "nrc:circuit-breaker"
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    The delivery is skipped as the circuit breaker of the sink is open
+    """
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of the sinks sharing an origin.
+
+    * closed: requests are made, failures are counted
+    * open: requests are skipped until ``CIRCUIT_BREAKER_RESET_TIMEOUT`` passed
+    * half-open: a single request probes the sink, which closes the breaker
+      when it succeeds and opens it again when it fails
+    """
+
+    def __init__(self, origin: str):
+        self.origin = origin
+        self.failures_key = f"{CACHE_KEY_PREFIX}:{origin}:failures"
+        self.opened_key = f"{CACHE_KEY_PREFIX}:{origin}:opened"
+        self.probe_key = f"{CACHE_KEY_PREFIX}:{origin}:probe"
+
+    @classmethod
+    def for_url(cls, url: str) -> "CircuitBreaker":
+        return cls(get_origin(url))
+
+    @property
+    def enabled(self) -> bool:
+        return settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD > 0
+
+    def allow_request(self) -> bool:
+        if not self.enabled:
+            return True
+
+        opened = cache.get(self.opened_key)
+        if opened is None:
+            return True
+
+        if time.time() - opened < settings.CIRCUIT_BREAKER_RESET_TIMEOUT:
+            return False
+
+        # half-open, only the worker which claims the probe makes a request
+        return cache.add(
+            self.probe_key, True, timeout=settings.CIRCUIT_BREAKER_RESET_TIMEOUT
+        )
+
+    def record_success(self) -> None:
+        if not self.enabled:
+            return
+
+        if cache.get(self.opened_key) is not None:
+            logger.info(f"Closing circuit breaker for {self.origin}")
+
+        cache.delete_many([self.failures_key, self.opened_key, self.probe_key])
+
+    def record_failure(self) -> None:
+        if not self.enabled:
+            return
+
+        cache.add(self.failures_key, 0, timeout=None)
+        try:
+            failures = cache.incr(self.failures_key)
+        except ValueError:
+            # the key was removed by a concurrent success
+            return
+
+        # the cache is unavailable, e.g. Redis errors which are ignored by the
+        # cache backend, so the breaker stays closed
+        if failures is None:
+            return
+
+        if failures >= settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD:
+            if failures == settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD:
+                logger.warning(
+                    f"Opening circuit breaker for {self.origin} after "
+                    f"{failures} consecutive failures"
+                )
+
+            cache.set(self.opened_key, time.time(), timeout=None)
+            cache.delete(self.probe_key)
+
+    def record(self, response_status: int) -> None:
+        # the sink is reachable when it responds with a client error
+        if response_status >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
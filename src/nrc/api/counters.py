@@ -0,0 +1,101 @@
+"""
+Delivery counters of the events.
+
+Every event keeps the number of its event responses, split in successful and
+failed deliveries, so the logviewer lists the events without aggregating the
+responses. The counters are incremented together with storing the responses,
+the backfill computes them from the stored responses.
+"""
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Iterator, Tuple
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Max, Min, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from nrc.api.retries import is_failure
+from nrc.datamodel.models import Event, EventResponse
+
+
+def count_responses(
+    responses: Iterable[EventResponse],
+) -> Dict[int, Tuple[int, int, int]]:
+    """
+    Return the total, succeeded and failed number of responses per event
+    """
+    total, failed = Counter(), Counter()
+    for response in responses:
+        total[response.event_id] += 1
+        failed[response.event_id] += is_failure(response.response_status)
+
+    return {
+        event_id: (count, count - failed[event_id], failed[event_id])
+        for event_id, count in total.items()
+    }
+
+
+def increment_counters(counts: Dict[int, Tuple[int, int, int]]) -> None:
+    """
+    Add the counts of the stored responses to the counters of the events
+    """
+    if not counts:
+        return
+
+    # the events with the same increments are updated at once, which is
+    # usually all of them
+    events = defaultdict(list)
+    for event_id, increments in counts.items():
+        events[increments].append(event_id)
+
+    def update():
+        for (total, succeeded, failed), event_ids in events.items():
+            Event.objects.filter(pk__in=event_ids).update(
+                responses_total=F("responses_total") + total,
+                responses_succeeded=F("responses_succeeded") + succeeded,
+                responses_failed=F("responses_failed") + failed,
+            )
+
+    if len(counts) == 1:
+        update()
+        return
+
+    with transaction.atomic():
+        # lock the events in a fixed order, as concurrent deliveries may
+        # update the same events
+        list(
+            Event.objects.filter(pk__in=counts)
+            .order_by("pk")
+            .select_for_update()
+            .values_list("pk", flat=True)
+        )
+        update()
+
+
+def backfill_counters(batch_size: int) -> Iterator[int]:
+    """
+    Compute the counters of all events from their stored responses, in
+    batches of consecutive primary keys, yielding the number of updated events
+    after every batch
+    """
+
+    def count(condition: Q = Q()) -> Coalesce:
+        responses = (
+            EventResponse.objects.filter(condition, event=OuterRef("pk"))
+            .order_by()
+            .values("event")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return Coalesce(Subquery(responses, output_field=IntegerField()), 0)
+
+    succeeded = Q(response_status__gte=200, response_status__lt=300)
+    bounds = Event.objects.aggregate(first=Min("pk"), last=Max("pk"))
+    if bounds["last"] is None:
+        return
+
+    for start in range(bounds["first"], bounds["last"] + 1, batch_size):
+        yield Event.objects.filter(pk__gte=start, pk__lt=start + batch_size).update(
+            responses_total=count(),
+            responses_succeeded=count(succeeded),
+            responses_failed=count(~succeeded),
+        )
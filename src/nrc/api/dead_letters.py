@@ -0,0 +1,59 @@
+from collections import defaultdict
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+
+from celery import group
+
+from nrc.api.tasks import deliver_to_subscriptions
+from nrc.datamodel.models import DeadLetter
+from nrc.utils.iterators import chunked
+
+
+def redrive(dead_letters: QuerySet, rate: Optional[float] = None) -> int:
+    """
+    Deliver the events of the dead letters again, to the failed subscriptions
+    only.
+
+    The dead letters are removed and the deliveries are scheduled as tasks
+    with at most ``settings.DELIVERY_CHUNK_SIZE`` subscriptions each, so they
+    are processed in parallel by the workers. The tasks are staggered to start
+    at ``rate`` tasks per second, to not overwhelm a sink which just
+    recovered. Deliveries which fail again end up as new dead letters.
+
+    Returns the number of redriven dead letters.
+    """
+    rate = rate or settings.DEAD_LETTER_REDRIVE_RATE
+    chunk_size = settings.DELIVERY_CHUNK_SIZE
+
+    with transaction.atomic():
+        # dead letters which are redriven concurrently are skipped
+        pairs = list(
+            dead_letters.select_for_update(skip_locked=True)
+            .order_by("event_id", "subscription_id")
+            .values_list("pk", "event_id", "subscription_id")
+        )
+
+        if not pairs:
+            return 0
+
+        DeadLetter.objects.filter(pk__in=[pk for pk, *_ in pairs]).delete()
+
+        subscription_ids = defaultdict(list)
+        for _pk, event_id, subscription_id in pairs:
+            subscription_ids[event_id].append(subscription_id)
+
+        tasks = []
+        for event_id, ids in subscription_ids.items():
+            for chunk in chunked(ids, chunk_size):
+                tasks.append(
+                    deliver_to_subscriptions.signature(
+                        (event_id, chunk), countdown=len(tasks) / rate
+                    )
+                )
+
+        group(tasks).apply_async()
+
+    return len(pairs)
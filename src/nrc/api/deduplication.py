@@ -0,0 +1,40 @@
+"""
+Deduplication of the published events.
+
+Producers retry publishing when they time out, while ``source`` + ``id``
+identify an event. The identifiers of recently published events are kept in
+the cache, so a replay is answered without a query. A unique index on the
+events catches the replays which are not in the cache (anymore).
+"""
+import hashlib
+from typing import Iterable, List, Set, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+CACHE_KEY_PREFIX = "nrc:published-event"
+
+EventKey = Tuple[str, str]
+
+
+def get_cache_key(key: EventKey) -> str:
+    source, event_id = key
+    digest = hashlib.sha256(f"{source}\0{event_id}".encode()).hexdigest()
+    return f"{CACHE_KEY_PREFIX}:{digest}"
+
+
+def get_recently_published(keys: Iterable[EventKey]) -> Set[EventKey]:
+    """
+    Return the events of which the publication is remembered in the cache
+    """
+    cache_keys = {get_cache_key(key): key for key in keys}
+    found = cache.get_many(list(cache_keys))
+
+    return {cache_keys[cache_key] for cache_key in found}
+
+
+def remember_published(keys: List[EventKey]) -> None:
+    cache.set_many(
+        {get_cache_key(key): True for key in keys},
+        timeout=settings.EVENT_DEDUPLICATION_TTL,
+    )
@@ -0,0 +1,81 @@
+"""
+In-process cache of the domains by name.
+
+Resolving the domain of a published event costs a dictionary lookup instead of
+a database query. The cache is rebuilt when the domains change, which is
+signalled between processes through a version key in the cache.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+from nrc.datamodel.models import Domain
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = "nrc:domains:version"
+
+_lock = threading.Lock()
+_domains: Optional[Dict[str, Domain]] = None
+_version: Optional[str] = None
+_built_at = 0.0
+
+
+def get_domains_version() -> str:
+    version = cache.get(VERSION_CACHE_KEY)
+
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, uuid4().hex, timeout=None)
+        version = cache.get(VERSION_CACHE_KEY)
+
+    return version
+
+
+def get_domains() -> Dict[str, Domain]:
+    """
+    Return the domains by name, reloading them when they are outdated
+    """
+    global _domains, _version, _built_at
+
+    version = get_domains_version()
+
+    with _lock:
+        if (
+            _domains is None
+            or _version != version
+            or time.monotonic() - _built_at > settings.DOMAIN_CACHE_MAX_AGE
+        ):
+            logger.debug(f"Loading domains {version}")
+            _domains = {domain.name: domain for domain in Domain.objects.all()}
+            _version = version
+            _built_at = time.monotonic()
+
+        return _domains
+
+
+def get_domain(name: str) -> Optional[Domain]:
+    """
+    Return the domain with the given name, or ``None`` if it doesn't exist
+    """
+    global _domains
+
+    domain = get_domains().get(name)
+    if domain is not None:
+        return domain
+
+    # the domain could be created by a process which doesn't share the cache
+    domain = Domain.objects.filter(name=name).first()
+    if domain is not None:
+        with _lock:
+            _domains = None
+
+    return domain
+
+
+def invalidate_domains() -> None:
+    cache.set(VERSION_CACHE_KEY, uuid4().hex, timeout=None)
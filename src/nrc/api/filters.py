@@ -1,3 +1,5 @@
+from typing import List, Tuple
+
 from vng_api_common.filtersets import FilterSet
 
 from nrc.datamodel.models import Domain
@@ -9,6 +11,19 @@ class DomainFilter(FilterSet):
         fields = ("name",)
 
 
+def get_filter_attributes(event_data: dict) -> dict:
+    """
+    Return the event attributes keyed by their lowercased name, as attribute
+    names are matched case-insensitively by the filters.
+    """
+    attributes = {}
+
+    for key, value in event_data.items():
+        attributes.setdefault(key.lower(), value)
+
+    return attributes
+
+
 def get_filter_key(node):
     filter_keys = list(node.keys())
 
@@ -82,9 +97,17 @@ class FilterNode:
     def cast(self):
         return self
 
-    def evaluate(self, event):
+    def compile(self):
+        """
+        Return a predicate for the filter, which is called with the event
+        attributes as returned by `get_filter_attributes`.
+        """
         raise NotImplementedError
 
+    def evaluate(self, event):
+        predicate = self.cast().compile()
+        return predicate(get_filter_attributes(event.forwarded_msg))
+
 
 class ListFilterNode(FilterNode):
     def cast(self):
@@ -112,15 +135,15 @@ class ListFilterNode(FilterNode):
 
 
 class AllFilterNode(ListFilterNode):
-    def evaluate(self, event):
-        filters = self.cast()
-        return all(filter.evaluate(event) for filter in filters)
+    def compile(self):
+        predicates = tuple(filter.compile() for filter in self.cast())
+        return lambda attributes: all(predicate(attributes) for predicate in predicates)
 
 
 class AnyFilterNode(ListFilterNode):
-    def evaluate(self, event):
-        filters = self.cast()
-        return any(filter.evaluate(event) for filter in filters)
+    def compile(self):
+        predicates = tuple(filter.compile() for filter in self.cast())
+        return lambda attributes: any(predicate(attributes) for predicate in predicates)
 
 
 class SimpleFilterNode(FilterNode):
@@ -146,22 +169,12 @@ class NotFilterNode(SimpleFilterNode):
 
         return self
 
-    def evaluate(self, event):
-        return not self.filter.evaluate(event)
+    def compile(self):
+        predicate = self.cast().filter.compile()
+        return lambda attributes: not predicate(attributes)
 
 
 class LeafFilterNode(SimpleFilterNode):
-    def _get_event_attribute(self, event, node_key):
-        event_attribute = None
-        event_data = event.forwarded_msg
-
-        for key in event_data:
-            if key.lower() == node_key.lower():
-                event_attribute = key
-                return event_attribute
-
-        return event_attribute
-
     def cast(self):
         filter = super().cast()
 
@@ -178,64 +191,43 @@ class LeafFilterNode(SimpleFilterNode):
 
         return filter
 
-    def evaluate(self, event):
-        event_data = event.forwarded_msg
-        for key_node in self.node.keys():
-            event_attribute = self._get_event_attribute(event, key_node)
-            if not event_attribute or not type(event_data.get(event_attribute)) is str:
-                return False
-
+    def compare(self, event_value: str, filter_value: str) -> bool:
         return True
 
+    def compile(self):
+        self.cast()
 
-class ExactFilterNode(LeafFilterNode):
-    def evaluate(self, event):
-        evaluated = super().evaluate(event)
-        if not evaluated:
-            return False
-
-        event_data = event.forwarded_msg
-
-        for key_node in self.node.keys():
-            event_attr = self._get_event_attribute(event, key_node)
-            if not event_data[event_attr] == self.node[event_attr]:
-                return False
+        compare = self.compare
+        criteria = tuple((key.lower(), value) for key, value in self.node.items())
 
-        return True
+        def predicate(attributes):
+            for key, filter_value in criteria:
+                event_value = attributes.get(key)
 
+                if not type(event_value) is str:
+                    return False
 
-class PrefixFilterNode(LeafFilterNode):
-    def evaluate(self, event):
-        evaluated = super().evaluate(event)
+                if not compare(event_value, filter_value):
+                    return False
 
-        if not evaluated:
-            return False
+            return True
 
-        event_data = event.forwarded_msg
-        for key_node in self.node.keys():
-            event_attr = self._get_event_attribute(event, key_node)
-            if not event_data[event_attr].startswith(self.node[event_attr]):
-                return False
-
-        return True
+        return predicate
 
 
-class SuffixFilterNode(LeafFilterNode):
-    def evaluate(self, event):
-        evaluated = super().evaluate(event)
-
-        if not evaluated:
-            return False
+class ExactFilterNode(LeafFilterNode):
+    def compare(self, event_value: str, filter_value: str) -> bool:
+        return event_value == filter_value
 
-        event_data = event.forwarded_msg
 
-        for key_node in self.node.keys():
-            event_attr = self._get_event_attribute(event, key_node)
+class PrefixFilterNode(LeafFilterNode):
+    def compare(self, event_value: str, filter_value: str) -> bool:
+        return event_value.startswith(filter_value)
 
-            if not event_data[event_attr].endswith(self.node[event_attr]):
-                return False
 
-        return True
+class SuffixFilterNode(LeafFilterNode):
+    def compare(self, event_value: str, filter_value: str) -> bool:
+        return event_value.endswith(filter_value)
 
 
 FILTER_MAPPING = {
@@ -246,3 +238,56 @@ FILTER_MAPPING = {
     "prefix": PrefixFilterNode,
     "suffix": SuffixFilterNode,
 }
+
+LEAF_LOOKUPS = ("exact", "prefix", "suffix")
+
+
+def get_required_criteria(filters) -> List[Tuple[str, str, str]]:
+    """
+    Return (lookup, attribute, value) criteria which every event matching the
+    filters satisfies, i.e. the leaves directly below the root "all" filter.
+    """
+    criteria = []
+
+    if not type(filters) is list:
+        return criteria
+
+    for node in filters:
+        for lookup, leaf in node.items():
+            if lookup not in LEAF_LOOKUPS or not type(leaf) is dict:
+                continue
+
+            criteria.extend((lookup, key.lower(), value) for key, value in leaf.items())
+
+    return criteria
+
+
+# compiled filters of the subscriptions, keyed by the subscription UUID
+_subscription_predicates = {}
+
+
+def get_subscription_predicate(subscription):
+    """
+    Return the compiled filters of the subscription.
+
+    The predicate is cached until the subscription is updated.
+    """
+    cached = _subscription_predicates.get(subscription.uuid)
+
+    if cached and cached[0] == subscription.last_updated:
+        return cached[1]
+
+    if subscription.filters:
+        predicate = AllFilterNode(subscription.filters).compile()
+    else:
+        predicate = lambda attributes: True  # noqa: E731
+
+    _subscription_predicates[subscription.uuid] = (
+        subscription.last_updated,
+        predicate,
+    )
+    return predicate
+
+
+def clear_subscription_predicate(subscription) -> None:
+    _subscription_predicates.pop(subscription.uuid, None)
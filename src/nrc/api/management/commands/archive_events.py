@@ -0,0 +1,53 @@
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.utils import timezone
+
+from nrc.api.archive import SEGMENT_SUFFIXES, archive_events
+
+
+class Command(BaseCommand):
+    help = "Write the events older than the retention period to the archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Number of days the events are kept in the database",
+        )
+        parser.add_argument(
+            "--directory",
+            type=Path,
+            help="Directory of the archive",
+        )
+        parser.add_argument(
+            "--segment-size",
+            type=int,
+            help="Number of events per segment file",
+        )
+        parser.add_argument(
+            "--compression",
+            choices=list(SEGMENT_SUFFIXES),
+            help="Compression of the segment files",
+        )
+
+    def handle(self, **options):
+        days = options["days"] or settings.EVENT_RETENTION_DAYS
+        if not days:
+            raise CommandError(
+                "No retention period, use --days or set EVENT_RETENTION_DAYS"
+            )
+
+        directory = options["directory"] or Path(settings.ARCHIVE_DIRECTORY)
+        before = timezone.now() - timedelta(days=days)
+
+        count, segments = archive_events(
+            before,
+            directory,
+            segment_size=options["segment_size"],
+            compression=options["compression"],
+        )
+
+        self.stdout.write(f"Archived {count} events in {segments} segments")
@@ -0,0 +1,25 @@
+from django.core.management import BaseCommand
+
+from nrc.api.counters import backfill_counters
+
+
+class Command(BaseCommand):
+    help = "Compute the delivery counters of the events from their responses"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of events updated at once",
+        )
+
+    def handle(self, **options):
+        total = 0
+        for count in backfill_counters(options["batch_size"]):
+            total += count
+
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Updated {total} events")
+
+        self.stdout.write(f"Updated the delivery counters of {total} events")
@@ -0,0 +1,78 @@
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.utils import timezone
+
+from nrc.api.archive import get_archived_id
+from nrc.api.retention import purge_events
+
+
+class Command(BaseCommand):
+    help = "Delete the events older than the retention period and their delivery logs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Number of days the events are kept",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Number of events deleted at once",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Number of seconds between the batches",
+        )
+        parser.add_argument(
+            "--archived-only",
+            action="store_true",
+            help="Only purge the events which are written to the archive",
+        )
+        parser.add_argument(
+            "--archive-directory",
+            type=Path,
+            help="Directory of the archive, implies --archived-only",
+        )
+
+    def handle(self, **options):
+        days = options["days"] or settings.EVENT_RETENTION_DAYS
+        if not days:
+            raise CommandError(
+                "No retention period, use --days or set EVENT_RETENTION_DAYS"
+            )
+
+        before = timezone.now() - timedelta(days=days)
+
+        self.stdout.write(f"Purging the events created before {before.isoformat()}")
+
+        archived_id = None
+        if options["archived_only"] or options["archive_directory"]:
+            directory = options["archive_directory"] or Path(settings.ARCHIVE_DIRECTORY)
+            archived_id = get_archived_id(directory)
+
+            self.stdout.write(f"Purging the events archived in {directory}")
+
+        events = event_responses = 0
+        for progress in purge_events(
+            before,
+            batch_size=options["batch_size"],
+            interval=options["interval"],
+            archived_id=archived_id,
+        ):
+            events += progress.events
+            event_responses += progress.event_responses
+
+            if options["verbosity"] > 1:
+                self.stdout.write(
+                    f"Purged {events} events and {event_responses} event "
+                    f"responses ({progress.done:.0%})"
+                )
+
+        self.stdout.write(
+            f"Purged {events} events and {event_responses} event responses"
+        )
@@ -0,0 +1,40 @@
+from django.core.management import BaseCommand
+
+from nrc.api.dead_letters import redrive
+from nrc.datamodel.models import DeadLetter
+
+
+class Command(BaseCommand):
+    help = "Deliver the events of dead letters again to the failed subscriptions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--subscription",
+            action="append",
+            dest="subscriptions",
+            metavar="UUID",
+            help="Only redrive the dead letters of this subscription",
+        )
+        parser.add_argument(
+            "--sink",
+            help="Only redrive the dead letters of subscriptions with this sink",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            help="Number of delivery tasks scheduled per second",
+        )
+
+    def handle(self, **options):
+        dead_letters = DeadLetter.objects.all()
+
+        if options["subscriptions"]:
+            dead_letters = dead_letters.filter(
+                subscription__uuid__in=options["subscriptions"]
+            )
+        if options["sink"]:
+            dead_letters = dead_letters.filter(subscription__sink=options["sink"])
+
+        count = redrive(dead_letters, rate=options["rate"])
+
+        self.stdout.write(f"Redriving {count} dead letters")
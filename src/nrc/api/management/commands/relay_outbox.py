@@ -0,0 +1,36 @@
+from django.core.management import BaseCommand
+
+from nrc.api.outbox import relay_outbox, run_relay
+
+
+class Command(BaseCommand):
+    help = "Publish the events in the outbox to the broker"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Publish the events currently in the outbox and stop",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Number of seconds between polls of an empty outbox",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Number of events published at once",
+        )
+
+    def handle(self, **options):
+        if not options["once"]:
+            self.stdout.write("Relaying the outbox")
+            run_relay(interval=options["interval"], batch_size=options["batch_size"])
+            return
+
+        total = 0
+        while count := relay_outbox(options["batch_size"]):
+            total += count
+
+        self.stdout.write(f"Published {total} events")
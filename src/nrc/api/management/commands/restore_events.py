@@ -0,0 +1,50 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from nrc.api.archive import restore_events
+
+
+def parse_time(value: str):
+    time = parse_datetime(value) or parse_datetime(f"{value}T00:00:00")
+    if not time:
+        raise ValueError(value)
+
+    return time if timezone.is_aware(time) else timezone.make_aware(time)
+
+
+class Command(BaseCommand):
+    help = "Restore the archived events of a time range"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--directory",
+            type=Path,
+            help="Directory of the archive",
+        )
+        parser.add_argument(
+            "--start",
+            type=parse_time,
+            help="Restore the events created from this date or time on",
+        )
+        parser.add_argument(
+            "--end",
+            type=parse_time,
+            help="Restore the events created before this date or time",
+        )
+
+    def handle(self, **options):
+        directory = options["directory"] or Path(settings.ARCHIVE_DIRECTORY)
+        if not directory.is_dir():
+            raise CommandError(f"Archive {directory} does not exist")
+
+        events, event_responses = restore_events(
+            directory, start=options["start"], end=options["end"]
+        )
+
+        self.stdout.write(
+            f"Restored {events} events and {event_responses} event responses"
+        )
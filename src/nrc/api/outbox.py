@@ -0,0 +1,64 @@
+"""
+Relay of the transactional outbox.
+
+The events are stored together with an outbox entry in a single transaction, so
+publishing an event doesn't depend on the broker. The relay publishes the
+entries to the broker in batches and removes them afterwards. The delivery is
+at least once: an event is published again when the relay is stopped between
+publishing and committing.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from celery import group
+
+from nrc.api.tasks import deliver_message
+from nrc.datamodel.models import OutboxEntry
+
+logger = logging.getLogger(__name__)
+
+
+def relay_outbox(batch_size: int = None) -> int:
+    """
+    Publish a batch of outbox entries to the broker
+
+    Returns the number of published entries.
+    """
+    batch_size = batch_size or settings.OUTBOX_RELAY_BATCH_SIZE
+
+    with transaction.atomic():
+        # entries which are published by a concurrent relay are skipped
+        entries = list(
+            OutboxEntry.objects.select_for_update(skip_locked=True)
+            .order_by("pk")
+            .values_list("pk", "event_id")[:batch_size]
+        )
+
+        if not entries:
+            return 0
+
+        # the tasks are sent over a single connection
+        group(deliver_message.s(event_id) for _pk, event_id in entries).apply_async()
+
+        OutboxEntry.objects.filter(pk__in=[pk for pk, _event_id in entries]).delete()
+
+    logger.debug(f"Published {len(entries)} event(s) from the outbox")
+
+    return len(entries)
+
+
+def run_relay(interval: float = None, batch_size: int = None) -> None:
+    """
+    Publish the outbox entries until stopped, polling every ``interval`` seconds
+    when the outbox is empty
+    """
+    interval = interval or settings.OUTBOX_RELAY_INTERVAL
+    batch_size = batch_size or settings.OUTBOX_RELAY_BATCH_SIZE
+
+    while True:
+        # continue directly when there might be more entries
+        if relay_outbox(batch_size) < batch_size:
+            time.sleep(interval)
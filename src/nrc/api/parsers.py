@@ -1,4 +1,47 @@
-from djangorestframework_camel_case.parser import CamelCaseJSONParser
+from django.conf import settings
+
+from djangorestframework_camel_case.settings import api_settings
+from djangorestframework_camel_case.util import underscoreize
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from nrc.utils.json import loads
+
+
+class JSONParser(parsers.JSONParser):
+    """
+    Parses JSON through the fast JSON backend
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+
+        data = stream.read()
+
+        if encoding.lower().replace("-", "") != "utf8":
+            data = data.decode(encoding)
+
+        try:
+            return loads(data)
+        except ValueError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
+
+
+class CloudEventsBatchParser(JSONParser):
+    """
+    Parses a batch of events in the CloudEvents JSON batch format
+    """
+
+    media_type = "application/cloudevents-batch+json"
+
+
+class CamelCaseJSONParser(JSONParser):
+    json_underscoreize = api_settings.JSON_UNDERSCOREIZE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        data = super().parse(stream, media_type, parser_context)
+        return underscoreize(data, **self.json_underscoreize)
 
 
 class SubscriptionParser(CamelCaseJSONParser):
@@ -0,0 +1,24 @@
+from rest_framework import renderers
+
+from nrc.utils.json import dumps
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    Renders compact JSON through the fast JSON backend
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+
+        if data is None or indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = dumps(data, default=self.encoder_class().default)
+
+        # escape the line and paragraph separators like the DRF renderer, so the
+        # output is a strict javascript subset
+        return ret.replace("\u2028".encode(), b"\\u2028").replace(
+            "\u2029".encode(), b"\\u2029"
+        )
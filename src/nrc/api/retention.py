@@ -0,0 +1,132 @@
+"""
+Retention of the events and their delivery logs.
+
+The expired events are deleted in batches of consecutive primary keys, each
+batch together with its delivery logs in a short transaction of its own. The
+rows are deleted directly in the database, without loading them for the
+cascade, and the database is given room between the batches. A purge which is
+stopped is resumed by running it again, as it starts at the oldest remaining
+event.
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Iterator, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+
+from nrc.datamodel.models import (
+    DeadLetter,
+    Event,
+    EventResponse,
+    OutboxEntry,
+    PendingDelivery,
+)
+
+logger = logging.getLogger(__name__)
+
+# the models referring to the events, which are deleted before the events
+EVENT_RELATED_MODELS = (EventResponse, DeadLetter, PendingDelivery, OutboxEntry)
+
+
+def get_expired_id(before: datetime) -> Optional[int]:
+    """
+    Return the primary key of the last event created before the given time
+
+    The events are created in the order of their primary keys, so the event
+    is found with a binary search over the primary key index instead of
+    scanning the creation times.
+    """
+    bounds = Event.objects.aggregate(first=Min("pk"), last=Max("pk"))
+    if bounds["last"] is None:
+        return None
+
+    def is_expired(pk: int) -> bool:
+        created_on = (
+            Event.objects.filter(pk__gte=pk)
+            .order_by("pk")
+            .values_list("created_on", flat=True)
+            .first()
+        )
+        return created_on < before
+
+    # the events before the low bound are expired, from the high bound on not
+    low, high = bounds["first"], bounds["last"] + 1
+    while low < high:
+        middle = (low + high) // 2
+        if is_expired(middle):
+            low = middle + 1
+        else:
+            high = middle
+
+    return Event.objects.filter(pk__lt=low).aggregate(last=Max("pk"))["last"]
+
+
+class PurgeProgress(NamedTuple):
+    events: int
+    event_responses: int
+    # fraction of the primary key range of the expired events which is purged
+    done: float
+
+
+def purge_events(
+    before: datetime,
+    batch_size: int = None,
+    interval: float = None,
+    archived_id: Optional[int] = None,
+) -> Iterator[PurgeProgress]:
+    """
+    Delete the events created before the given time, including their delivery
+    logs, yielding the progress after every batch
+
+    The purge stops at the last event created before the given time, events
+    are assumed to be created in the order of their primary keys. With
+    ``archived_id`` it also stops at the last archived event, so no events
+    are lost which are not archived yet. Restored events are kept until they
+    were restored before the given time.
+    """
+    batch_size = batch_size or settings.EVENT_PURGE_BATCH_SIZE
+    interval = settings.EVENT_PURGE_INTERVAL if interval is None else interval
+
+    last = get_expired_id(before)
+    if archived_id is not None and last is not None:
+        last = min(last, archived_id)
+
+    first = Event.objects.aggregate(first=Min("pk"))["first"]
+    if last is None or first > last:
+        return
+
+    for start in range(first, last + 1, batch_size):
+        end = min(start + batch_size, last + 1)
+
+        with transaction.atomic():
+            # the events restored from the archive recently are kept
+            kept = list(
+                Event.objects.filter(
+                    pk__gte=start, pk__lt=end, restored_on__gte=before
+                ).values_list("pk", flat=True)
+            )
+
+            counts = {}
+            for model in EVENT_RELATED_MODELS:
+                related = model.objects.filter(
+                    event_id__gte=start, event_id__lt=end
+                ).exclude(event_id__in=kept)
+                counts[model] = related._raw_delete(related.db)
+
+            # nothing refers to the events anymore, so the cascade is skipped
+            events = Event.objects.filter(pk__gte=start, pk__lt=end).exclude(
+                pk__in=kept
+            )
+            counts[Event] = events._raw_delete(events.db)
+
+        logger.debug(f"Purged events {start} up to {end}")
+
+        yield PurgeProgress(
+            counts[Event], counts[EventResponse], (end - first) / (last + 1 - first)
+        )
+
+        if end <= last and interval:
+            time.sleep(interval)
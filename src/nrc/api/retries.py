@@ -0,0 +1,64 @@
+import random
+
+from django.conf import settings
+
+# status codes of temporary failures, besides the 5xx server errors
+RETRY_STATUS_CODES = (408, 429)
+
+
+def is_failure(response_status: int = None) -> bool:
+    """
+    Check if a delivery failed, without a response status when no response was
+    received at all
+    """
+    return response_status is None or not 200 <= response_status < 300
+
+
+class RetryPolicy:
+    """
+    Determines if and when a failed delivery to a subscription is retried.
+
+    The delay doubles with every attempt, with a random jitter so the retries
+    for a sink which failed for many events are spread out.
+    """
+
+    def __init__(self, max_retries: int, backoff: int, backoff_max: int):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+
+    @classmethod
+    def from_subscription(cls, subscription) -> "RetryPolicy":
+        protocol_settings = subscription.protocol_settings or {}
+        retry_settings = protocol_settings.get("retry") or {}
+
+        return cls(
+            max_retries=retry_settings.get(
+                "max_retries", settings.DELIVERY_MAX_RETRIES
+            ),
+            backoff=retry_settings.get("backoff", settings.DELIVERY_RETRY_BACKOFF),
+            backoff_max=retry_settings.get(
+                "backoff_max", settings.DELIVERY_RETRY_BACKOFF_MAX
+            ),
+        )
+
+    def should_retry(self, attempt: int, response_status: int = None) -> bool:
+        """
+        Check if the delivery should be retried after the given attempt failed,
+        without a response status when no response was received at all.
+        """
+        if attempt > self.max_retries:
+            return False
+
+        return (
+            response_status is None
+            or response_status in RETRY_STATUS_CODES
+            or response_status >= 500
+        )
+
+    def get_delay(self, attempt: int) -> float:
+        """
+        Return the number of seconds to wait before retrying the given attempt
+        """
+        delay = min(self.backoff_max, self.backoff * 2 ** (attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
@@ -0,0 +1,292 @@
+"""
+In-process routing index of the subscriptions.
+
+Finding the candidate subscriptions of an event costs a few dictionary lookups
+instead of a database query. The index is rebuilt when the subscriptions or
+domains change, which is signalled between processes through a version key in
+the cache.
+"""
+import logging
+import threading
+import time
+from functools import lru_cache
+from itertools import product
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+from celery.signals import worker_process_init
+
+from nrc.api.filters import (
+    get_filter_attributes,
+    get_required_criteria,
+    get_subscription_predicate,
+)
+from nrc.datamodel.choices import VerificationStatusChoices
+from nrc.datamodel.models import Event, Subscription
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = "nrc:subscription-index:version"
+
+RouteKey = Tuple[Optional[int], Optional[str], Optional[str]]
+
+
+@lru_cache(maxsize=None)
+def get_event_fields() -> FrozenSet[str]:
+    from nrc.api.serializers import EventSerializer
+
+    return frozenset(EventSerializer().fields)
+
+
+def _never(attributes: dict) -> bool:
+    return False
+
+
+class Route:
+    """
+    The routing information of a single subscription
+    """
+
+    __slots__ = (
+        "pk",
+        "uuid",
+        "created_on",
+        "filter_attributes",
+        "predicate",
+        "criteria",
+    )
+
+    def __init__(self, subscription: Subscription):
+        self.pk = subscription.pk
+        self.uuid = subscription.uuid
+        self.created_on = subscription.created_on
+        self.filter_attributes = frozenset(
+            subscription.domain.filter_attributes if subscription.domain else ()
+        )
+
+        try:
+            self.predicate = get_subscription_predicate(subscription)
+        except ValueError:
+            logger.exception(f"Invalid filters for subscription {subscription.uuid}")
+            self.predicate = _never
+            # the criteria of invalid filters may not be indexable
+            self.criteria = []
+        else:
+            self.criteria = get_required_criteria(subscription.filters)
+
+
+class Trie:
+    """
+    Maps strings to routes, a single walk over a value yields the routes of all
+    the strings which are a prefix of that value.
+    """
+
+    def __init__(self):
+        # the routes of a string are stored under the `None` key of its node
+        self.root = {}
+
+    def add(self, key: str, route: Route) -> None:
+        node = self.root
+
+        for char in key:
+            node = node.setdefault(char, {})
+
+        node.setdefault(None, []).append(route)
+
+    def get_prefixes(self, value: str) -> Iterable[Route]:
+        node = self.root
+        yield from node.get(None, ())
+
+        for char in value:
+            node = node.get(char)
+
+            if node is None:
+                return
+
+            yield from node.get(None, ())
+
+
+class RouteBucket:
+    """
+    The routes sharing a routing key.
+
+    Routes with an "exact", "prefix" or "suffix" filter leaf directly below the
+    root filter are indexed on the attribute and value of that leaf, so only
+    the routes of which the criterion matches the event are evaluated. Suffixes
+    are stored reversed, in a trie of their own.
+    """
+
+    def __init__(self):
+        self.routes: List[Route] = []
+        self.exact: Dict[str, Dict[str, List[Route]]] = {}
+        self.prefixes: Dict[str, Trie] = {}
+        self.suffixes: Dict[str, Trie] = {}
+
+    def add(self, route: Route) -> None:
+        # the first criterion of every lookup
+        criteria = {
+            lookup: (attribute, value)
+            for lookup, attribute, value in reversed(route.criteria)
+        }
+
+        if "exact" in criteria:
+            attribute, value = criteria["exact"]
+            values = self.exact.setdefault(attribute, {})
+            values.setdefault(value, []).append(route)
+        elif "prefix" in criteria:
+            attribute, value = criteria["prefix"]
+            self.prefixes.setdefault(attribute, Trie()).add(value, route)
+        elif "suffix" in criteria:
+            attribute, value = criteria["suffix"]
+            self.suffixes.setdefault(attribute, Trie()).add(value[::-1], route)
+        else:
+            self.routes.append(route)
+
+    def get_candidates(self, attributes: dict) -> Iterable[Route]:
+        yield from self.routes
+
+        for attribute, values in self.exact.items():
+            value = attributes.get(attribute)
+
+            if type(value) is str:
+                yield from values.get(value, ())
+
+        for attribute, trie in self.prefixes.items():
+            value = attributes.get(attribute)
+
+            if type(value) is str:
+                yield from trie.get_prefixes(value)
+
+        for attribute, trie in self.suffixes.items():
+            value = attributes.get(attribute)
+
+            if type(value) is str:
+                yield from trie.get_prefixes(value[::-1])
+
+
+class SubscriptionIndex:
+    """
+    Maps (domain, type, source) to the subscriptions, where `None` is used as
+    key for subscriptions which do not restrict on that attribute.
+    """
+
+    def __init__(self, subscriptions: Iterable[Subscription], version: str = None):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.buckets: Dict[RouteKey, RouteBucket] = {}
+
+        for subscription in subscriptions:
+            self.add(subscription)
+
+    def add(self, subscription: Subscription) -> None:
+        route = Route(subscription)
+
+        for type in set(subscription.types or [None]):
+            key = (subscription.domain_id, type, subscription.source)
+
+            if key not in self.buckets:
+                self.buckets[key] = RouteBucket()
+
+            self.buckets[key].add(route)
+
+    def get_candidates(self, event: Event, attributes: dict) -> Iterable[Route]:
+        keys = product(
+            (event.domain_id, None),
+            (event.forwarded_msg["type"], None),
+            (event.forwarded_msg["source"], None),
+        )
+
+        for key in keys:
+            if key in self.buckets:
+                yield from self.buckets[key].get_candidates(attributes)
+
+    def match(self, event: Event) -> List[Route]:
+        """
+        Return the routes of the subscriptions which should receive the event
+        """
+        event_fields = get_event_fields()
+        custom_attributes = {
+            field for field in event.forwarded_msg if not field in event_fields
+        }
+        event_attributes = get_filter_attributes(event.forwarded_msg)
+
+        routes = []
+
+        for route in self.get_candidates(event, event_attributes):
+            if route.filter_attributes and not custom_attributes.issubset(
+                route.filter_attributes
+            ):
+                logger.debug(
+                    f"Skipping subscription {route.uuid}, filter attributes do not match"
+                )
+                continue
+
+            if not route.predicate(event_attributes):
+                logger.debug(
+                    f"Skipping subscription {route.uuid}, custom filter does not match"
+                )
+                continue
+
+            routes.append(route)
+
+        return sorted(routes, key=lambda route: route.created_on, reverse=True)
+
+
+_lock = threading.Lock()
+_index: Optional[SubscriptionIndex] = None
+
+
+def get_index_version() -> str:
+    version = cache.get(VERSION_CACHE_KEY)
+
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, uuid4().hex, timeout=None)
+        version = cache.get(VERSION_CACHE_KEY)
+
+    return version
+
+
+def build_subscription_index(version: str = None) -> SubscriptionIndex:
+    subscriptions = (
+        Subscription.objects.filter(
+            verification_status=VerificationStatusChoices.verified
+        )
+        .select_related("domain")
+        .iterator()
+    )
+    return SubscriptionIndex(subscriptions, version=version)
+
+
+def get_subscription_index() -> SubscriptionIndex:
+    """
+    Return the routing index of this process, rebuilding it when it is outdated
+    """
+    global _index
+
+    version = get_index_version()
+
+    with _lock:
+        if (
+            _index is None
+            or _index.version != version
+            or time.monotonic() - _index.built_at > settings.ROUTING_INDEX_MAX_AGE
+        ):
+            logger.debug(f"Building subscription index {version}")
+            _index = build_subscription_index(version)
+
+        return _index
+
+
+def invalidate_subscription_index() -> None:
+    cache.set(VERSION_CACHE_KEY, uuid4().hex, timeout=None)
+
+
+@worker_process_init.connect
+def warm_subscription_index(**kwargs):
+    try:
+        get_subscription_index()
+    except Exception:
+        logger.exception("Could not build the subscription index")
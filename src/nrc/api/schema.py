@@ -1,6 +1,7 @@
 from django.conf import settings
 
 from drf_yasg import openapi
+from vng_api_common.generators import OpenAPISchemaGenerator as _OpenAPISchemaGenerator
 
 description = f"""
 The API consists of three parts:
@@ -21,3 +22,25 @@ info = openapi.Info(
         name="EUPL 1.2", url="https://opensource.org/licenses/EUPL-1.2"
     ),
 )
+
+
+class OpenAPISchemaGenerator(_OpenAPISchemaGenerator):
+    def get_schema(self, request=None, public=False):
+        """
+        Only list the tags of the operations
+
+        The tags are named after the last segment of the paths, which for
+        actions like ``/events/batch`` is not a resource.
+        """
+        schema = super().get_schema(request, public)
+
+        used = {
+            tag
+            for path in schema.paths.values()
+            for operation in path.values()
+            if isinstance(operation, openapi.Operation)
+            for tag in operation.tags
+        }
+        schema.tags = [tag for tag in schema.tags if tag["name"] in used]
+
+        return schema
@@ -1,7 +1,12 @@
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.utils.translation import ugettext_lazy as _
 
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
 from vng_api_common.validators import URLValidator
 
 from nrc.api.choices import (
@@ -11,9 +16,13 @@ from nrc.api.choices import (
     SequencetypeChoices,
     SpecVersionChoices,
 )
-from nrc.api.tasks import deliver_message
-from nrc.api.validators import Base64Validator, CallbackURLValidator, FilterValidator
-from nrc.datamodel.models import Domain, Event, Subscription
+from nrc.api.deduplication import get_recently_published, remember_published
+from nrc.api.domains import get_domain
+from nrc.api.tasks import verify_sink
+from nrc.api.validators import Base64Validator, FilterValidator
+from nrc.api.verification import get_verification_key
+from nrc.datamodel.choices import VerificationStatusChoices
+from nrc.datamodel.models import Domain, Event, OutboxEntry, Subscription
 
 
 class DomainSerializer(serializers.ModelSerializer):
@@ -34,6 +43,58 @@ class DomainSerializer(serializers.ModelSerializer):
         }
 
 
+class RetrySettingsSerializer(serializers.Serializer):
+    max_retries = serializers.IntegerField(
+        min_value=0,
+        max_value=25,
+        required=False,
+        help_text=_("Maximum number of times a failed delivery is retried."),
+    )
+    backoff = serializers.IntegerField(
+        min_value=1,
+        required=False,
+        help_text=_(
+            "Delay in seconds before the first retry, which is doubled for every "
+            "next retry."
+        ),
+    )
+    backoff_max = serializers.IntegerField(
+        min_value=1,
+        required=False,
+        help_text=_("Maximum delay in seconds between two retries."),
+    )
+
+
+class ThrottleSettingsSerializer(serializers.Serializer):
+    max_concurrency = serializers.IntegerField(
+        min_value=1,
+        required=False,
+        help_text=_("Maximum number of concurrent requests to the sink."),
+    )
+    rate = serializers.IntegerField(
+        min_value=1,
+        required=False,
+        help_text=_("Maximum number of requests per second to the sink."),
+    )
+
+
+class BatchSettingsSerializer(serializers.Serializer):
+    max_size = serializers.IntegerField(
+        min_value=1,
+        max_value=1000,
+        required=False,
+        help_text=_("Maximum number of events in a batch."),
+    )
+    window = serializers.IntegerField(
+        min_value=1,
+        max_value=3600,
+        required=False,
+        help_text=_(
+            "Number of seconds over which the events are collected in a batch."
+        ),
+    )
+
+
 class ProtocolSettingsSerializer(serializers.Serializer):
     headers = serializers.DictField(
         child=serializers.CharField(max_length=255), required=False
@@ -43,6 +104,27 @@ class ProtocolSettingsSerializer(serializers.Serializer):
         choices=ProtocolMethodChoices.choices, required=False
     )
 
+    retry = RetrySettingsSerializer(
+        required=False,
+        help_text=_("Policy for retrying failed deliveries to the sink."),
+    )
+
+    batch = BatchSettingsSerializer(
+        required=False,
+        help_text=_(
+            "Deliver the events in batches, using the CloudEvents JSON batch "
+            "format (`application/cloudevents-batch+json`)."
+        ),
+    )
+
+    throttle = ThrottleSettingsSerializer(
+        required=False,
+        help_text=_(
+            "Limits of the requests to the sink, which are lowered automatically "
+            "when the sink is overloaded."
+        ),
+    )
+
 
 class SinkCredentialSerializer(serializers.Serializer):
     credential_type = serializers.ChoiceField(
@@ -98,13 +180,125 @@ class SubscriptionSerializer(serializers.HyperlinkedModelSerializer):
             "types",
             "subscriber_reference",
             "filters",
+            "verification_status",
             "url",
         )
 
         extra_kwargs = {
             "url": {"lookup_field": "uuid", "read_only": True},
+            "verification_status": {"read_only": True},
         }
-        validators = [CallbackURLValidator("sink")]
+
+    def create(self, validated_data: dict) -> Subscription:
+        subscription = super().create(validated_data)
+        verify_sink(subscription)
+        return subscription
+
+    def update(self, instance: Subscription, validated_data: dict) -> Subscription:
+        key = get_verification_key(instance)
+        subscription = super().update(instance, validated_data)
+
+        # the sink is only verified again when it or its credential changed,
+        # or when its verification failed
+        if (
+            get_verification_key(subscription) != key
+            or subscription.verification_status == VerificationStatusChoices.failed
+        ):
+            verify_sink(subscription)
+
+        return subscription
+
+
+def get_forwarded_msg(initial_data: dict, validated_data: dict) -> dict:
+    """
+    Return the event as it is forwarded, including the extension attributes
+    which are not part of the serializer
+    """
+    custom_fields = {
+        key: value for key, value in initial_data.items() if key not in validated_data
+    }
+
+    return {**custom_fields, **validated_data}
+
+
+def remove_published(events: Dict[Tuple[str, str], Event]) -> bool:
+    """
+    Remove the events which are stored already, by their source and id
+
+    Returns whether any events were removed.
+    """
+    if not events:
+        return False
+
+    # filtering on both columns of the unique constraint, so its index is used
+    published = Event.objects.filter(
+        source__in={source for source, _event_id in events},
+        cloudevent_id__in={event_id for _source, event_id in events},
+    ).values_list("source", "cloudevent_id")
+
+    removed = set(published) & set(events)
+    for key in removed:
+        del events[key]
+
+    return bool(removed)
+
+
+class EventListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        max_size = settings.EVENT_BATCH_MAX_SIZE
+
+        if isinstance(data, list) and len(data) > max_size:
+            raise ValidationError(
+                {
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        _("Een batch mag maximaal %(max_size)s events bevatten.")
+                        % {"max_size": max_size}
+                    ]
+                },
+                code="max_length",
+            )
+
+        return super().to_internal_value(data)
+
+    def create(self, validated_data: List[dict]) -> List[dict]:
+        events = {}
+        for initial_data, data in zip(self.initial_data, validated_data):
+            events.setdefault(
+                (data["source"], data["id"]),
+                Event(
+                    forwarded_msg=get_forwarded_msg(initial_data, data),
+                    domain=get_domain(data["domain"]),
+                    source=data["source"],
+                    cloudevent_id=data["id"],
+                ),
+            )
+
+        # replayed events are not published again
+        for key in get_recently_published(events):
+            del events[key]
+
+        remove_published(events)
+
+        # the events are published to the broker by the outbox relay, once the
+        # transaction is committed
+        while True:
+            try:
+                with transaction.atomic():
+                    Event.objects.bulk_create(events.values())
+                    OutboxEntry.objects.bulk_create(
+                        [OutboxEntry(event=event) for event in events.values()]
+                    )
+            except IntegrityError:
+                # events of the batch were published concurrently, e.g. by a
+                # retried request
+                if not remove_published(events):
+                    raise
+            else:
+                break
+
+        remember_published(list(events))
+
+        return validated_data
 
 
 class EventSerializer(serializers.Serializer):
@@ -300,27 +494,42 @@ class EventSerializer(serializers.Serializer):
 
         return validated_data
 
+    class Meta:
+        list_serializer_class = EventListSerializer
+
     def validate_domain(self, value):
-        try:
-            Domain.objects.get(name=value)
-        except Domain.DoesNotExist:
+        if get_domain(value) is None:
             raise ValidationError(_("Domain bestaat niet."), code="does_not_exist")
 
         return value
 
-    # TODO: send to queue?
     def create(self, validated_data: dict) -> dict:
-        domain = Domain.objects.get(name=self.validated_data["domain"])
+        key = (validated_data["source"], validated_data["id"])
 
-        custom_fields = {
-            key: value
-            for key, value in self.initial_data.items()
-            if key not in validated_data
-        }
+        # a replayed event is not published again
+        if get_recently_published([key]):
+            return validated_data
 
-        event = Event.objects.create(
-            forwarded_msg={**custom_fields, **validated_data}, domain=domain
-        )
+        domain = get_domain(self.validated_data["domain"])
+
+        # the event is published to the broker by the outbox relay, once the
+        # transaction is committed
+        try:
+            with transaction.atomic():
+                event = Event.objects.create(
+                    forwarded_msg=get_forwarded_msg(self.initial_data, validated_data),
+                    domain=domain,
+                    source=validated_data["source"],
+                    cloudevent_id=validated_data["id"],
+                )
+                OutboxEntry.objects.create(event=event)
+        except IntegrityError:
+            # replayed after it was forgotten by the cache
+            if not Event.objects.filter(
+                source=validated_data["source"], cloudevent_id=validated_data["id"]
+            ).exists():
+                raise
+
+        remember_published([key])
 
-        deliver_message.delay(event.id)
         return validated_data
@@ -0,0 +1,75 @@
+"""
+Process wide pool of keep-alive HTTP sessions, keyed by the origin of the sink.
+
+Reusing a session per origin keeps the TCP and TLS connections to a sink open
+between deliveries, instead of setting up a new connection for every request.
+"""
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_lock = threading.Lock()
+_sessions: Dict[str, Tuple[requests.Session, float]] = {}
+
+
+def get_origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def _create_session() -> requests.Session:
+    session = requests.Session()
+
+    # sinks sharing an origin may belong to different subscribers, so cookies
+    # set by one of them should never be sent along to the others
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _evict_idle_sessions(now: float) -> None:
+    for origin, (session, last_used) in list(_sessions.items()):
+        if now - last_used > settings.HTTP_POOL_IDLE_TIMEOUT:
+            del _sessions[origin]
+            session.close()
+
+
+def get_session(url: str) -> requests.Session:
+    """
+    Return the pooled session for the origin of the URL.
+    """
+    origin = get_origin(url)
+    now = time.monotonic()
+
+    with _lock:
+        _evict_idle_sessions(now)
+
+        if origin in _sessions:
+            session, _ = _sessions[origin]
+        else:
+            session = _create_session()
+
+        _sessions[origin] = (session, now)
+
+    return session
+
+
+def close_sessions() -> None:
+    with _lock:
+        for session, _ in _sessions.values():
+            session.close()
+
+        _sessions.clear()
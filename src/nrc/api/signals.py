@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from nrc.api.domains import invalidate_domains
+from nrc.api.filters import clear_subscription_predicate
+from nrc.api.routing import invalidate_subscription_index
+from nrc.datamodel.models import Domain, Subscription
+
+
+@receiver([post_save, post_delete], sender=Subscription)
+def clear_subscription_caches(sender, instance, **kwargs):
+    clear_subscription_predicate(instance)
+
+
+@receiver([post_save, post_delete], sender=Subscription)
+@receiver([post_save, post_delete], sender=Domain)
+def update_subscription_index(sender, instance, **kwargs):
+    # invalidate again after the commit, as the index could have been rebuilt
+    # by another process before the changes were visible
+    invalidate_subscription_index()
+    transaction.on_commit(invalidate_subscription_index)
+
+
+@receiver([post_save, post_delete], sender=Domain)
+def update_domains(sender, instance, **kwargs):
+    invalidate_domains()
+    transaction.on_commit(invalidate_domains)
@@ -1,118 +1,618 @@
-import json
 import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import timedelta
+from typing import List, Optional
 
-from django.core.serializers.json import DjangoJSONEncoder
-from django.db.models import Q
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Min
+from django.utils import timezone
 
 import requests
+from celery import group
 
-from nrc.api.filters import AllFilterNode
+from nrc.api.batches import BATCH_CACHE_KEY_PREFIX, BATCH_CONTENT_TYPE, BatchPolicy
+from nrc.api.breakers import CircuitBreaker, CircuitOpenError
+from nrc.api.counters import count_responses, increment_counters
+from nrc.api.retries import RetryPolicy, is_failure
+from nrc.api.routing import get_subscription_index
+from nrc.api.sessions import get_session
+from nrc.api.throttling import HostThrottle
+from nrc.api.verification import (
+    get_sink_headers,
+    get_verification_key,
+    is_verified,
+    probe_sink,
+    remember_verified,
+)
 from nrc.celery import app
-from nrc.datamodel.models import Event, EventResponse, Subscription
+from nrc.datamodel.choices import VerificationStatusChoices
+from nrc.datamodel.models import (
+    DeadLetter,
+    Event,
+    EventResponse,
+    PendingDelivery,
+    Subscription,
+)
+from nrc.utils.iterators import chunked
+from nrc.utils.json import dumps
 
 logger = logging.getLogger(__name__)
 
 
-@app.task
-def deliver_message(event_id: int) -> None:
+class EventResponseBuffer:
     """
-    send event to subscribers
+    Collects the delivery results and writes them in batches.
 
-    The delivery-result is logged in "EventResponse"
+    The buffer is flushed once it holds ``settings.DELIVERY_RESPONSE_BATCH_SIZE``
+    results, when ``settings.DELIVERY_RESPONSE_FLUSH_INTERVAL`` seconds passed
+    since the last write and when leaving the context. Without ``auto_flush``
+    it is only written when flushed explicitly.
     """
-    from nrc.api.serializers import EventSerializer
 
-    event = Event.objects.get(pk=event_id)
+    def __init__(self, auto_flush: bool = True):
+        self.responses: List[EventResponse] = []
+        self.auto_flush = auto_flush
+        self.last_flush = time.monotonic()
 
-    source_filter = Q(source=None) | Q(source=event.forwarded_msg["source"])
-    domain_filter = Q(domain=None) | Q(domain=event.domain)
-    type_filter = (
-        Q(
-            types__contains=[event.forwarded_msg["type"]],
-        )
-        | Q(types=[])
-        | Q(types=None)
-    )
+    def __enter__(self):
+        return self
 
-    # fmt:off
-    subscriptions = (
-        Subscription.objects
-        .select_related("domain")
-        .filter(source_filter, type_filter, domain_filter)
-    )
-    # fmt:on
+    def __exit__(self, *exc_info):
+        self.flush()
 
-    serializer = EventSerializer()
-    custom_attributes = {
-        field for field in event.forwarded_msg if not field in serializer.fields
-    }
+    def add(self, response: EventResponse) -> None:
+        self.responses.append(response)
 
-    for subscription in subscriptions:
-        extra_headers = {}
+        if self.auto_flush and (
+            len(self.responses) >= settings.DELIVERY_RESPONSE_BATCH_SIZE
+            or time.monotonic() - self.last_flush
+            >= settings.DELIVERY_RESPONSE_FLUSH_INTERVAL
+        ):
+            self.flush()
 
-        if subscription.domain and subscription.domain.filter_attributes:
-            filter_attributes = subscription.domain.filter_attributes
+    def flush(self) -> None:
+        if self.responses:
+            with transaction.atomic():
+                EventResponse.objects.bulk_create(self.responses)
+                increment_counters(count_responses(self.responses))
 
-            if not all(
-                attribute in filter_attributes for attribute in custom_attributes
-            ):
-                logger.debug(
-                    f"Skipping subscription {subscription.uuid}, filter attributes do not match"
-                )
-                continue
+        self.responses = []
+        self.last_flush = time.monotonic()
 
-        filters = subscription.filters
 
-        if filters:
-            root_filter = AllFilterNode(filters)
+class EventPayload:
+    """
+    The JSON body of an event, shared by all the subscribers.
 
-            if not root_filter.evaluate(event):
-                logger.debug(
-                    f"Skipping subscription {subscription.uuid}, custom filter does not match"
-                )
-                continue
+    The event is encoded once, only the attributes which differ per
+    subscription are encoded for every subscriber and spliced into the body.
+    """
 
-        if subscription.protocol_settings:
-            extra_headers = subscription.protocol_settings.get("headers", {})
+    subscription_attributes = ("subscription", "subscriberReference")
 
-        if subscription.sink_credential and subscription.sink_credential.get(
-            "access_token"
-        ):
-            access_token = subscription.sink_credential["access_token"]
-            extra_headers.update({"Authorization": f"bearer {access_token}"})
+    def __init__(self, event: Event):
+        self.event_id = event.id
 
-        event_data = {
-            **event.forwarded_msg,
-            "subscription": str(subscription.uuid),
+        shared_data = {
+            key: value
+            for key, value in event.forwarded_msg.items()
+            if key not in self.subscription_attributes
         }
+        self.body = dumps(shared_data)
+
+    def render(self, subscription: Subscription) -> bytes:
+        subscription_data = {"subscription": str(subscription.uuid)}
 
         if subscription.subscriber_reference:
-            event_data.update(
+            subscription_data.update(
                 {"subscriberReference": subscription.subscriber_reference}
             )
-        elif "subscriberReference" in event_data:
-            event_data.pop("subscriberReference")
 
-        logger.debug(f"Sending event {event_id} to subscription {subscription.uuid}")
+        # strip the braces, to add the attributes to the shared body
+        attributes = dumps(subscription_data)[1:-1]
+
+        if self.body == b"{}":
+            return b"{" + attributes + b"}"
+
+        return self.body[:-1] + b"," + attributes + b"}"
 
+
+def post_to_sink(
+    subscription: Subscription, data: bytes, content_type: str
+) -> requests.Response:
+    """
+    POST the data to the sink of the subscription
+
+    Only performs the HTTP call, so it can safely run outside of the thread
+    holding the database connection. Raises ``CircuitOpenError`` without
+    calling the sink when its circuit breaker is open, and ``ThrottledError``
+    when the sink stays at its concurrency or rate limit.
+    """
+    extra_headers = get_sink_headers(subscription)
+    breaker = CircuitBreaker.for_url(subscription.sink)
+
+    if not breaker.allow_request():
+        raise CircuitOpenError(f"Circuit breaker for {breaker.origin} is open")
+
+    throttle = HostThrottle.for_subscription(subscription)
+
+    with throttle.limit():
+        start = time.monotonic()
         try:
-            response = requests.post(
+            response = get_session(subscription.sink).post(
                 subscription.sink,
-                data=json.dumps(event_data, cls=DjangoJSONEncoder),
+                data=data,
                 headers={
                     **extra_headers,
-                    "Content-Type": "application/json",
+                    "Content-Type": content_type,
                 },
                 timeout=10,
             )
+        except requests.exceptions.RequestException as e:
+            breaker.record_failure()
+            if isinstance(e, requests.exceptions.Timeout):
+                throttle.decrease()
+            raise
+
+    breaker.record(response.status_code)
+    throttle.record(response.status_code, time.monotonic() - start)
+
+    return response
+
+
+def send_event(payload: EventPayload, subscription: Subscription) -> requests.Response:
+    """
+    POST the event to the sink of the subscription
+    """
+    logger.debug(
+        f"Sending event {payload.event_id} to subscription {subscription.uuid}"
+    )
+
+    return post_to_sink(subscription, payload.render(subscription), "application/json")
+
+
+class DeliveryResults:
+    """
+    Records the results of the deliveries.
+
+    The delivery-result is logged in "EventResponse", which are written in
+    batches. Failed deliveries are retried according to the retry policy of the
+    subscription, by scheduling a new task for that subscription when leaving
+    the context. Deliveries which still fail after that are stored as
+    "DeadLetter" to redrive later.
+    """
+
+    def __init__(self, auto_flush: bool = True):
+        self.responses = EventResponseBuffer(auto_flush=auto_flush)
+        self.retries = []
+        self.dead_letters: List[DeadLetter] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.save()
+
+        for event_id, subscription, attempt, delay in self.retries:
+            logger.debug(
+                f"Retrying event {event_id} for subscription {subscription.uuid} "
+                f"in {delay:.0f} seconds"
+            )
+
+            deliver_to_subscriptions.apply_async(
+                (event_id, [subscription.pk]),
+                {"attempt": attempt + 1},
+                countdown=delay,
+            )
+
+    def save(self) -> None:
+        """
+        Write the logged responses and the dead letters
+        """
+        self.responses.flush()
+
+        # a dead letter might exist already if the task is redelivered
+        if self.dead_letters:
+            DeadLetter.objects.bulk_create(self.dead_letters, ignore_conflicts=True)
+            self.dead_letters = []
+
+    def add(
+        self,
+        event_id: int,
+        subscription: Subscription,
+        attempt: int,
+        response: Optional[requests.Response] = None,
+        exception: Optional[requests.exceptions.RequestException] = None,
+    ) -> None:
+        if exception is not None:
             # log of the response of the call
-            EventResponse.objects.create(
-                event=event,
+            event_response = EventResponse(
+                event_id=event_id,
                 subscription=subscription,
-                response_status=response.status_code,
+                exception=str(exception),
+                attempt=attempt,
             )
-        except requests.exceptions.RequestException as e:
+            # skipped deliveries are retried, unless configured to fail fast
+            retryable = not (
+                isinstance(exception, CircuitOpenError)
+                and settings.CIRCUIT_BREAKER_FAIL_FAST
+            )
+        else:
             # log of the response of the call
-            EventResponse.objects.create(
-                event=event, subscription=subscription, exception=str(e)
+            event_response = EventResponse(
+                event_id=event_id,
+                subscription=subscription,
+                response_status=response.status_code,
+                attempt=attempt,
             )
+            retryable = True
+
+        self.responses.add(event_response)
+
+        retry_policy = RetryPolicy.from_subscription(subscription)
+
+        if retryable and retry_policy.should_retry(
+            attempt, event_response.response_status
+        ):
+            self.retries.append(
+                (event_id, subscription, attempt, retry_policy.get_delay(attempt))
+            )
+        elif is_failure(event_response.response_status):
+            self.dead_letters.append(
+                DeadLetter(
+                    event_id=event_id,
+                    subscription=subscription,
+                    exception=event_response.exception,
+                    response_status=event_response.response_status,
+                    attempts=attempt,
+                )
+            )
+
+
+@app.task
+def deliver_message(event_id: int) -> None:
+    """
+    match the event with the subscriptions and fan out the delivery
+
+    A delivery task is emitted for every ``settings.DELIVERY_CHUNK_SIZE``
+    matched subscriptions, so the delivery is spread over all workers. The
+    tasks are sent to the broker in groups of at most
+    ``settings.DELIVERY_DISPATCH_SIZE``, so a large fan-out is never held in
+    memory at once.
+    """
+    event = Event.objects.get(pk=event_id)
+    routes = get_subscription_index().match(event)
+
+    if not routes:
+        return
+
+    logger.debug(f"Delivering event {event_id} to {len(routes)} subscription(s)")
+
+    tasks = (
+        deliver_to_subscriptions.s(event_id, [route.pk for route in chunk])
+        for chunk in chunked(routes, settings.DELIVERY_CHUNK_SIZE)
+    )
+
+    for signatures in chunked(tasks, settings.DELIVERY_DISPATCH_SIZE):
+        group(signatures).apply_async()
+
+
+# the task is acknowledged after it finished, so the delivery is retried and
+# its results are recorded when the worker is lost halfway through
+@app.task(acks_late=True, reject_on_worker_lost=True)
+def deliver_to_subscriptions(
+    event_id: int, subscription_ids: List[int], attempt: int = 1
+) -> None:
+    """
+    send event to subscribers
+
+    The event is posted to the sinks concurrently, using at most
+    ``settings.DELIVERY_MAX_WORKERS`` simultaneous requests. Subscriptions
+    receiving their events in batches get the event queued for their next
+    batch instead.
+
+    The subscriptions are streamed from the database and only a bounded number
+    of requests is queued for the threads, so the memory use doesn't grow with
+    the number of subscriptions.
+    """
+    if not subscription_ids:
+        return
+
+    event = Event.objects.get(pk=event_id)
+    subscriptions = Subscription.objects.filter(pk__in=subscription_ids).iterator(
+        chunk_size=settings.DELIVERY_ITERATOR_CHUNK_SIZE
+    )
+
+    payload = EventPayload(event)
+    max_workers = min(settings.DELIVERY_MAX_WORKERS, len(subscription_ids))
+    futures = {}
+    batched = []
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers
+    ) as executor, DeliveryResults() as results:
+
+        # the responses are logged from this thread as the database connection
+        # is bound to it
+        def record(done):
+            for future in done:
+                subscription = futures.pop(future)
+
+                try:
+                    response = future.result()
+                except requests.exceptions.RequestException as e:
+                    results.add(event_id, subscription, attempt, exception=e)
+                else:
+                    results.add(event_id, subscription, attempt, response=response)
+
+        for subscription in subscriptions:
+            if BatchPolicy.from_subscription(subscription):
+                batched.append(subscription)
+
+                if len(batched) >= settings.DELIVERY_ITERATOR_CHUNK_SIZE:
+                    queue_for_batch(event, batched, attempt)
+                    batched = []
+
+                continue
+
+            if len(futures) >= 2 * max_workers:
+                record(wait(futures, return_when=FIRST_COMPLETED).done)
+
+            futures[executor.submit(send_event, payload, subscription)] = subscription
+
+        record(as_completed(list(futures)))
+
+    if batched:
+        queue_for_batch(event, batched, attempt)
+
+
+def queue_for_batch(
+    event: Event, subscriptions: List[Subscription], attempt: int
+) -> None:
+    """
+    Queue the event for the next batch of the subscriptions
+
+    A batch is sent once it holds the maximum number of events, or when the
+    window of the subscription passed since the first event was queued.
+    """
+    PendingDelivery.objects.bulk_create(
+        [
+            PendingDelivery(event=event, subscription=subscription, attempt=attempt)
+            for subscription in subscriptions
+        ]
+    )
+
+    for subscription in subscriptions:
+        policy = BatchPolicy.from_subscription(subscription)
+        pending = PendingDelivery.objects.filter(
+            subscription=subscription, available_on__lte=timezone.now()
+        ).count()
+
+        if pending >= policy.max_size:
+            send_batch.delay(subscription.pk)
+        # a batch is scheduled once per window
+        elif cache.add(
+            f"{BATCH_CACHE_KEY_PREFIX}:{subscription.pk}", True, timeout=policy.window
+        ):
+            send_batch.apply_async((subscription.pk,), countdown=policy.window)
+
+
+@app.task(acks_late=True, reject_on_worker_lost=True)
+def send_batch(subscription_id: int) -> None:
+    """
+    send the queued events of the subscription in a single request
+
+    The events are sent in the CloudEvents JSON batch format. The result of
+    the request is recorded for every event in the batch, so failed events
+    are retried (in a later batch) and stored as dead letter individually.
+    The outcome is stored in a single transaction, so it is not lost when the
+    worker crashes afterwards.
+    """
+    subscription = Subscription.objects.filter(pk=subscription_id).first()
+    if subscription is None:
+        return
+
+    policy = BatchPolicy.from_subscription(subscription)
+    # events queued from now on start a new window
+    cache.delete(f"{BATCH_CACHE_KEY_PREFIX}:{subscription_id}")
+
+    pending = claim_batch(subscription, policy.max_size)
+
+    if not pending:
+        # the events of a lost batch are sent again once their claim expired
+        next_on = PendingDelivery.objects.filter(subscription=subscription).aggregate(
+            next_on=Min("available_on")
+        )["next_on"]
+        if next_on:
+            send_batch.apply_async(
+                (subscription_id,),
+                countdown=max((next_on - timezone.now()).total_seconds(), 0),
+            )
+        return
+
+    data = (
+        b"["
+        + b",".join(
+            EventPayload(delivery.event).render(subscription) for delivery in pending
+        )
+        + b"]"
+    )
+
+    logger.debug(
+        f"Sending batch of {len(pending)} event(s) to subscription "
+        f"{subscription.uuid}"
+    )
+
+    # the results are only written with the outcome of the batch
+    results = DeliveryResults(auto_flush=False)
+
+    try:
+        response = post_to_sink(subscription, data, BATCH_CONTENT_TYPE)
+    except requests.exceptions.RequestException as e:
+        for delivery in pending:
+            results.add(delivery.event_id, subscription, delivery.attempt, exception=e)
+    else:
+        for delivery in pending:
+            results.add(
+                delivery.event_id, subscription, delivery.attempt, response=response
+            )
+
+    # the retried events stay queued until their retry, so the outcome of the
+    # batch is stored at once. They are retried together in a single batch.
+    delays = {
+        (event_id, attempt): delay
+        for event_id, _subscription, attempt, delay in results.retries
+    }
+    retried = [
+        delivery.pk
+        for delivery in pending
+        if (delivery.event_id, delivery.attempt) in delays
+    ]
+    delay = min(delays.values(), default=0)
+    now = timezone.now()
+
+    with transaction.atomic():
+        results.save()
+
+        PendingDelivery.objects.filter(pk__in=retried).update(
+            attempt=F("attempt") + 1, available_on=now + timedelta(seconds=delay)
+        )
+        PendingDelivery.objects.filter(
+            pk__in=[delivery.pk for delivery in pending]
+        ).exclude(pk__in=retried).delete()
+
+    if retried:
+        logger.debug(
+            f"Retrying {len(retried)} event(s) for subscription {subscription.uuid} "
+            f"in {delay:.0f} seconds"
+        )
+        send_batch.apply_async((subscription_id,), countdown=delay)
+
+    # the events beyond the maximum size are sent in the next batch
+    if (
+        len(pending) == policy.max_size
+        and PendingDelivery.objects.filter(
+            subscription=subscription, available_on__lte=timezone.now()
+        ).exists()
+    ):
+        send_batch.delay(subscription_id)
+
+
+def claim_batch(subscription: Subscription, size: int) -> List[PendingDelivery]:
+    """
+    Claim the next queued events of the subscription for a batch
+
+    The events are claimed in a short transaction, so the request to the sink
+    doesn't hold any locks and concurrent batches don't overlap.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        pending = list(
+            PendingDelivery.objects.filter(
+                subscription=subscription, available_on__lte=now
+            )
+            .select_related("event")
+            .select_for_update(skip_locked=True, of=("self",))
+            .order_by("pk")[:size]
+        )
+
+        PendingDelivery.objects.filter(
+            pk__in=[delivery.pk for delivery in pending]
+        ).update(available_on=now + timedelta(seconds=settings.BATCH_CLAIM_TIMEOUT))
+
+    return pending
+
+
+@app.task
+def verify_subscription(
+    subscription_id: int, attempt: int = 1, key: Optional[str] = None
+) -> None:
+    """
+    send a test event to the sink of the subscription and store the outcome
+
+    A failed verification is retried according to the retry policy of the
+    subscription. The subscription keeps its status until the retries failed
+    too, so a verified subscription keeps receiving its events meanwhile.
+    """
+    subscription = Subscription.objects.filter(pk=subscription_id).first()
+    if not subscription:
+        return
+
+    # the sink was changed since the verification was queued, which queued a
+    # new verification
+    if key and get_verification_key(subscription) != key:
+        return
+
+    key = get_verification_key(subscription)
+    response_status = probe_sink(subscription)
+    verified = response_status == 204
+
+    if not verified:
+        retry_policy = RetryPolicy.from_subscription(subscription)
+
+        if retry_policy.should_retry(attempt, response_status):
+            delay = retry_policy.get_delay(attempt)
+            logger.info(
+                f"Verifying sink of subscription {subscription.uuid} again in "
+                f"{delay:.0f} seconds"
+            )
+
+            verify_subscription.apply_async(
+                (subscription_id,),
+                {"attempt": attempt + 1, "key": key},
+                countdown=delay,
+            )
+            return
+
+    with transaction.atomic():
+        subscription = (
+            Subscription.objects.select_for_update().filter(pk=subscription_id).first()
+        )
+
+        # the sink was changed while it was probed, which queued a new
+        # verification
+        if not subscription or get_verification_key(subscription) != key:
+            return
+
+        subscription.verification_status = (
+            VerificationStatusChoices.verified
+            if verified
+            else VerificationStatusChoices.failed
+        )
+        subscription.save(update_fields=["verification_status"])
+
+    logger.info(
+        f"Sink of subscription {subscription.uuid} is "
+        f"{subscription.verification_status}"
+    )
+
+    if verified:
+        remember_verified(key)
+
+
+def verify_sink(subscription: Subscription, cached: bool = True) -> None:
+    """
+    Mark the subscription as verified when the sink is known to work, or
+    queue the verification of the sink once the subscription is committed
+
+    A verified subscription stays verified until the verification of its
+    sink failed, so it keeps receiving its events while it is verified again.
+    With ``cached`` false the sink is always probed again.
+    """
+    if cached and is_verified(get_verification_key(subscription)):
+        status = VerificationStatusChoices.verified
+    else:
+        status = (
+            VerificationStatusChoices.verified
+            if subscription.verification_status == VerificationStatusChoices.verified
+            else VerificationStatusChoices.pending
+        )
+        transaction.on_commit(lambda: verify_subscription.delay(subscription.pk))
+
+    if subscription.verification_status != status:
+        subscription.verification_status = status
+        subscription.save(update_fields=["verification_status"])
@@ -0,0 +1,254 @@
+import gzip
+import json
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from nrc.datamodel.models import Event, EventResponse
+from nrc.datamodel.tests.factories import (
+    DomainFactory,
+    EventFactory,
+    SubscriptionFactory,
+)
+
+from ..archive import (
+    archive_events,
+    get_archived_id,
+    restore_events,
+    write_index,
+    zstandard,
+)
+from ..retention import purge_events
+
+
+@override_settings(ARCHIVE_CHUNK_SIZE=1, EVENT_PURGE_INTERVAL=0)
+class ArchiveTests(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+        self.domain = DomainFactory.create(name="nl.vng.zaken")
+        self.subscription = SubscriptionFactory.create()
+
+        now = timezone.now()
+        self.before = now - timedelta(days=30)
+
+        self.expired = [
+            EventFactory.create(
+                domain=self.domain,
+                forwarded_msg={"id": str(days), "data": {"foo": "bär"}},
+                source="urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+                cloudevent_id=str(days),
+                created_on=now - timedelta(days=days),
+            )
+            for days in (42, 41, 40)
+        ]
+        self.kept = EventFactory.create(domain=self.domain, forwarded_msg={})
+
+        for event in [*self.expired, self.kept]:
+            EventResponse.objects.create(
+                event=event,
+                subscription=self.subscription,
+                response_status=204,
+                attempt=2,
+            )
+
+    def read_segment(self, name):
+        with gzip.open(self.directory / name) as file:
+            return [json.loads(line) for line in file]
+
+    def test_archive(self):
+        count, segments = archive_events(self.before, self.directory, segment_size=2)
+
+        self.assertEqual((count, segments), (3, 2))
+
+        index = json.loads((self.directory / "index.json").read_text())
+        first, last = self.expired[0].pk, self.expired[-1].pk
+
+        self.assertEqual(
+            [(s["first_id"], s["last_id"], s["count"]) for s in index],
+            [(first, first + 1, 2), (last, last, 1)],
+        )
+        self.assertEqual(
+            sorted(path.name for path in self.directory.iterdir()),
+            sorted(["index.json"] + [s["file"] for s in index]),
+        )
+
+        records = self.read_segment(index[0]["file"])
+
+        self.assertEqual(records[0]["id"], first)
+        self.assertEqual(records[0]["domain"], "nl.vng.zaken")
+        self.assertEqual(records[0]["cloudevent_id"], "42")
+        self.assertEqual(records[0]["forwarded_msg"], self.expired[0].forwarded_msg)
+        self.assertEqual(
+            records[0]["responses"],
+            [
+                {
+                    "subscription": str(self.subscription.uuid),
+                    "response_status": 204,
+                    "exception": "",
+                    "attempt": 2,
+                    "created_on": records[0]["responses"][0]["created_on"],
+                }
+            ],
+        )
+        # the events are not deleted
+        self.assertEqual(Event.objects.count(), 4)
+
+    def test_archive_again(self):
+        archive_events(self.before, self.directory)
+
+        self.assertEqual(archive_events(self.before, self.directory), (0, 0))
+
+        count, segments = archive_events(timezone.now(), self.directory)
+
+        self.assertEqual((count, segments), (1, 1))
+        self.assertEqual(
+            len(json.loads((self.directory / "index.json").read_text())), 2
+        )
+
+    def test_archive_interrupted(self):
+        calls = []
+
+        def interrupt(directory, index):
+            calls.append(index)
+            if len(calls) == 2:
+                raise RuntimeError("Worker lost")
+            write_index(directory, index)
+
+        with patch("nrc.api.archive.write_index", side_effect=interrupt):
+            with self.assertRaises(RuntimeError):
+                archive_events(self.before, self.directory, segment_size=2)
+
+        # the completed segment is kept
+        index = json.loads((self.directory / "index.json").read_text())
+        self.assertEqual([s["count"] for s in index], [2])
+
+        count, segments = archive_events(self.before, self.directory, segment_size=2)
+
+        self.assertEqual((count, segments), (1, 1))
+
+        index = json.loads((self.directory / "index.json").read_text())
+        self.assertEqual(
+            sorted(path.name for path in self.directory.iterdir()),
+            sorted(["index.json"] + [s["file"] for s in index]),
+        )
+
+    def test_restore(self):
+        archive_events(self.before, self.directory, segment_size=2)
+        list(purge_events(self.before))
+
+        restored = restore_events(self.directory)
+
+        self.assertEqual(restored, (3, 3))
+
+        for expired in self.expired:
+            event = Event.objects.get(pk=expired.pk)
+
+            self.assertEqual(event.created_on, expired.created_on)
+            self.assertEqual(event.forwarded_msg, expired.forwarded_msg)
+            self.assertEqual(event.cloudevent_id, expired.cloudevent_id)
+            self.assertEqual(event.source, expired.source)
+            self.assertEqual(event.responses_total, 1)
+            self.assertEqual(event.responses_succeeded, 1)
+
+            response = EventResponse.objects.get(event=event)
+
+            self.assertEqual(response.subscription, self.subscription)
+            self.assertEqual(response.attempt, 2)
+
+        # restored events are skipped
+        self.assertEqual(restore_events(self.directory), (0, 0))
+
+    def test_restore_time_range(self):
+        archive_events(self.before, self.directory, segment_size=2)
+        list(purge_events(self.before))
+
+        restored = restore_events(
+            self.directory,
+            start=self.expired[1].created_on,
+            end=self.expired[2].created_on,
+        )
+
+        self.assertEqual(restored, (1, 1))
+        self.assertEqual(
+            set(Event.objects.values_list("pk", flat=True)),
+            {self.expired[1].pk, self.kept.pk},
+        )
+
+    def test_purge_archived_only(self):
+        archive_events(self.expired[1].created_on, self.directory)
+
+        list(purge_events(self.before, archived_id=get_archived_id(self.directory)))
+
+        # the expired events which are not archived yet are kept
+        self.assertEqual(
+            set(Event.objects.values_list("pk", flat=True)),
+            {self.expired[1].pk, self.expired[2].pk, self.kept.pk},
+        )
+
+    def test_restored_events_kept(self):
+        archive_events(self.before, self.directory)
+        list(purge_events(self.before))
+        restore_events(self.directory)
+
+        list(purge_events(self.before))
+
+        self.assertEqual(Event.objects.count(), 4)
+        self.assertEqual(EventResponse.objects.count(), 4)
+
+        # the retention period starts at the restoration
+        list(purge_events(timezone.now()))
+
+        self.assertFalse(Event.objects.exists())
+
+    def test_restore_published_again(self):
+        archive_events(self.before, self.directory)
+        list(purge_events(self.before))
+        EventFactory.create(
+            domain=self.domain,
+            forwarded_msg={},
+            source=self.expired[0].source,
+            cloudevent_id=self.expired[0].cloudevent_id,
+        )
+
+        self.assertEqual(restore_events(self.directory), (2, 2))
+        self.assertFalse(Event.objects.filter(pk=self.expired[0].pk).exists())
+
+    @skipIf(zstandard is None, "zstandard is not installed")
+    def test_zstd(self):
+        archive_events(self.before, self.directory, compression="zstd")
+        list(purge_events(self.before))
+
+        self.assertEqual(restore_events(self.directory), (3, 3))
+
+    def test_commands(self):
+        stdout = StringIO()
+
+        call_command("archive_events", days=30, directory=self.directory, stdout=stdout)
+        call_command(
+            "purge_events", days=30, archive_directory=self.directory, stdout=StringIO()
+        )
+        call_command(
+            "restore_events",
+            "--start",
+            self.expired[1].created_on.date().isoformat(),
+            directory=self.directory,
+            stdout=stdout,
+        )
+
+        self.assertEqual(
+            stdout.getvalue(),
+            "Archived 3 events in 1 segments\n"
+            "Restored 2 events and 2 event responses\n",
+        )
@@ -0,0 +1,246 @@
+import json
+from datetime import timedelta
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import override_settings
+from django.utils import timezone
+
+import requests_mock
+from rest_framework.test import APITestCase
+
+from nrc.datamodel.models import DeadLetter, EventResponse, PendingDelivery
+from nrc.datamodel.tests.factories import (
+    DomainFactory,
+    EventFactory,
+    SubscriptionFactory,
+)
+
+from ..tasks import deliver_message, send_batch
+
+
+class BatchedDeliveryTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        self.domain = DomainFactory.create(name="nl.vng.zaken")
+        self.subscription = SubscriptionFactory.create(
+            domain=self.domain,
+            source=None,
+            types=None,
+            sink="https://dms.example.com/events",
+            subscriber_reference="dms",
+            protocol_settings={"batch": {"max_size": 3, "window": 10}},
+            verified=True,
+        )
+        self.events = [
+            EventFactory.create(
+                domain=self.domain,
+                forwarded_msg={
+                    "id": str(uuid4()),
+                    "specversion": "1.0",
+                    "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+                    "domain": "nl.vng.zaken",
+                    "type": "nl.vng.zaken.status_gewijzigd",
+                    "data": {"index": i},
+                },
+            )
+            for i in range(5)
+        ]
+
+    def test_queued_for_window(self):
+        with patch("nrc.api.tasks.send_batch") as mocked_send_batch:
+            for event in self.events[:2]:
+                deliver_message(event.id)
+
+        self.assertEqual(
+            list(
+                PendingDelivery.objects.order_by("pk").values_list(
+                    "event", "subscription"
+                )
+            ),
+            [(event.pk, self.subscription.pk) for event in self.events[:2]],
+        )
+        mocked_send_batch.apply_async.assert_called_once_with(
+            (self.subscription.pk,), countdown=10
+        )
+        mocked_send_batch.delay.assert_not_called()
+
+    def test_queued_up_to_max_size(self):
+        with patch("nrc.api.tasks.send_batch") as mocked_send_batch:
+            for event in self.events[:3]:
+                deliver_message(event.id)
+
+        mocked_send_batch.delay.assert_called_once_with(self.subscription.pk)
+
+    def test_send_batch(self):
+        with patch("nrc.api.tasks.send_batch"):
+            for event in self.events[:3]:
+                deliver_message(event.id)
+
+        with requests_mock.mock() as m:
+            m.post(self.subscription.sink, status_code=202)
+
+            send_batch(self.subscription.pk)
+
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual(
+            m.last_request.headers["Content-Type"],
+            "application/cloudevents-batch+json",
+        )
+
+        body = json.loads(m.last_request.body)
+
+        self.assertEqual(
+            [event["id"] for event in body],
+            [event.forwarded_msg["id"] for event in self.events[:3]],
+        )
+        self.assertEqual(body[0]["subscription"], str(self.subscription.uuid))
+        self.assertEqual(body[0]["subscriberReference"], "dms")
+        self.assertEqual(body[2]["data"], {"index": 2})
+
+        self.assertFalse(PendingDelivery.objects.exists())
+        self.assertEqual(
+            set(EventResponse.objects.values_list("event", "response_status")),
+            {(event.pk, 202) for event in self.events[:3]},
+        )
+
+    def test_send_batch_remainder(self):
+        for event in self.events:
+            PendingDelivery.objects.create(event=event, subscription=self.subscription)
+
+        with requests_mock.mock() as m, patch(
+            "nrc.api.tasks.send_batch.delay"
+        ) as mocked_delay:
+            m.post(self.subscription.sink, status_code=202)
+
+            send_batch(self.subscription.pk)
+
+        self.assertEqual(len(json.loads(m.last_request.body)), 3)
+        self.assertEqual(PendingDelivery.objects.count(), 2)
+        mocked_delay.assert_called_once_with(self.subscription.pk)
+
+    @override_settings(DELIVERY_MAX_RETRIES=0)
+    def test_send_batch_failed(self):
+        for event in self.events[:2]:
+            PendingDelivery.objects.create(event=event, subscription=self.subscription)
+
+        with requests_mock.mock() as m:
+            m.post(self.subscription.sink, status_code=503)
+
+            send_batch(self.subscription.pk)
+
+        self.assertFalse(PendingDelivery.objects.exists())
+        self.assertEqual(
+            set(DeadLetter.objects.values_list("event", "response_status")),
+            {(event.pk, 503) for event in self.events[:2]},
+        )
+
+    @override_settings(DELIVERY_MAX_RETRIES=0, DELIVERY_RESPONSE_BATCH_SIZE=1)
+    def test_send_batch_outcome_atomic(self):
+        for event in self.events[:2]:
+            PendingDelivery.objects.create(event=event, subscription=self.subscription)
+
+        with requests_mock.mock() as m, patch(
+            "nrc.api.tasks.DeadLetter.objects.bulk_create",
+            side_effect=DatabaseError("Worker lost"),
+        ):
+            m.post(self.subscription.sink, status_code=503)
+
+            with self.assertRaises(DatabaseError):
+                send_batch(self.subscription.pk)
+
+        # nothing of the outcome is stored, the events stay claimed
+        self.assertFalse(EventResponse.objects.exists())
+        self.assertEqual(PendingDelivery.objects.count(), 2)
+
+    @override_settings(DELIVERY_MAX_RETRIES=1, DELIVERY_RETRY_BACKOFF=30)
+    def test_send_batch_retried(self):
+        for event in self.events[:2]:
+            PendingDelivery.objects.create(event=event, subscription=self.subscription)
+
+        with requests_mock.mock() as m, patch(
+            "nrc.api.tasks.send_batch.apply_async"
+        ) as mocked_apply_async:
+            m.post(self.subscription.sink, status_code=503)
+
+            send_batch(self.subscription.pk)
+
+        self.assertEqual(
+            set(EventResponse.objects.values_list("event", "response_status")),
+            {(event.pk, 503) for event in self.events[:2]},
+        )
+        self.assertFalse(DeadLetter.objects.exists())
+
+        # the events stay queued for the retry
+        self.assertEqual(
+            set(PendingDelivery.objects.values_list("event", "attempt")),
+            {(event.pk, 2) for event in self.events[:2]},
+        )
+        self.assertFalse(
+            PendingDelivery.objects.filter(available_on__lte=timezone.now()).exists()
+        )
+        mocked_apply_async.assert_called_once()
+        self.assertEqual(mocked_apply_async.call_args.args[0], (self.subscription.pk,))
+
+    def test_send_batch_claimed(self):
+        for event in self.events[:2]:
+            PendingDelivery.objects.create(event=event, subscription=self.subscription)
+
+        def check_claimed(request, context):
+            # the events are claimed, so a concurrent batch skips them
+            self.assertFalse(
+                PendingDelivery.objects.filter(
+                    available_on__lte=timezone.now()
+                ).exists()
+            )
+            return ""
+
+        with requests_mock.mock() as m:
+            m.post(self.subscription.sink, status_code=202, text=check_claimed)
+
+            send_batch(self.subscription.pk)
+
+        self.assertEqual(m.call_count, 1)
+        self.assertFalse(PendingDelivery.objects.exists())
+
+    def test_send_lost_batch(self):
+        claimed_until = timezone.now() + timedelta(seconds=300)
+        PendingDelivery.objects.create(
+            event=self.events[0],
+            subscription=self.subscription,
+            available_on=claimed_until,
+        )
+
+        with requests_mock.mock() as m, patch(
+            "nrc.api.tasks.send_batch.apply_async"
+        ) as mocked_apply_async:
+            send_batch(self.subscription.pk)
+
+        self.assertEqual(m.call_count, 0)
+        self.assertEqual(PendingDelivery.objects.count(), 1)
+
+        # the batch is sent again once the claim expired
+        mocked_apply_async.assert_called_once()
+        self.assertAlmostEqual(
+            mocked_apply_async.call_args.kwargs["countdown"], 300, delta=5
+        )
+
+    def test_mixed_delivery(self):
+        subscription = SubscriptionFactory.create(
+            domain=self.domain, source=None, types=None, verified=True
+        )
+
+        with requests_mock.mock() as m, patch("nrc.api.tasks.send_batch"):
+            m.post(subscription.sink, status_code=204)
+
+            deliver_message(self.events[0].id)
+
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual(m.last_request.headers["Content-Type"], "application/json")
+        self.assertEqual(PendingDelivery.objects.get().subscription, self.subscription)
@@ -0,0 +1,177 @@
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+import requests
+import requests_mock
+from rest_framework.test import APITestCase
+
+from nrc.datamodel.models import DeadLetter, EventResponse
+from nrc.datamodel.tests.factories import (
+    DomainFactory,
+    EventFactory,
+    SubscriptionFactory,
+)
+
+from ..breakers import CircuitBreaker
+from ..tasks import deliver_message
+
+
+@override_settings(
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD=3, CIRCUIT_BREAKER_RESET_TIMEOUT=60
+)
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        self.breaker = CircuitBreaker.for_url("https://example.com/callback")
+
+    def test_opens_after_consecutive_failures(self):
+        for _ in range(2):
+            self.breaker.record_failure()
+            self.assertTrue(self.breaker.allow_request())
+
+        self.breaker.record_failure()
+
+        self.assertFalse(self.breaker.allow_request())
+        # shared by the sinks of the origin
+        self.assertFalse(
+            CircuitBreaker.for_url("https://example.com/other").allow_request()
+        )
+        self.assertTrue(
+            CircuitBreaker.for_url("https://example.org/callback").allow_request()
+        )
+
+    def test_success_resets_failures(self):
+        for _ in range(2):
+            self.breaker.record_failure()
+
+        self.breaker.record(400)
+        self.breaker.record_failure()
+
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_cache_unavailable(self):
+        # e.g. a Redis cache ignoring connection errors returns None
+        with patch("nrc.api.breakers.cache") as mocked_cache:
+            mocked_cache.get.return_value = None
+            mocked_cache.add.return_value = None
+            mocked_cache.incr.return_value = None
+
+            for _ in range(3):
+                self.breaker.record_failure()
+
+            self.assertTrue(self.breaker.allow_request())
+            mocked_cache.set.assert_not_called()
+
+    def test_half_open(self):
+        with patch("nrc.api.breakers.time.time", return_value=1000):
+            for _ in range(3):
+                self.breaker.record(503)
+
+        with patch("nrc.api.breakers.time.time", return_value=1059):
+            self.assertFalse(self.breaker.allow_request())
+
+        with patch("nrc.api.breakers.time.time", return_value=1060):
+            # a single probe
+            self.assertTrue(self.breaker.allow_request())
+            self.assertFalse(self.breaker.allow_request())
+
+            self.breaker.record_failure()
+
+        with patch("nrc.api.breakers.time.time", return_value=1061):
+            self.assertFalse(self.breaker.allow_request())
+
+        with patch("nrc.api.breakers.time.time", return_value=1121):
+            self.assertTrue(self.breaker.allow_request())
+
+            self.breaker.record_success()
+
+            self.assertTrue(self.breaker.allow_request())
+            self.assertTrue(self.breaker.allow_request())
+
+    @override_settings(CIRCUIT_BREAKER_FAILURE_THRESHOLD=0)
+    def test_disabled(self):
+        for _ in range(10):
+            self.breaker.record_failure()
+
+        self.assertTrue(self.breaker.allow_request())
+
+
+@override_settings(CIRCUIT_BREAKER_FAILURE_THRESHOLD=2, DELIVERY_MAX_RETRIES=0)
+class EventCircuitBreakerTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        domain = DomainFactory.create(name="nl.vng.zaken")
+        self.events = EventFactory.create_batch(
+            3,
+            domain=domain,
+            forwarded_msg={
+                "id": str(uuid4()),
+                "specversion": "1.0",
+                "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+                "domain": "nl.vng.zaken",
+                "type": "nl.vng.zaken.status_gewijzigd",
+            },
+        )
+        self.subscription = SubscriptionFactory.create(
+            domain=domain,
+            source=None,
+            types=None,
+            sink="https://example.com/callback",
+            verified=True,
+        )
+
+    def test_skip_open_sink(self):
+        with requests_mock.mock() as m:
+            m.post(
+                self.subscription.sink,
+                exc=requests.exceptions.ConnectTimeout("Connection timed out"),
+            )
+
+            for event in self.events:
+                deliver_message(event.id)
+
+        self.assertEqual(m.call_count, 2)
+        self.assertEqual(
+            EventResponse.objects.get(event=self.events[2]).exception,
+            "Circuit breaker for https://example.com is open",
+        )
+        self.assertEqual(DeadLetter.objects.count(), 3)
+
+    @override_settings(DELIVERY_MAX_RETRIES=5)
+    def test_skipped_delivery_retried(self):
+        with requests_mock.mock() as m, patch(
+            "nrc.api.tasks.deliver_to_subscriptions.apply_async"
+        ) as mocked_apply_async:
+            m.post(self.subscription.sink, status_code=503)
+
+            for event in self.events:
+                deliver_message(event.id)
+
+        self.assertEqual(m.call_count, 2)
+        self.assertEqual(mocked_apply_async.call_count, 3)
+        self.assertFalse(DeadLetter.objects.exists())
+
+    @override_settings(DELIVERY_MAX_RETRIES=5, CIRCUIT_BREAKER_FAIL_FAST=True)
+    def test_skipped_delivery_fail_fast(self):
+        with requests_mock.mock() as m, patch(
+            "nrc.api.tasks.deliver_to_subscriptions.apply_async"
+        ) as mocked_apply_async:
+            m.post(self.subscription.sink, status_code=503)
+
+            for event in self.events:
+                deliver_message(event.id)
+
+        self.assertEqual(m.call_count, 2)
+        self.assertEqual(mocked_apply_async.call_count, 2)
+        self.assertEqual(DeadLetter.objects.get().event, self.events[2])
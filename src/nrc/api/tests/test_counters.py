@@ -0,0 +1,78 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from nrc.datamodel.models import EventResponse
+from nrc.datamodel.tests.factories import EventFactory, SubscriptionFactory
+
+from ..counters import backfill_counters, count_responses, increment_counters
+
+
+class DeliveryCounterTests(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.subscription = SubscriptionFactory.create()
+        self.events = EventFactory.create_batch(3, forwarded_msg={})
+
+    def create_responses(self, event, *statuses):
+        return [
+            EventResponse.objects.create(
+                event=event, subscription=self.subscription, response_status=status
+            )
+            for status in statuses
+        ]
+
+    def test_increment(self):
+        first, second, third = self.events
+        responses = [
+            *self.create_responses(first, 204, 500, None),
+            *self.create_responses(second, 200),
+            *self.create_responses(third, 200),
+        ]
+
+        increment_counters(count_responses(responses))
+        increment_counters(count_responses(responses[:1]))
+
+        for event, counters in zip(self.events, [(4, 2, 2), (1, 1, 0), (1, 1, 0)]):
+            event.refresh_from_db()
+
+            self.assertEqual(
+                (
+                    event.responses_total,
+                    event.responses_succeeded,
+                    event.responses_failed,
+                ),
+                counters,
+            )
+
+    def test_backfill(self):
+        first, second, third = self.events
+        self.create_responses(first, 204, 500, None)
+        self.create_responses(second, 200)
+        third.responses_total = 5
+        third.save()
+
+        self.assertEqual(list(backfill_counters(batch_size=2)), [2, 1])
+
+        for event, counters in zip(self.events, [(3, 1, 2), (1, 1, 0), (0, 0, 0)]):
+            event.refresh_from_db()
+
+            self.assertEqual(
+                (
+                    event.responses_total,
+                    event.responses_succeeded,
+                    event.responses_failed,
+                ),
+                counters,
+            )
+
+    def test_backfill_command(self):
+        stdout = StringIO()
+
+        call_command("backfill_delivery_counters", stdout=stdout)
+
+        self.assertEqual(
+            stdout.getvalue(), "Updated the delivery counters of 3 events\n"
+        )
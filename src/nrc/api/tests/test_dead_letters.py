@@ -0,0 +1,177 @@
+from io import StringIO
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.core.management import call_command
+from django.test import override_settings
+
+import requests_mock
+from rest_framework.test import APITestCase
+
+from nrc.datamodel.models import DeadLetter, EventResponse
+from nrc.datamodel.tests.factories import (
+    DomainFactory,
+    EventFactory,
+    SubscriptionFactory,
+)
+
+from ..dead_letters import redrive
+from ..tasks import deliver_message
+
+
+def get_event_data():
+    return {
+        "id": str(uuid4()),
+        "specversion": "1.0",
+        "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+        "domain": "nl.vng.zaken",
+        "type": "nl.vng.zaken.status_gewijzigd",
+    }
+
+
+class DeadLetterTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.domain = DomainFactory.create(name="nl.vng.zaken")
+        self.event = EventFactory.create(
+            domain=self.domain, forwarded_msg=get_event_data()
+        )
+
+    def test_retries_exhausted(self):
+        subscription = SubscriptionFactory.create(
+            domain=self.domain,
+            source=None,
+            types=None,
+            protocol_settings={"retry": {"max_retries": 1}},
+            verified=True,
+        )
+
+        with requests_mock.mock() as m:
+            m.post(subscription.sink, status_code=503)
+
+            deliver_message(self.event.id)
+
+        dead_letter = DeadLetter.objects.get()
+
+        self.assertEqual(dead_letter.event, self.event)
+        self.assertEqual(dead_letter.subscription, subscription)
+        self.assertEqual(dead_letter.response_status, 503)
+        self.assertEqual(dead_letter.attempts, 2)
+
+    def test_not_retried(self):
+        subscription = SubscriptionFactory.create(
+            domain=self.domain, source=None, types=None, verified=True
+        )
+
+        with requests_mock.mock() as m:
+            m.post(subscription.sink, status_code=400)
+
+            deliver_message(self.event.id)
+
+        dead_letter = DeadLetter.objects.get()
+
+        self.assertEqual(dead_letter.response_status, 400)
+        self.assertEqual(dead_letter.attempts, 1)
+
+    def test_delivered(self):
+        subscription = SubscriptionFactory.create(
+            domain=self.domain, source=None, types=None, verified=True
+        )
+
+        with requests_mock.mock() as m:
+            m.post(subscription.sink, status_code=204)
+
+            deliver_message(self.event.id)
+
+        self.assertFalse(DeadLetter.objects.exists())
+
+
+class RedriveTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+
+        domain = DomainFactory.create(name="nl.vng.zaken")
+
+        self.events = EventFactory.create_batch(
+            2, domain=domain, forwarded_msg=get_event_data()
+        )
+        self.failed = SubscriptionFactory.create(
+            domain=domain, sink="https://failed.example.com/callback", verified=True
+        )
+        self.delivered = SubscriptionFactory.create(
+            domain=domain, sink="https://delivered.example.com/callback", verified=True
+        )
+
+        for event in self.events:
+            DeadLetter.objects.create(
+                event=event, subscription=self.failed, response_status=503, attempts=6
+            )
+
+    def test_redrive(self):
+        with requests_mock.mock() as m:
+            m.post(self.failed.sink, status_code=204)
+
+            count = redrive(DeadLetter.objects.all())
+
+        self.assertEqual(count, 2)
+        self.assertEqual(m.call_count, 2)
+        self.assertFalse(DeadLetter.objects.exists())
+        self.assertEqual(
+            {
+                (response.event, response.subscription)
+                for response in EventResponse.objects.all()
+            },
+            {(event, self.failed) for event in self.events},
+        )
+
+    @override_settings(DELIVERY_MAX_RETRIES=0)
+    def test_redrive_failed_again(self):
+        with requests_mock.mock() as m:
+            m.post(self.failed.sink, status_code=503)
+
+            redrive(DeadLetter.objects.all())
+
+        self.assertEqual(DeadLetter.objects.count(), 2)
+        self.assertEqual(
+            set(DeadLetter.objects.values_list("attempts", flat=True)), {1}
+        )
+
+    @override_settings(DELIVERY_CHUNK_SIZE=1)
+    def test_redrive_rate_limited(self):
+        with patch("nrc.api.dead_letters.group") as mocked_group:
+            redrive(DeadLetter.objects.all(), rate=4)
+
+        tasks = list(mocked_group.call_args[0][0])
+
+        self.assertEqual(
+            [task.args for task in tasks],
+            [
+                (event.id, [self.failed.pk])
+                for event in sorted(self.events, key=lambda event: event.id)
+            ],
+        )
+        self.assertEqual([task.options["countdown"] for task in tasks], [0, 0.25])
+        mocked_group.return_value.apply_async.assert_called_once_with()
+
+    def test_command(self):
+        DeadLetter.objects.create(
+            event=self.events[0],
+            subscription=self.delivered,
+            response_status=503,
+            attempts=6,
+        )
+        stdout = StringIO()
+
+        with requests_mock.mock() as m:
+            m.post(self.failed.sink, status_code=204)
+
+            call_command(
+                "redrive_dead_letters",
+                subscription=[str(self.failed.uuid)],
+                stdout=stdout,
+            )
+
+        self.assertEqual(m.call_count, 2)
+        self.assertEqual(DeadLetter.objects.get().subscription, self.delivered)
+        self.assertEqual(stdout.getvalue(), "Redriving 2 dead letters\n")
@@ -0,0 +1,142 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+from vng_api_common.tests import JWTAuthMixin
+from vng_api_common.tests.schema import get_operation_url
+
+from nrc.datamodel.models import Domain, Event
+from nrc.datamodel.tests.factories import DomainFactory
+
+from ..domains import get_domain, invalidate_domains
+from ..serializers import EventSerializer
+
+
+class DomainCacheTests(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        invalidate_domains()
+
+    def test_get_domain(self):
+        domain = DomainFactory.create(name="nl.vng.zaken")
+
+        self.assertEqual(get_domain("nl.vng.zaken"), domain)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_domain("nl.vng.zaken"), domain)
+
+    def test_unknown_domain(self):
+        DomainFactory.create(name="nl.vng.zaken")
+        get_domain("nl.vng.zaken")
+
+        self.assertIsNone(get_domain("nl.vng.unknown"))
+
+    def test_domain_changed(self):
+        domain = DomainFactory.create(name="nl.vng.zaken")
+        get_domain("nl.vng.zaken")
+
+        domain.name = "nl.vng.documenten"
+        domain.save()
+
+        self.assertIsNone(get_domain("nl.vng.zaken"))
+        self.assertEqual(get_domain("nl.vng.documenten"), domain)
+
+    def test_domain_deleted(self):
+        domain = DomainFactory.create(name="nl.vng.zaken")
+        get_domain("nl.vng.zaken")
+
+        domain.delete()
+
+        self.assertIsNone(get_domain("nl.vng.zaken"))
+
+    def test_domain_created_elsewhere(self):
+        get_domain("nl.vng.zaken")
+
+        # without signalling the other processes
+        Domain.objects.bulk_create([Domain(name="nl.vng.zaken")])
+
+        domain = get_domain("nl.vng.zaken")
+
+        self.assertEqual(domain.name, "nl.vng.zaken")
+
+        with self.assertNumQueries(1):
+            get_domain("nl.vng.zaken")
+
+        with self.assertNumQueries(0):
+            get_domain("nl.vng.zaken")
+
+    def test_version_shared_through_cache(self):
+        DomainFactory.create(name="nl.vng.zaken")
+        get_domain("nl.vng.zaken")
+
+        # another process changed the domains
+        cache.set("nrc:domains:version", uuid4().hex)
+
+        with self.assertNumQueries(1):
+            get_domain("nl.vng.zaken")
+
+
+class EventIngestQueryTests(TestCase):
+    def test_domain_resolved_without_queries(self):
+        DomainFactory.create(name="nl.vng.zaken")
+        get_domain("nl.vng.zaken")
+
+        serializer = EventSerializer(
+            data={
+                "id": str(uuid4()),
+                "specversion": "1.0",
+                "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+                "domain": "nl.vng.zaken",
+                "type": "nl.vng.zaken.status_gewijzigd",
+                "data": {"foo": "bar"},
+            }
+        )
+
+        with self.assertNumQueries(0):
+            self.assertTrue(serializer.is_valid())
+
+        # savepoint, event, outbox entry, release savepoint
+        with self.assertNumQueries(4):
+            serializer.save()
+
+        self.assertEqual(Event.objects.get().domain.name, "nl.vng.zaken")
+
+
+@override_settings(
+    LINK_FETCHER="vng_api_common.mocks.link_fetcher_200",
+    ZDS_CLIENT_CLASS="vng_api_common.mocks.MockClient",
+)
+class EventPublishQueryTests(JWTAuthMixin, APITestCase):
+    heeft_alle_autorisaties = True
+
+    def test_no_domain_queries(self):
+        DomainFactory.create(name="nl.vng.zaken")
+        get_domain("nl.vng.zaken")
+
+        data = {
+            "id": str(uuid4()),
+            "specversion": "1.0",
+            "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+            "domain": "nl.vng.zaken",
+            "type": "nl.vng.zaken.status_gewijzigd",
+            "data": {"foo": "bar"},
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(get_operation_url("events_create"), data)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(
+            [
+                query["sql"]
+                for query in queries.captured_queries
+                if "datamodel_domain" in query["sql"]
+            ],
+            [],
+        )
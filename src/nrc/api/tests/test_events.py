@@ -1,19 +1,25 @@
+import json
 from unittest.mock import patch
 from uuid import uuid4
 
+from django.core.cache import cache
+from django.db import DatabaseError, connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext as _
 
 from rest_framework import status
 from rest_framework.test import APITestCase
 from vng_api_common.tests import JWTAuthMixin
-from vng_api_common.tests.schema import get_operation_url
+from vng_api_common.tests.schema import get_operation_url, get_validation_errors
 
+from nrc.api import serializers
 from nrc.api.choices import SequencetypeChoices
-from nrc.datamodel.models import Event
+from nrc.api.deduplication import get_cache_key
+from nrc.datamodel.models import Event, OutboxEntry
 from nrc.datamodel.tests.factories import DomainFactory
 
 
-@patch("nrc.api.serializers.deliver_message.delay")
 @override_settings(
     LINK_FETCHER="vng_api_common.mocks.link_fetcher_200",
     ZDS_CLIENT_CLASS="vng_api_common.mocks.MockClient",
@@ -21,7 +27,7 @@ from nrc.datamodel.tests.factories import DomainFactory
 class EventsTestCase(JWTAuthMixin, APITestCase):
     heeft_alle_autorisaties = True
 
-    def test_send_simple_event(self, mocked_task):
+    def test_send_simple_event(self):
         """
         test /events POST:
         check if message was send to subscribers callbackUrls
@@ -56,9 +62,9 @@ class EventsTestCase(JWTAuthMixin, APITestCase):
 
         self.assertEqual(event.forwarded_msg, data)
 
-        mocked_task.assert_called_once_with(event.id)
+        self.assertTrue(OutboxEntry.objects.filter(event=event).exists())
 
-    def test_non_camelcase_parsing(self, mocked_task):
+    def test_non_camelcase_parsing(self):
         """
         Test that event data is saved as is without applying camelcase formatting
         to the request data.
@@ -94,9 +100,9 @@ class EventsTestCase(JWTAuthMixin, APITestCase):
 
         self.assertEqual(event.forwarded_msg, data)
 
-        mocked_task.assert_called_once_with(event.id)
+        self.assertTrue(OutboxEntry.objects.filter(event=event).exists())
 
-    def test_nullable_fields(self, mocked_task):
+    def test_nullable_fields(self):
         """
         test /events POST:
         check if specified fields are allowed to have null values
@@ -149,4 +155,340 @@ class EventsTestCase(JWTAuthMixin, APITestCase):
 
                 self.assertEqual(event.forwarded_msg, request_data)
 
-                mocked_task.assert_called_with(event.id)
+                self.assertTrue(OutboxEntry.objects.filter(event=event).exists())
+
+    def test_no_publish_on_request(self):
+        """
+        test /events POST:
+        check that the event is not published to the broker on the request
+        """
+        DomainFactory.create(name="nl.vng.zaken")
+
+        data = {
+            "id": str(uuid4()),
+            "specversion": "1.0",
+            "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+            "domain": "nl.vng.zaken",
+            "type": "nl.vng.zaken.status_gewijzigd",
+            "data": {"foo": "bar"},
+        }
+
+        event_url = get_operation_url("events_create")
+
+        with patch("nrc.api.tasks.deliver_message.apply_async") as mocked_publish:
+            response = self.client.post(event_url, data)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        mocked_publish.assert_not_called()
+
+    def test_event_rolled_back_with_outbox(self):
+        """
+        test /events POST:
+        check that the event is not stored without its outbox entry
+        """
+        DomainFactory.create(name="nl.vng.zaken")
+
+        data = {
+            "id": str(uuid4()),
+            "specversion": "1.0",
+            "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+            "domain": "nl.vng.zaken",
+            "type": "nl.vng.zaken.status_gewijzigd",
+            "data": {"foo": "bar"},
+        }
+
+        event_url = get_operation_url("events_create")
+
+        with patch(
+            "nrc.api.serializers.OutboxEntry.objects.create",
+            side_effect=DatabaseError("connection lost"),
+        ):
+            response = self.client.post(event_url, data)
+
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertFalse(Event.objects.exists())
+
+
+@override_settings(
+    LINK_FETCHER="vng_api_common.mocks.link_fetcher_200",
+    ZDS_CLIENT_CLASS="vng_api_common.mocks.MockClient",
+)
+class EventBatchTestCase(JWTAuthMixin, APITestCase):
+    heeft_alle_autorisaties = True
+
+    url = get_operation_url("events_batch_create")
+
+    def setUp(self):
+        super().setUp()
+
+        DomainFactory.create(name="nl.vng.zaken")
+        DomainFactory.create(name="nl.vng.documenten")
+
+    def get_event_data(self, **kwargs):
+        return {
+            "id": str(uuid4()),
+            "specversion": "1.0",
+            "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+            "domain": "nl.vng.zaken",
+            "type": "nl.vng.zaken.status_gewijzigd",
+            "data": {"foo": "bar"},
+            **kwargs,
+        }
+
+    def post_batch(self, data):
+        return self.client.post(
+            self.url,
+            json.dumps(data),
+            content_type="application/cloudevents-batch+json",
+        )
+
+    def test_publish_batch(self):
+        """
+        test /events/batch POST:
+        check if the events are stored and queued for delivery at once
+        """
+        data = [
+            self.get_event_data(),
+            self.get_event_data(domain="nl.vng.documenten", data_base64="Zm9v"),
+            self.get_event_data(customAttribute="foo"),
+        ]
+        del data[1]["data"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_batch(data)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(
+            [event["id"] for event in response.json()], [event["id"] for event in data]
+        )
+
+        events = Event.objects.order_by("pk")
+
+        self.assertEqual([event.forwarded_msg for event in events], data)
+        self.assertEqual(events[1].domain.name, "nl.vng.documenten")
+        self.assertEqual(
+            set(OutboxEntry.objects.values_list("event", flat=True)),
+            {event.pk for event in events},
+        )
+
+        inserts = [
+            query
+            for query in queries.captured_queries
+            if query["sql"].startswith("INSERT")
+        ]
+        self.assertEqual(len(inserts), 2)
+
+    def test_publish_batch_json(self):
+        """
+        test /events/batch POST:
+        check if the batch is accepted as application/json
+        """
+        response = self.client.post(self.url, [self.get_event_data()], format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(Event.objects.count(), 1)
+
+    def test_invalid_events(self):
+        """
+        test /events/batch POST:
+        check if the errors are reported per event and nothing is published
+        """
+        data = [
+            self.get_event_data(),
+            self.get_event_data(domain="nl.vng.unknown"),
+            self.get_event_data(data=None),
+        ]
+        del data[2]["data"]
+
+        response = self.post_batch(data)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_400_BAD_REQUEST, response.data
+        )
+
+        self.assertEqual(
+            get_validation_errors(response, "events.1.domain")["code"],
+            "does_not_exist",
+        )
+        self.assertEqual(
+            get_validation_errors(response, "events.2.nonFieldErrors")["reason"],
+            _("Data of data_base64 dient aanwezig te zijn."),
+        )
+        self.assertFalse(Event.objects.exists())
+        self.assertFalse(OutboxEntry.objects.exists())
+
+    def test_not_a_list(self):
+        """
+        test /events/batch POST:
+        check if a single event is rejected
+        """
+        response = self.post_batch(self.get_event_data())
+
+        self.assertEqual(
+            response.status_code, status.HTTP_400_BAD_REQUEST, response.data
+        )
+        self.assertEqual(
+            get_validation_errors(response, "events.nonFieldErrors")["code"],
+            "not_a_list",
+        )
+
+    @override_settings(EVENT_BATCH_MAX_SIZE=2)
+    def test_batch_too_large(self):
+        """
+        test /events/batch POST:
+        check if the size of the batch is limited
+        """
+        response = self.post_batch([self.get_event_data() for _ in range(3)])
+
+        self.assertEqual(
+            response.status_code, status.HTTP_400_BAD_REQUEST, response.data
+        )
+        self.assertEqual(
+            get_validation_errors(response, "events.nonFieldErrors")["code"],
+            "max_length",
+        )
+        self.assertFalse(Event.objects.exists())
+
+
+@override_settings(
+    LINK_FETCHER="vng_api_common.mocks.link_fetcher_200",
+    ZDS_CLIENT_CLASS="vng_api_common.mocks.MockClient",
+    EVENT_DEDUPLICATION_TTL=3600,
+)
+class EventDeduplicationTestCase(JWTAuthMixin, APITestCase):
+    heeft_alle_autorisaties = True
+
+    url = get_operation_url("events_create")
+    batch_url = get_operation_url("events_batch_create")
+
+    def setUp(self):
+        super().setUp()
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        DomainFactory.create(name="nl.vng.zaken")
+
+    def get_event_data(self, **kwargs):
+        return {
+            "id": str(uuid4()),
+            "specversion": "1.0",
+            "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+            "domain": "nl.vng.zaken",
+            "type": "nl.vng.zaken.status_gewijzigd",
+            "data": {"foo": "bar"},
+            **kwargs,
+        }
+
+    def test_replay(self):
+        """
+        test /events POST:
+        check that a replayed event is accepted, but not published again
+        """
+        data = self.get_event_data()
+
+        self.client.post(self.url, data)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(Event.objects.count(), 1)
+        self.assertEqual(OutboxEntry.objects.count(), 1)
+        self.assertFalse(
+            [
+                query
+                for query in queries.captured_queries
+                if "datamodel_event" in query["sql"]
+            ]
+        )
+
+    def test_replay_not_cached(self):
+        """
+        test /events POST:
+        check that a replayed event is not published again after it is
+        forgotten by the cache
+        """
+        data = self.get_event_data()
+
+        self.client.post(self.url, data)
+        cache.clear()
+
+        response = self.client.post(self.url, data)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(Event.objects.count(), 1)
+        self.assertEqual(OutboxEntry.objects.count(), 1)
+
+    def test_same_id_other_source(self):
+        """
+        test /events POST:
+        check that the id only identifies an event within its source
+        """
+        data = self.get_event_data()
+
+        self.client.post(self.url, data)
+        response = self.client.post(
+            self.url, {**data, "source": "urn:nld:oin:00000001234567890000"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(Event.objects.count(), 2)
+
+    def test_replay_batch(self):
+        """
+        test /events/batch POST:
+        check that replayed events are not published again, within and
+        across batches
+        """
+        published, cached = self.get_event_data(), self.get_event_data()
+        self.client.post(self.url, published)
+        self.client.post(self.url, cached)
+        cache.delete(
+            get_cache_key((published["source"], published["id"])),
+        )
+
+        new = self.get_event_data()
+        response = self.client.post(
+            self.batch_url, [published, new, cached, new], format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(len(response.json()), 4)
+        self.assertEqual(
+            set(Event.objects.values_list("cloudevent_id", flat=True)),
+            {published["id"], cached["id"], new["id"]},
+        )
+        self.assertEqual(OutboxEntry.objects.count(), 3)
+
+    def test_concurrent_batch(self):
+        """
+        test /events/batch POST:
+        check that events published concurrently, after they were checked,
+        are skipped instead of failing the batch
+        """
+        concurrent, new = self.get_event_data(), self.get_event_data()
+        remove_published = serializers.remove_published
+
+        def publish_concurrently(events):
+            removed = remove_published(events)
+
+            if not Event.objects.filter(cloudevent_id=concurrent["id"]).exists():
+                self.client.post(self.url, concurrent)
+                cache.clear()
+
+            return removed
+
+        with patch(
+            "nrc.api.serializers.remove_published", side_effect=publish_concurrently
+        ):
+            response = self.client.post(
+                self.batch_url, [concurrent, new], format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(
+            set(Event.objects.values_list("cloudevent_id", flat=True)),
+            {concurrent["id"], new["id"]},
+        )
+        self.assertEqual(OutboxEntry.objects.count(), 2)
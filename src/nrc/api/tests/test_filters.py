@@ -0,0 +1,149 @@
+import os
+import timeit
+from unittest import skipUnless
+from uuid import uuid4
+
+from django.test import TestCase
+
+from nrc.datamodel.tests.factories import SubscriptionFactory
+
+from ..filters import (
+    AllFilterNode,
+    get_filter_attributes,
+    get_required_criteria,
+    get_subscription_predicate,
+)
+
+FILTERS = [
+    {
+        "any": [
+            {
+                "all": [
+                    {"exact": {"domain": "nl.vng.zaken"}},
+                    {
+                        "any": [
+                            {"exact": {"type": "nl.vng.zaken.zaak_gesloten"}},
+                            {"exact": {"type": "nl.vng.zaken.zaak_geopend"}},
+                        ]
+                    },
+                ]
+            },
+            {
+                "all": [
+                    {"exact": {"domain": "nl.vng.burgerzaken"}},
+                    {"prefix": {"type": "nl.vng.burgerzaken.kind_"}},
+                ]
+            },
+        ]
+    },
+    {"not": {"suffix": {"source": ":Testsysteem"}}},
+]
+
+EVENT_DATA = {
+    "id": str(uuid4()),
+    "specversion": "1.0",
+    "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+    "domain": "nl.vng.zaken",
+    "type": "nl.vng.zaken.zaak_geopend",
+    "data": {"foo": "bar"},
+}
+
+
+class CompiledFilterTests(TestCase):
+    def test_compiled_filter(self):
+        predicate = AllFilterNode(FILTERS).compile()
+
+        self.assertTrue(predicate(get_filter_attributes(EVENT_DATA)))
+        self.assertFalse(
+            predicate(get_filter_attributes({**EVENT_DATA, "type": "nl.vng.zaken.foo"}))
+        )
+        self.assertTrue(
+            predicate(
+                get_filter_attributes(
+                    {
+                        **EVENT_DATA,
+                        "domain": "nl.vng.burgerzaken",
+                        "type": "nl.vng.burgerzaken.kind_geboren",
+                    }
+                )
+            )
+        )
+        self.assertFalse(
+            predicate(
+                get_filter_attributes(
+                    {
+                        **EVENT_DATA,
+                        "source": "urn:nld:oin:00000001234567890000:Testsysteem",
+                    }
+                )
+            )
+        )
+
+    def test_case_insensitive_attributes(self):
+        predicate = AllFilterNode([{"exact": {"zaakType": "foo"}}]).compile()
+
+        self.assertTrue(predicate(get_filter_attributes({"ZAAKTYPE": "foo"})))
+        self.assertFalse(predicate(get_filter_attributes({"zaaktype": "bar"})))
+        self.assertFalse(predicate(get_filter_attributes({"zaaktype": 1})))
+
+    def test_invalid_filter(self):
+        with self.assertRaises(ValueError):
+            AllFilterNode([{"exact": {}}]).compile()
+
+    def test_required_criteria(self):
+        self.assertEqual(
+            get_required_criteria(
+                [
+                    {"exact": {"bronOrganisatie": "000000000", "domain": "nl.vng"}},
+                    {"prefix": {"type": "nl.vng.zaken."}},
+                    {"not": {"exact": {"domain": "nl.vng.documenten"}}},
+                    {"any": [{"suffix": {"type": "_gesloten"}}]},
+                ]
+            ),
+            [
+                ("exact", "bronorganisatie", "000000000"),
+                ("exact", "domain", "nl.vng"),
+                ("prefix", "type", "nl.vng.zaken."),
+            ],
+        )
+        self.assertEqual(get_required_criteria({}), [])
+
+    def test_subscription_predicate_cached(self):
+        subscription = SubscriptionFactory.create(filters=FILTERS)
+
+        predicate = get_subscription_predicate(subscription)
+
+        self.assertIs(get_subscription_predicate(subscription), predicate)
+
+        # a modified subscription is recompiled
+        subscription.filters = [{"exact": {"type": "nl.vng.zaken.foo"}}]
+        subscription.save()
+
+        new_predicate = get_subscription_predicate(subscription)
+
+        self.assertIsNot(new_predicate, predicate)
+        self.assertFalse(new_predicate(get_filter_attributes(EVENT_DATA)))
+
+    def test_subscription_without_filters(self):
+        subscription = SubscriptionFactory.create(filters={})
+
+        predicate = get_subscription_predicate(subscription)
+
+        self.assertTrue(predicate(get_filter_attributes(EVENT_DATA)))
+
+    # timings are unreliable on shared CI runners, run with RUN_BENCHMARKS=1
+    @skipUnless(os.getenv("RUN_BENCHMARKS"), "benchmarks are not enabled")
+    def test_cached_predicate_benchmark(self):
+        subscription = SubscriptionFactory.create(filters=FILTERS)
+        attributes = get_filter_attributes(EVENT_DATA)
+
+        def uncached():
+            return AllFilterNode(subscription.filters).compile()(attributes)
+
+        def cached():
+            return get_subscription_predicate(subscription)(attributes)
+
+        uncached_time = min(timeit.repeat(uncached, number=1000, repeat=3))
+        cached_time = min(timeit.repeat(cached, number=1000, repeat=3))
+
+        self.assertLess(cached_time * 3, uncached_time)
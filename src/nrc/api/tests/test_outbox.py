@@ -0,0 +1,90 @@
+from io import StringIO
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.core.management import call_command
+from django.test import override_settings
+
+import requests_mock
+from rest_framework.test import APITestCase
+
+from nrc.datamodel.models import EventResponse, OutboxEntry
+from nrc.datamodel.tests.factories import (
+    DomainFactory,
+    EventFactory,
+    SubscriptionFactory,
+)
+
+from ..outbox import relay_outbox
+
+
+class OutboxRelayTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.domain = DomainFactory.create(name="nl.vng.zaken")
+        self.events = [
+            EventFactory.create(
+                domain=self.domain,
+                forwarded_msg={
+                    "id": str(uuid4()),
+                    "specversion": "1.0",
+                    "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+                    "domain": "nl.vng.zaken",
+                    "type": "nl.vng.zaken.status_gewijzigd",
+                },
+            )
+            for _ in range(3)
+        ]
+
+        for event in self.events:
+            OutboxEntry.objects.create(event=event)
+
+    def test_relay_in_batches(self):
+        with patch("nrc.api.outbox.group") as mocked_group:
+            self.assertEqual(relay_outbox(batch_size=2), 2)
+
+            signatures = list(mocked_group.call_args[0][0])
+
+            self.assertEqual(
+                [signature.task for signature in signatures],
+                ["nrc.api.tasks.deliver_message"] * 2,
+            )
+            self.assertEqual(
+                [signature.args for signature in signatures],
+                [(event.id,) for event in self.events[:2]],
+            )
+            mocked_group.return_value.apply_async.assert_called_once_with()
+
+            self.assertEqual(OutboxEntry.objects.get().event, self.events[2])
+
+            self.assertEqual(relay_outbox(batch_size=2), 1)
+            self.assertEqual(relay_outbox(batch_size=2), 0)
+
+        self.assertFalse(OutboxEntry.objects.exists())
+
+    def test_relay_failed_publish(self):
+        with patch("nrc.api.outbox.group") as mocked_group:
+            mocked_group.return_value.apply_async.side_effect = ConnectionError
+
+            with self.assertRaises(ConnectionError):
+                relay_outbox()
+
+        self.assertEqual(OutboxEntry.objects.count(), 3)
+
+    @override_settings(OUTBOX_RELAY_BATCH_SIZE=2)
+    def test_command(self):
+        subscription = SubscriptionFactory.create(
+            domain=self.domain, source=None, types=None, verified=True
+        )
+        stdout = StringIO()
+
+        with requests_mock.mock() as m:
+            m.post(subscription.sink, status_code=204)
+
+            call_command("relay_outbox", once=True, stdout=stdout)
+
+        self.assertEqual(stdout.getvalue(), "Published 3 events\n")
+        self.assertFalse(OutboxEntry.objects.exists())
+        self.assertEqual(m.call_count, 3)
+        self.assertEqual(EventResponse.objects.count(), 3)
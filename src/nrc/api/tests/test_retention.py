@@ -0,0 +1,141 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from nrc.datamodel.models import (
+    DeadLetter,
+    Event,
+    EventResponse,
+    OutboxEntry,
+    PendingDelivery,
+)
+from nrc.datamodel.tests.factories import (
+    DomainFactory,
+    EventFactory,
+    SubscriptionFactory,
+)
+
+from ..retention import get_expired_id, purge_events
+
+
+@override_settings(EVENT_PURGE_INTERVAL=0)
+class PurgeEventsTests(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        domain = DomainFactory.create(name="nl.vng.zaken")
+        self.subscription = SubscriptionFactory.create()
+
+        now = timezone.now()
+        self.before = now - timedelta(days=30)
+
+        self.expired = [
+            EventFactory.create(
+                domain=domain, forwarded_msg={}, created_on=now - timedelta(days=40)
+            )
+            for _ in range(5)
+        ]
+        self.kept = EventFactory.create(domain=domain, forwarded_msg={})
+
+        for event in [*self.expired, self.kept]:
+            EventResponse.objects.create(
+                event=event, subscription=self.subscription, response_status=204
+            )
+
+        DeadLetter.objects.create(
+            event=self.expired[0], subscription=self.subscription, attempts=6
+        )
+        PendingDelivery.objects.create(
+            event=self.expired[1], subscription=self.subscription
+        )
+        OutboxEntry.objects.create(event=self.expired[2])
+
+    def test_purge(self):
+        progress = list(purge_events(self.before, batch_size=2))
+
+        self.assertEqual(Event.objects.get(), self.kept)
+        self.assertEqual(EventResponse.objects.get().event, self.kept)
+        self.assertFalse(DeadLetter.objects.exists())
+        self.assertFalse(PendingDelivery.objects.exists())
+        self.assertFalse(OutboxEntry.objects.exists())
+
+        self.assertEqual([p.events for p in progress], [2, 2, 1])
+        self.assertEqual([p.event_responses for p in progress], [2, 2, 1])
+        self.assertEqual(progress[-1].done, 1)
+
+    def test_nothing_expired(self):
+        before = self.before - timedelta(days=30)
+
+        self.assertEqual(list(purge_events(before)), [])
+        self.assertEqual(Event.objects.count(), 6)
+
+    def test_not_loaded(self):
+        with CaptureQueriesContext(connection) as queries:
+            next(purge_events(self.before, batch_size=2))
+
+        statements = [
+            query["sql"].split()[0]
+            for query in queries.captured_queries
+            if not query["sql"].startswith(("SAVEPOINT", "RELEASE SAVEPOINT"))
+        ]
+
+        # the bounds of the expired events, followed by the batch with its
+        # restored events which are kept
+        deletes = statements.index("DELETE")
+        self.assertEqual(set(statements[:deletes]), {"SELECT"})
+        self.assertEqual(statements[deletes:], ["DELETE"] * 5)
+
+    def test_expired_id(self):
+        self.assertEqual(get_expired_id(self.before), self.expired[-1].pk)
+        self.assertEqual(get_expired_id(timezone.now()), self.kept.pk)
+        self.assertIsNone(get_expired_id(self.before - timedelta(days=30)))
+
+    def test_expired_id_without_events(self):
+        Event.objects.all().delete()
+
+        self.assertIsNone(get_expired_id(self.before))
+
+    def test_throttled(self):
+        with patch("nrc.api.retention.time.sleep") as mocked_sleep:
+            list(purge_events(self.before, batch_size=2, interval=1.5))
+
+        # not after the last batch
+        self.assertEqual(mocked_sleep.call_count, 2)
+        mocked_sleep.assert_called_with(1.5)
+
+    def test_resumed(self):
+        purged = purge_events(self.before, batch_size=2)
+        next(purged)
+        purged.close()
+
+        self.assertEqual(Event.objects.count(), 4)
+
+        progress = list(purge_events(self.before, batch_size=2))
+
+        self.assertEqual([p.events for p in progress], [2, 1])
+        self.assertEqual(Event.objects.get(), self.kept)
+
+    def test_command(self):
+        stdout = StringIO()
+
+        call_command("purge_events", days=30, verbosity=2, stdout=stdout)
+
+        lines = stdout.getvalue().splitlines()
+
+        self.assertTrue(lines[0].startswith("Purging the events created before"))
+        self.assertEqual(lines[1], "Purged 5 events and 5 event responses (100%)")
+        self.assertEqual(lines[2], "Purged 5 events and 5 event responses")
+        self.assertEqual(Event.objects.get(), self.kept)
+
+    @override_settings(EVENT_RETENTION_DAYS=0)
+    def test_command_without_retention(self):
+        with self.assertRaises(CommandError):
+            call_command("purge_events", stdout=StringIO())
+
+        self.assertEqual(Event.objects.count(), 6)
@@ -0,0 +1,182 @@
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.test import SimpleTestCase, override_settings
+
+import requests
+import requests_mock
+from rest_framework.test import APITestCase
+
+from nrc.datamodel.models import EventResponse
+from nrc.datamodel.tests.factories import (
+    DomainFactory,
+    EventFactory,
+    SubscriptionFactory,
+)
+
+from ..retries import RetryPolicy
+from ..tasks import deliver_message
+
+
+class RetryPolicyTests(SimpleTestCase):
+    def test_should_retry(self):
+        policy = RetryPolicy(max_retries=2, backoff=30, backoff_max=3600)
+
+        self.assertTrue(policy.should_retry(1))
+        self.assertTrue(policy.should_retry(1, 500))
+        self.assertTrue(policy.should_retry(1, 503))
+        self.assertTrue(policy.should_retry(1, 408))
+        self.assertTrue(policy.should_retry(2, 429))
+        self.assertFalse(policy.should_retry(1, 204))
+        self.assertFalse(policy.should_retry(1, 400))
+        self.assertFalse(policy.should_retry(1, 404))
+        self.assertFalse(policy.should_retry(3, 500))
+        self.assertFalse(policy.should_retry(3))
+
+    def test_delay(self):
+        policy = RetryPolicy(max_retries=10, backoff=30, backoff_max=300)
+
+        for attempt, delay in [(1, 30), (2, 60), (3, 120), (4, 240), (5, 300)]:
+            with self.subTest(attempt=attempt):
+                for _ in range(100):
+                    self.assertGreaterEqual(policy.get_delay(attempt), delay / 2)
+                    self.assertLessEqual(policy.get_delay(attempt), delay)
+
+    @override_settings(
+        DELIVERY_MAX_RETRIES=5,
+        DELIVERY_RETRY_BACKOFF=30,
+        DELIVERY_RETRY_BACKOFF_MAX=3600,
+    )
+    def test_from_subscription(self):
+        subscription = SubscriptionFactory.build(
+            protocol_settings={"retry": {"max_retries": 2, "backoff": 10}}
+        )
+
+        policy = RetryPolicy.from_subscription(subscription)
+
+        self.assertEqual(policy.max_retries, 2)
+        self.assertEqual(policy.backoff, 10)
+        self.assertEqual(policy.backoff_max, 3600)
+
+    @override_settings(
+        DELIVERY_MAX_RETRIES=5,
+        DELIVERY_RETRY_BACKOFF=30,
+        DELIVERY_RETRY_BACKOFF_MAX=3600,
+    )
+    def test_from_subscription_defaults(self):
+        subscription = SubscriptionFactory.build(protocol_settings={})
+
+        policy = RetryPolicy.from_subscription(subscription)
+
+        self.assertEqual(policy.max_retries, 5)
+        self.assertEqual(policy.backoff, 30)
+        self.assertEqual(policy.backoff_max, 3600)
+
+
+class EventRetryTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.domain = DomainFactory.create(name="nl.vng.zaken")
+        self.event = EventFactory.create(
+            domain=self.domain,
+            forwarded_msg={
+                "id": str(uuid4()),
+                "specversion": "1.0",
+                "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+                "domain": "nl.vng.zaken",
+                "type": "nl.vng.zaken.status_gewijzigd",
+            },
+        )
+
+    def test_retry_until_delivered(self):
+        subscription = SubscriptionFactory.create(
+            domain=self.domain,
+            source=None,
+            types=None,
+            protocol_settings={"retry": {"max_retries": 3}},
+            verified=True,
+        )
+
+        with requests_mock.mock() as m:
+            m.post(
+                subscription.sink,
+                [
+                    {"status_code": 503},
+                    {"exc": requests.exceptions.ConnectTimeout("timed out")},
+                    {"status_code": 204},
+                ],
+            )
+
+            deliver_message(self.event.id)
+
+        self.assertEqual(m.call_count, 3)
+
+        responses = EventResponse.objects.order_by("attempt")
+
+        self.assertEqual(
+            [
+                (response.attempt, response.response_status, response.exception)
+                for response in responses
+            ],
+            [(1, 503, ""), (2, None, "timed out"), (3, 204, "")],
+        )
+
+    def test_retries_exhausted(self):
+        subscription = SubscriptionFactory.create(
+            domain=self.domain,
+            source=None,
+            types=None,
+            protocol_settings={"retry": {"max_retries": 2}},
+            verified=True,
+        )
+
+        with requests_mock.mock() as m:
+            m.post(subscription.sink, status_code=500)
+
+            deliver_message(self.event.id)
+
+        self.assertEqual(m.call_count, 3)
+        self.assertEqual(
+            list(
+                EventResponse.objects.order_by("attempt").values_list(
+                    "attempt", flat=True
+                )
+            ),
+            [1, 2, 3],
+        )
+
+    def test_no_retry_on_client_error(self):
+        subscription = SubscriptionFactory.create(
+            domain=self.domain, source=None, types=None, verified=True
+        )
+
+        with requests_mock.mock() as m:
+            m.post(subscription.sink, status_code=400)
+
+            deliver_message(self.event.id)
+
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual(EventResponse.objects.get().attempt, 1)
+
+    def test_retry_scheduled_with_backoff(self):
+        subscription = SubscriptionFactory.create(
+            domain=self.domain,
+            source=None,
+            types=None,
+            protocol_settings={"retry": {"backoff": 60}},
+            verified=True,
+        )
+
+        with requests_mock.mock() as m, patch(
+            "nrc.api.tasks.deliver_to_subscriptions.apply_async"
+        ) as mocked_apply_async, patch(
+            "nrc.api.retries.random.uniform", return_value=0
+        ):
+            m.post(subscription.sink, status_code=502)
+
+            deliver_message(self.event.id)
+
+        mocked_apply_async.assert_called_once_with(
+            (self.event.id, [subscription.pk]), {"attempt": 2}, countdown=30
+        )
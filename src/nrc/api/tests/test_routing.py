@@ -0,0 +1,257 @@
+from uuid import uuid4
+
+from django.test import TestCase, override_settings
+
+from nrc.datamodel.choices import VerificationStatusChoices
+from nrc.datamodel.tests.factories import (
+    DomainFactory,
+    EventFactory,
+    SubscriptionFactory,
+)
+
+from ..filters import get_filter_attributes
+from ..routing import get_subscription_index
+
+
+class SubscriptionIndexTests(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.domain = DomainFactory.create(name="nl.vng.zaken")
+        self.event = EventFactory.create(
+            forwarded_msg={
+                "id": str(uuid4()),
+                "specversion": "1.0",
+                "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+                "domain": "nl.vng.zaken",
+                "type": "nl.vng.zaken.status_gewijzigd",
+                "data": {"foo": "bar"},
+            },
+            domain=self.domain,
+        )
+
+    def test_match(self):
+        wildcard = SubscriptionFactory.create(
+            domain=None, source=None, types=None, verified=True
+        )
+        matching = SubscriptionFactory.create(
+            domain=self.domain,
+            source="urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+            types=["nl.vng.zaken.zaak_gesloten", "nl.vng.zaken.status_gewijzigd"],
+            verified=True,
+        )
+        # different domain
+        SubscriptionFactory.create(
+            domain=DomainFactory.create(name="nl.vng.documenten"),
+            source=None,
+            types=[],
+            verified=True,
+        )
+        # different type
+        SubscriptionFactory.create(
+            domain=self.domain,
+            source=None,
+            types=["nl.vng.zaken.zaak_gesloten"],
+            verified=True,
+        )
+        # different source
+        SubscriptionFactory.create(
+            domain=None,
+            source="urn:nld:oin:00000001234567890000:systeem:Documentsysteem",
+            types=None,
+            verified=True,
+        )
+
+        routes = get_subscription_index().match(self.event)
+
+        self.assertEqual([route.pk for route in routes], [matching.pk, wildcard.pk])
+
+    def test_match_without_queries(self):
+        SubscriptionFactory.create(
+            domain=self.domain, source=None, types=None, verified=True
+        )
+
+        index = get_subscription_index()
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_subscription_index(), index)
+            self.assertEqual(len(index.match(self.event)), 1)
+
+    def test_rebuilt_on_changes(self):
+        subscription = SubscriptionFactory.create(
+            domain=self.domain, source=None, types=None, verified=True
+        )
+
+        self.assertEqual(len(get_subscription_index().match(self.event)), 1)
+
+        subscription.types = ["nl.vng.zaken.zaak_gesloten"]
+        subscription.save()
+
+        self.assertEqual(len(get_subscription_index().match(self.event)), 0)
+
+        subscription.delete()
+        SubscriptionFactory.create(domain=None, source=None, types=None, verified=True)
+
+        self.assertEqual(len(get_subscription_index().match(self.event)), 1)
+
+    def test_unverified_sinks(self):
+        subscription = SubscriptionFactory.create(
+            domain=self.domain,
+            source=None,
+            types=None,
+            verification_status=VerificationStatusChoices.pending,
+        )
+        SubscriptionFactory.create(
+            domain=self.domain,
+            source=None,
+            types=None,
+            verification_status=VerificationStatusChoices.failed,
+        )
+
+        self.assertEqual(len(get_subscription_index().match(self.event)), 0)
+
+        subscription.verification_status = VerificationStatusChoices.verified
+        subscription.save()
+
+        self.assertEqual(len(get_subscription_index().match(self.event)), 1)
+
+    def test_rebuilt_on_domain_changes(self):
+        SubscriptionFactory.create(
+            domain=self.domain, source=None, types=None, verified=True
+        )
+        self.event.forwarded_msg["zaaktype"] = "https://ztc.nl/zaaktypen/1"
+
+        self.assertEqual(len(get_subscription_index().match(self.event)), 1)
+
+        self.domain.filter_attributes = ["bronorganisatie"]
+        self.domain.save()
+
+        self.assertEqual(len(get_subscription_index().match(self.event)), 0)
+
+    def test_exact_filter_index(self):
+        matching = SubscriptionFactory.create(
+            domain=self.domain,
+            source=None,
+            types=None,
+            filters=[{"exact": {"bronorganisatie": "000000000"}}],
+            verified=True,
+        )
+        SubscriptionFactory.create_batch(
+            5,
+            domain=self.domain,
+            source=None,
+            types=None,
+            filters=[{"exact": {"bronorganisatie": "111111111"}}],
+            verified=True,
+        )
+        unindexed = SubscriptionFactory.create(
+            domain=self.domain,
+            source=None,
+            types=None,
+            filters=[{"not": {"exact": {"bronorganisatie": "111111111"}}}],
+            verified=True,
+        )
+        self.event.forwarded_msg["bronOrganisatie"] = "000000000"
+
+        index = get_subscription_index()
+        candidates = index.get_candidates(
+            self.event, get_filter_attributes(self.event.forwarded_msg)
+        )
+
+        self.assertCountEqual(
+            [route.pk for route in candidates], [matching.pk, unindexed.pk]
+        )
+        self.assertCountEqual(
+            [route.pk for route in index.match(self.event)],
+            [matching.pk, unindexed.pk],
+        )
+
+    def test_prefix_and_suffix_filter_index(self):
+        prefix = SubscriptionFactory.create(
+            domain=self.domain,
+            source=None,
+            types=None,
+            filters=[{"prefix": {"type": "nl.vng.zaken.status_"}}],
+            verified=True,
+        )
+        suffix = SubscriptionFactory.create(
+            domain=self.domain,
+            source=None,
+            types=None,
+            filters=[{"suffix": {"source": ":Zaaksysteem"}}],
+            verified=True,
+        )
+        SubscriptionFactory.create(
+            domain=self.domain,
+            source=None,
+            types=None,
+            filters=[{"prefix": {"type": "nl.vng.zaken.zaak_"}}],
+            verified=True,
+        )
+        SubscriptionFactory.create(
+            domain=self.domain,
+            source=None,
+            types=None,
+            filters=[{"suffix": {"source": ":Documentsysteem"}}],
+            verified=True,
+        )
+        # the prefix equals the full value
+        exact_prefix = SubscriptionFactory.create(
+            domain=self.domain,
+            source=None,
+            types=None,
+            filters=[{"prefix": {"type": "nl.vng.zaken.status_gewijzigd"}}],
+            verified=True,
+        )
+
+        index = get_subscription_index()
+        candidates = index.get_candidates(
+            self.event, get_filter_attributes(self.event.forwarded_msg)
+        )
+
+        self.assertCountEqual(
+            [route.pk for route in candidates],
+            [prefix.pk, suffix.pk, exact_prefix.pk],
+        )
+        self.assertCountEqual(
+            [route.pk for route in index.match(self.event)],
+            [prefix.pk, suffix.pk, exact_prefix.pk],
+        )
+
+    def test_invalid_filters(self):
+        SubscriptionFactory.create(
+            domain=self.domain,
+            source=None,
+            types=None,
+            filters=[{"exact": {}}],
+            verified=True,
+        )
+
+        self.assertEqual(get_subscription_index().match(self.event), [])
+
+    def test_invalid_filter_values(self):
+        # filters saved in the admin are not validated by the API
+        for filters in (
+            [{"exact": {"bronorganisatie": ["000000000"]}}],
+            [{"prefix": {"source": 5}}],
+        ):
+            SubscriptionFactory.create(
+                domain=self.domain,
+                source=None,
+                types=None,
+                filters=filters,
+                verified=True,
+            )
+        valid = SubscriptionFactory.create(
+            domain=self.domain, source=None, types=None, verified=True
+        )
+
+        routes = get_subscription_index().match(self.event)
+
+        self.assertEqual([route.pk for route in routes], [valid.pk])
+
+    @override_settings(ROUTING_INDEX_MAX_AGE=-1)
+    def test_rebuilt_after_max_age(self):
+        index = get_subscription_index()
+
+        self.assertIsNot(get_subscription_index(), index)
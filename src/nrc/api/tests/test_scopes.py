@@ -1,4 +1,3 @@
-from unittest.mock import patch
 from uuid import uuid4
 
 from django.test import override_settings
@@ -363,13 +362,12 @@ class ScopeSubscriptionsTestCase(JWTAuthMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN, response.data)
 
 
-@patch("nrc.api.serializers.deliver_message.delay")
 @override_settings(
     LINK_FETCHER="vng_api_common.mocks.link_fetcher_200",
     ZDS_CLIENT_CLASS="vng_api_common.mocks.MockClient",
 )
 class ScopeEventsTestcase(JWTAuthMixin, APITestCase):
-    def test_correct_scope_publish(self, mocked_task):
+    def test_correct_scope_publish(self):
         """
         test /events POST:
         create event with correct scope SCOPE_EVENTS_PUBLISH
@@ -400,7 +398,7 @@ class ScopeEventsTestcase(JWTAuthMixin, APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
 
-    def test_incorrect_scope_publish(self, mocked_task):
+    def test_incorrect_scope_publish(self):
         """
         test /events POST:
         create event with incorrect scope SCOPE_SUBSCRIPTIONS_CREATE
@@ -430,3 +428,29 @@ class ScopeEventsTestcase(JWTAuthMixin, APITestCase):
         response = self.client.post(event_url, data)
 
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN, response.data)
+
+    def test_incorrect_scope_publish_batch(self):
+        """
+        test /events/batch POST:
+        create events with incorrect scope SCOPE_SUBSCRIPTIONS_CREATE
+        """
+        self.autorisatie.scopes = [SCOPE_SUBSCRIPTIONS_CREATE]
+        self.autorisatie.save()
+        DomainFactory.create(name="nl.vng.zaken")
+
+        data = [
+            {
+                "id": str(uuid4()),
+                "specversion": "1.0",
+                "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+                "domain": "nl.vng.zaken",
+                "type": "nl.vng.zaken.status_gewijzigd",
+                "data": {"foo": "bar", "bar": "foo"},
+            }
+        ]
+
+        event_url = get_operation_url("events_batch_create")
+
+        response = self.client.post(event_url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN, response.data)
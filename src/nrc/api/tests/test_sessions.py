@@ -0,0 +1,45 @@
+from django.test import SimpleTestCase, override_settings
+
+import requests_mock
+
+from ..sessions import close_sessions, get_origin, get_session
+
+
+class SessionPoolTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+
+        close_sessions()
+        self.addCleanup(close_sessions)
+
+    def test_get_origin(self):
+        self.assertEqual(
+            get_origin("https://Vng.Zaken.nl:8443/callback?foo=bar"),
+            "https://vng.zaken.nl:8443",
+        )
+
+    def test_session_reused_per_origin(self):
+        session = get_session("https://vng.zaken.nl/callback")
+
+        self.assertIs(get_session("https://vng.zaken.nl/other-callback"), session)
+        self.assertIsNot(get_session("https://vng.documenten.nl/callback"), session)
+
+    @override_settings(HTTP_POOL_IDLE_TIMEOUT=-1)
+    def test_idle_session_evicted(self):
+        session = get_session("https://vng.zaken.nl/callback")
+
+        self.assertIsNot(get_session("https://vng.zaken.nl/callback"), session)
+
+    def test_cookies_not_persisted(self):
+        session = get_session("https://vng.zaken.nl/callback")
+
+        with requests_mock.mock() as m:
+            m.post(
+                "https://vng.zaken.nl/callback",
+                headers={"Set-Cookie": "sessionid=foo; Path=/"},
+            )
+            session.post("https://vng.zaken.nl/callback")
+            session.post("https://vng.zaken.nl/callback")
+
+        self.assertEqual(len(session.cookies), 0)
+        self.assertNotIn("Cookie", m.last_request.headers)
@@ -1,6 +1,10 @@
+from unittest.mock import Mock, patch
 from uuid import uuid4
 
-from django.test import override_settings
+from django.contrib import admin
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
 from django.utils.translation import gettext as _
 
 import requests_mock
@@ -9,7 +13,10 @@ from rest_framework.test import APITestCase
 from vng_api_common.tests import JWTAuthMixin, get_operation_url
 from vng_api_common.tests.schema import get_validation_errors
 
-from nrc.datamodel.choices import ProtocolChoices
+from nrc.accounts.models import User
+from nrc.api.tasks import verify_subscription
+from nrc.api.verification import get_verification_key, remember_verified
+from nrc.datamodel.choices import ProtocolChoices, VerificationStatusChoices
 from nrc.datamodel.models import Domain, Subscription
 from nrc.datamodel.tests.factories import DomainFactory, SubscriptionFactory
 
@@ -278,6 +285,361 @@ class SubscriptionsTestCase(JWTAuthMixin, APITestCase):
         self.assertEqual(subscription.subscriber_reference, None)
         self.assertEqual(subscription.types, None)
 
+    def test_subscriptions_create_retry_settings(self):
+        """
+        test /subscriptions POST:
+        create subscription with a retry policy in the protocol settings
+        """
+        subscription_create_url = get_operation_url("subscription_create")
+
+        data = {
+            "protocol": ProtocolChoices.HTTP,
+            "sink": "https://endpoint.example.com/webhook",
+            "protocol_settings": {
+                "retry": {"max_retries": 3, "backoff": 10, "backoff_max": 600},
+            },
+        }
+
+        with requests_mock.mock() as m:
+            m.register_uri(
+                "POST",
+                "https://endpoint.example.com/webhook",
+                status_code=204,
+            )
+            response = self.client.post(subscription_create_url, data)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+        subscription = Subscription.objects.get()
+
+        self.assertEqual(
+            subscription.protocol_settings["retry"],
+            {"max_retries": 3, "backoff": 10, "backoff_max": 600},
+        )
+
+    def test_subscriptions_create_invalid_retry_settings(self):
+        """
+        test /subscriptions POST:
+        create subscription with too many retries in the protocol settings
+        """
+        subscription_create_url = get_operation_url("subscription_create")
+
+        data = {
+            "protocol": ProtocolChoices.HTTP,
+            "sink": "https://endpoint.example.com/webhook",
+            "protocol_settings": {"retry": {"max_retries": 100}},
+        }
+
+        with requests_mock.mock() as m:
+            m.register_uri(
+                "POST",
+                "https://endpoint.example.com/webhook",
+                status_code=204,
+            )
+            response = self.client.post(subscription_create_url, data)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_400_BAD_REQUEST, response.data
+        )
+        self.assertEqual(Subscription.objects.count(), 0)
+
+        error = get_validation_errors(response, "protocolSettings.retry.maxRetries")
+
+        self.assertEqual(error["code"], "max_value")
+
+
+@override_settings(
+    LINK_FETCHER="vng_api_common.mocks.link_fetcher_200",
+    ZDS_CLIENT_CLASS="vng_api_common.mocks.MockClient",
+    SINK_VERIFICATION_TTL=3600,
+)
+class SubscriptionVerificationTestCase(JWTAuthMixin, APITestCase):
+    heeft_alle_autorisaties = True
+
+    sink = "https://endpoint.example.com/webhook"
+
+    def setUp(self):
+        super().setUp()
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def get_data(self, **kwargs):
+        return {
+            "protocol": ProtocolChoices.HTTP,
+            "sink": self.sink,
+            "sinkCredential": {
+                "credentialType": "ACCESSTOKEN",
+                "accessToken": "super-sekrit-token",
+                "accessTokenExpiresUtc": "2019-08-24T14:15:22Z",
+                "accessTokenType": "bearer",
+            },
+            **kwargs,
+        }
+
+    def test_verified_in_background(self):
+        """
+        test /subscriptions POST:
+        check that the sink is verified after the subscription is stored
+        """
+        url = get_operation_url("subscription_create")
+
+        with requests_mock.mock() as m:
+            m.register_uri("POST", self.sink, status_code=204)
+
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = self.client.post(url, self.get_data())
+
+            self.assertEqual(
+                response.status_code, status.HTTP_201_CREATED, response.data
+            )
+            self.assertEqual(response.json()["verificationStatus"], "pending")
+            self.assertFalse(m.called)
+
+            for callback in callbacks:
+                callback()
+
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual(
+            Subscription.objects.get().verification_status,
+            VerificationStatusChoices.verified,
+        )
+
+    def test_verification_cached(self):
+        """
+        test /subscriptions POST:
+        check that a sink verified with the same credential is not probed again
+        """
+        url = get_operation_url("subscription_create")
+
+        with requests_mock.mock() as m:
+            m.register_uri("POST", self.sink, status_code=204)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(url, self.get_data())
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(url, self.get_data())
+
+            self.assertEqual(response.json()["verificationStatus"], "verified")
+            self.assertEqual(m.call_count, 1)
+
+            # a different credential is verified again
+            data = self.get_data()
+            data["sinkCredential"]["accessToken"] = "other-token"
+
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(url, data)
+
+            self.assertEqual(response.json()["verificationStatus"], "pending")
+            self.assertEqual(m.call_count, 2)
+
+    def test_partial_update_without_sink(self):
+        """
+        test /subscriptions PATCH:
+        check that the sink is not probed when it does not change
+        """
+        subscription = SubscriptionFactory.create(sink=self.sink, verified=True)
+        url = get_operation_url("subscription_update", uuid=subscription.uuid)
+
+        with requests_mock.mock() as m:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(url, {"types": ["Type A"]})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.json()["verificationStatus"], "verified")
+        self.assertFalse(m.called)
+
+    def test_partial_update_sink(self):
+        """
+        test /subscriptions PATCH:
+        check that a changed sink is verified again
+        """
+        subscription = SubscriptionFactory.create(sink=self.sink)
+        url = get_operation_url("subscription_update", uuid=subscription.uuid)
+        sink = "https://new.endpoint.example.com/webhook"
+
+        with requests_mock.mock() as m:
+            m.register_uri("POST", sink, status_code=400)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(url, {"sink": sink})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.json()["verificationStatus"], "pending")
+        self.assertEqual(m.call_count, 1)
+
+        subscription.refresh_from_db()
+
+        self.assertEqual(
+            subscription.verification_status, VerificationStatusChoices.failed
+        )
+
+    def test_verified_while_verified_again(self):
+        """
+        test /subscriptions PATCH:
+        check that a verified subscription keeps receiving its events while its
+        changed credential is verified again
+        """
+        subscription = SubscriptionFactory.create(sink=self.sink, verified=True)
+        url = get_operation_url("subscription_update", uuid=subscription.uuid)
+
+        retries = []
+        apply_async = verify_subscription.apply_async
+
+        def schedule(args, kwargs=None, **options):
+            if kwargs and "attempt" in kwargs:
+                retries.append(kwargs["attempt"])
+            else:
+                apply_async(args, kwargs, **options)
+
+        with requests_mock.mock() as m, patch(
+            "nrc.api.tasks.verify_subscription.apply_async", side_effect=schedule
+        ):
+            m.register_uri("POST", self.sink, status_code=503)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(url, self.get_data())
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.json()["verificationStatus"], "verified")
+        self.assertEqual(m.call_count, 1)
+
+        # the failed verification is retried
+        subscription.refresh_from_db()
+        self.assertEqual(
+            subscription.verification_status, VerificationStatusChoices.verified
+        )
+        self.assertEqual(retries, [2])
+
+    @override_settings(DELIVERY_MAX_RETRIES=2)
+    def test_verification_retried(self):
+        """
+        test /subscriptions PATCH:
+        check that a subscription fails its verification after the retries
+        """
+        subscription = SubscriptionFactory.create(sink=self.sink, verified=True)
+        url = get_operation_url("subscription_update", uuid=subscription.uuid)
+
+        with requests_mock.mock() as m:
+            m.register_uri("POST", self.sink, status_code=503)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(url, self.get_data())
+
+        self.assertEqual(m.call_count, 3)
+
+        subscription.refresh_from_db()
+        self.assertEqual(
+            subscription.verification_status, VerificationStatusChoices.failed
+        )
+
+    def test_update_failed(self):
+        """
+        test /subscriptions PATCH:
+        check that a sink which failed its verification is verified again
+        """
+        subscription = SubscriptionFactory.create(
+            sink=self.sink, verification_status=VerificationStatusChoices.failed
+        )
+        url = get_operation_url("subscription_update", uuid=subscription.uuid)
+
+        with requests_mock.mock() as m:
+            m.register_uri("POST", self.sink, status_code=204)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(url, {"types": ["Type A"]})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.json()["verificationStatus"], "pending")
+        self.assertEqual(m.call_count, 1)
+
+        subscription.refresh_from_db()
+
+        self.assertEqual(
+            subscription.verification_status, VerificationStatusChoices.verified
+        )
+
+
+class SubscriptionAdminTestCase(TestCase):
+    sink = "https://endpoint.example.com/webhook"
+
+    def setUp(self):
+        super().setUp()
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        self.model_admin = admin.site._registry[Subscription]
+
+    def test_save_new(self):
+        subscription = SubscriptionFactory.build(sink=self.sink, protocol_settings={})
+        form = Mock(changed_data=["sink"])
+
+        with requests_mock.mock() as m:
+            m.register_uri("POST", self.sink, status_code=204)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.model_admin.save_model(None, subscription, form, False)
+
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual(
+            Subscription.objects.get().verification_status,
+            VerificationStatusChoices.verified,
+        )
+
+    def test_save_changed_sink(self):
+        subscription = SubscriptionFactory.create(verified=True)
+        subscription.sink = self.sink
+
+        with requests_mock.mock() as m:
+            m.register_uri("POST", self.sink, status_code=400)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.model_admin.save_model(
+                    None, subscription, Mock(changed_data=["sink"]), True
+                )
+
+        self.assertEqual(m.call_count, 1)
+        subscription.refresh_from_db()
+        self.assertEqual(
+            subscription.verification_status, VerificationStatusChoices.failed
+        )
+
+    def test_save_unchanged_sink(self):
+        subscription = SubscriptionFactory.create(sink=self.sink, verified=True)
+
+        with requests_mock.mock() as m:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.model_admin.save_model(
+                    None, subscription, Mock(changed_data=["types"]), True
+                )
+
+        self.assertFalse(m.called)
+
+    def test_verify_sinks_action(self):
+        user = User.objects.create_superuser("admin", "admin@example.com", "secret")
+        self.client.force_login(user)
+        subscription = SubscriptionFactory.create(sink=self.sink, verified=True)
+
+        # a sink which is known to work is probed again
+        remember_verified(get_verification_key(subscription))
+
+        with requests_mock.mock() as m:
+            m.register_uri("POST", self.sink, status_code=400)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse("admin:datamodel_subscription_changelist"),
+                    {"action": "verify_sinks", "_selected_action": [subscription.pk]},
+                )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(m.call_count, 1)
+        subscription.refresh_from_db()
+        self.assertEqual(
+            subscription.verification_status, VerificationStatusChoices.failed
+        )
+
 
 class SubscriptionsCustomFilterTestCase(JWTAuthMixin, APITestCase):
     """
@@ -1,16 +1,24 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
 from uuid import uuid4
 
+from django.test import override_settings
+
+import requests
 import requests_mock
 from rest_framework.test import APITestCase
 
 from nrc.api.choices import ProtocolMethodChoices, SequencetypeChoices
+from nrc.datamodel.models import EventResponse
 from nrc.datamodel.tests.factories import (
     DomainFactory,
     EventFactory,
     SubscriptionFactory,
 )
 
-from ..tasks import deliver_message
+from ..tasks import EventPayload, deliver_message, deliver_to_subscriptions
 
 
 class EventTaskTests(APITestCase):
@@ -20,6 +28,7 @@ class EventTaskTests(APITestCase):
             source="urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
             sink="https://vng.zaken.nl/callback",
             types=[],
+            verified=True,
         )
 
         data = {
@@ -57,6 +66,7 @@ class EventTaskTests(APITestCase):
             source="urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
             sink="https://vng.zaken.nl/callback",
             types=[],
+            verified=True,
         )
 
         # different source
@@ -65,6 +75,7 @@ class EventTaskTests(APITestCase):
             source="urn:nld:oin:000000012345678910000:systeem:Zaaksysteem",
             sink="https://vng.zaken.nl/callback",
             types=[],
+            verified=True,
         )
 
         # different types
@@ -73,6 +84,7 @@ class EventTaskTests(APITestCase):
             source="urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
             sink="https://vng.zaken.nl/callback",
             types=["nl.vng.zaken.status_verlengd"],
+            verified=True,
         )
 
         data = {
@@ -105,6 +117,7 @@ class EventTaskTests(APITestCase):
             source="urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
             sink="https://vng.zaken.nl/callback",
             types=[],
+            verified=True,
         )
 
         subscription_2 = SubscriptionFactory.create(
@@ -112,6 +125,7 @@ class EventTaskTests(APITestCase):
             source="urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
             sink="https://vng.zaken.eu/callback",
             types=["nl.vng.zaken.status_gewijzigd", "nl.vng.zaken.status_verlengd"],
+            verified=True,
         )
 
         subscription_3 = SubscriptionFactory.create(
@@ -119,6 +133,7 @@ class EventTaskTests(APITestCase):
             source="urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
             sink="https://vng.generiek.nl/callback",
             types=[],
+            verified=True,
         )
 
         data = {
@@ -187,6 +202,7 @@ class EventTaskTests(APITestCase):
                 "access_token_expires_utc": "2042-05-25 14:23:53.119Z",
                 "access_token_type": "bearer",
             },
+            verified=True,
         )
 
         subscription_2 = SubscriptionFactory.create(
@@ -199,6 +215,7 @@ class EventTaskTests(APITestCase):
                 "access_token_expires_utc": "2042-05-25 14:23:53.119Z",
                 "access_token_type": "bearer",
             },
+            verified=True,
         )
 
         data = {
@@ -262,6 +279,7 @@ class EventTaskTests(APITestCase):
                 },
                 "method": ProtocolMethodChoices.post.value,
             },
+            verified=True,
         )
 
         subscription_2 = SubscriptionFactory.create(
@@ -275,6 +293,7 @@ class EventTaskTests(APITestCase):
                 },
                 "method": ProtocolMethodChoices.post.value,
             },
+            verified=True,
         )
 
         data = {
@@ -348,6 +367,7 @@ class EventTaskTests(APITestCase):
                 },
                 "method": ProtocolMethodChoices.post.value,
             },
+            verified=True,
         )
 
         data = {
@@ -388,6 +408,7 @@ class EventTaskTests(APITestCase):
             subscriber_reference=str(subscriber_reference),
             sink="https://vng.zaken.nl/callback",
             types=[],
+            verified=True,
         )
 
         data = {
@@ -433,6 +454,7 @@ class EventTaskTests(APITestCase):
             subscriber_reference=None,
             sink="https://vng.zaken.nl/callback",
             types=[],
+            verified=True,
         )
 
         data = {
@@ -476,6 +498,7 @@ class EventTaskTests(APITestCase):
             source="urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
             sink="https://vng.zaken.nl/callback",
             types=[],
+            verified=True,
         )
 
         data = {
@@ -513,6 +536,7 @@ class EventTaskTests(APITestCase):
             sink="https://vng.zaken.nl/callback",
             source=None,
             types=None,
+            verified=True,
         )
 
         data = {
@@ -558,6 +582,217 @@ class EventTaskTests(APITestCase):
             set(request.url for request in m.request_history), (subscription.sink,)
         )
 
+    @override_settings(DELIVERY_CHUNK_SIZE=3, DELIVERY_MAX_WORKERS=3)
+    def test_concurrent_delivery(self):
+        domain = DomainFactory(name="nl.vng.zaken")
+        subscriptions = SubscriptionFactory.create_batch(
+            3, domain=domain, source=None, types=None, verified=True
+        )
+
+        data = {
+            "id": str(uuid4()),
+            "specversion": "1.0",
+            "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+            "domain": "nl.vng.zaken",
+            "type": "nl.vng.zaken.status_gewijzigd",
+            "data": {"foo": "bar", "bar": "foo"},
+        }
+
+        event = EventFactory.create(forwarded_msg=data, domain=domain)
+
+        # only passes when all sinks are called at the same time
+        barrier = threading.Barrier(3, timeout=5)
+
+        def callback(request, context):
+            barrier.wait()
+            context.status_code = 204
+
+        with requests_mock.mock() as m:
+            for subscription in subscriptions:
+                m.post(subscription.sink, text=callback)
+
+            deliver_message(event.id)
+
+        self.assertEqual(len(m.request_history), 3)
+        self.assertEqual(
+            EventResponse.objects.filter(event=event, response_status=204).count(), 3
+        )
+
+    @override_settings(DELIVERY_CHUNK_SIZE=2)
+    def test_delivery_fan_out(self):
+        domain = DomainFactory(name="nl.vng.zaken")
+        subscriptions = SubscriptionFactory.create_batch(
+            3, domain=domain, source=None, types=None, verified=True
+        )
+
+        data = {
+            "id": str(uuid4()),
+            "specversion": "1.0",
+            "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+            "domain": "nl.vng.zaken",
+            "type": "nl.vng.zaken.status_gewijzigd",
+            "data": {"foo": "bar", "bar": "foo"},
+        }
+
+        event = EventFactory.create(forwarded_msg=data, domain=domain)
+
+        with patch("nrc.api.tasks.group") as mocked_group:
+            deliver_message(event.id)
+
+        signatures = list(mocked_group.call_args[0][0])
+
+        self.assertEqual(len(signatures), 2)
+        self.assertEqual(
+            [signature.task for signature in signatures],
+            ["nrc.api.tasks.deliver_to_subscriptions"] * 2,
+        )
+        self.assertEqual(
+            [len(signature.args[1]) for signature in signatures],
+            [2, 1],
+        )
+        self.assertCountEqual(
+            [
+                subscription_id
+                for signature in signatures
+                for subscription_id in signature.args[1]
+            ],
+            [subscription.pk for subscription in subscriptions],
+        )
+        mocked_group.return_value.apply_async.assert_called_once_with()
+
+    @override_settings(DELIVERY_CHUNK_SIZE=1, DELIVERY_DISPATCH_SIZE=2)
+    def test_delivery_dispatched_in_groups(self):
+        domain = DomainFactory(name="nl.vng.zaken")
+        SubscriptionFactory.create_batch(
+            5, domain=domain, source=None, types=None, verified=True
+        )
+
+        data = {
+            "id": str(uuid4()),
+            "specversion": "1.0",
+            "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+            "domain": "nl.vng.zaken",
+            "type": "nl.vng.zaken.status_gewijzigd",
+        }
+
+        event = EventFactory.create(forwarded_msg=data, domain=domain)
+
+        with patch("nrc.api.tasks.group") as mocked_group:
+            deliver_message(event.id)
+
+        self.assertEqual(
+            [len(call_args[0][0]) for call_args in mocked_group.call_args_list],
+            [2, 2, 1],
+        )
+        self.assertEqual(mocked_group.return_value.apply_async.call_count, 3)
+
+    @override_settings(
+        DELIVERY_CHUNK_SIZE=10, DELIVERY_MAX_WORKERS=2, DELIVERY_ITERATOR_CHUNK_SIZE=3
+    )
+    def test_delivery_bounded_requests(self):
+        domain = DomainFactory(name="nl.vng.zaken")
+        subscriptions = SubscriptionFactory.create_batch(
+            10, domain=domain, source=None, types=None, verified=True
+        )
+
+        data = {
+            "id": str(uuid4()),
+            "specversion": "1.0",
+            "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+            "domain": "nl.vng.zaken",
+            "type": "nl.vng.zaken.status_gewijzigd",
+        }
+
+        event = EventFactory.create(forwarded_msg=data, domain=domain)
+
+        queued = []
+        submit = ThreadPoolExecutor.submit
+
+        def counting_submit(executor, *args, **kwargs):
+            queued.append(executor._work_queue.qsize())
+            return submit(executor, *args, **kwargs)
+
+        def callback(request, context):
+            threading.Event().wait(0.01)
+            context.status_code = 204
+
+        with requests_mock.mock() as m, patch.object(
+            ThreadPoolExecutor, "submit", counting_submit
+        ):
+            for subscription in subscriptions:
+                m.post(subscription.sink, text=callback)
+
+            deliver_message(event.id)
+
+        self.assertEqual(len(m.request_history), 10)
+        self.assertEqual(EventResponse.objects.filter(event=event).count(), 10)
+        # at most twice the number of threads is submitted, of which the threads
+        # are working on two
+        self.assertLessEqual(max(queued), 2)
+
+    @override_settings(DELIVERY_MAX_RETRIES=0)
+    def test_failed_delivery(self):
+        domain = DomainFactory(name="nl.vng.zaken")
+        subscription = SubscriptionFactory.create(
+            domain=domain, source=None, types=None, verified=True
+        )
+
+        data = {
+            "id": str(uuid4()),
+            "specversion": "1.0",
+            "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+            "domain": "nl.vng.zaken",
+            "type": "nl.vng.zaken.status_gewijzigd",
+            "data": {"foo": "bar", "bar": "foo"},
+        }
+
+        event = EventFactory.create(forwarded_msg=data, domain=domain)
+
+        with requests_mock.mock() as m:
+            m.post(
+                subscription.sink,
+                exc=requests.exceptions.ConnectTimeout("Connection timed out"),
+            )
+
+            deliver_message(event.id)
+
+        event_response = EventResponse.objects.get()
+
+        self.assertEqual(event_response.subscription, subscription)
+        self.assertIsNone(event_response.response_status)
+        self.assertEqual(event_response.exception, "Connection timed out")
+
+    @override_settings(DELIVERY_MAX_RETRIES=1)
+    def test_delivery_counters(self):
+        domain = DomainFactory(name="nl.vng.zaken")
+        delivered, failed = SubscriptionFactory.create_batch(
+            2, domain=domain, source=None, types=None, verified=True
+        )
+        event = EventFactory.create(
+            forwarded_msg={
+                "id": str(uuid4()),
+                "specversion": "1.0",
+                "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+                "domain": "nl.vng.zaken",
+                "type": "nl.vng.zaken.status_gewijzigd",
+            },
+            domain=domain,
+        )
+
+        with requests_mock.mock() as m:
+            m.post(delivered.sink, status_code=204)
+            m.post(failed.sink, status_code=503)
+
+            deliver_message(event.id)
+
+        event.refresh_from_db()
+
+        # the failed delivery is retried once
+        self.assertEqual(event.responses_total, 3)
+        self.assertEqual(event.responses_succeeded, 1)
+        self.assertEqual(event.responses_failed, 2)
+        self.assertEqual(event.responses_total, EventResponse.objects.count())
+
 
 class EventTaskFilterAttributeTests(APITestCase):
     def test_domain_matching_filter_attributes(self):
@@ -570,6 +805,7 @@ class EventTaskFilterAttributeTests(APITestCase):
             source="urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
             sink="https://vng.zaken.nl/callback",
             types=[],
+            verified=True,
         )
 
         data = {
@@ -609,6 +845,7 @@ class EventTaskFilterAttributeTests(APITestCase):
             source="urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
             sink="https://vng.zaken.nl/callback",
             types=[],
+            verified=True,
         )
 
         data = {
@@ -649,6 +886,7 @@ class EventTaskFilterAttributeTests(APITestCase):
             source="urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
             sink="https://vng.zaken.nl/callback",
             types=[],
+            verified=True,
         )
 
         data = {
@@ -688,6 +926,7 @@ class EventTaskFilterAttributeTests(APITestCase):
             source="urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
             sink="https://vng.zaken.nl/callback",
             types=[],
+            verified=True,
         )
 
         data = {
@@ -737,6 +976,7 @@ class EventTaskFilterAttributeTests(APITestCase):
             source="urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
             sink="https://vng.zaken.nl/callback",
             types=[],
+            verified=True,
         )
 
         data = {
@@ -791,6 +1031,7 @@ class EventCustomFilterTests(APITestCase):
             ],
             domain=None,
             source=None,
+            verified=True,
         )
 
         data = {
@@ -848,6 +1089,7 @@ class EventCustomFilterTests(APITestCase):
             ],
             domain=None,
             source=None,
+            verified=True,
         )
 
         data = {
@@ -949,6 +1191,7 @@ class EventCustomFilterTests(APITestCase):
             ],
             domain=None,
             source=None,
+            verified=True,
         )
 
         data = {
@@ -1055,6 +1298,7 @@ class EventCustomFilterTests(APITestCase):
             ],
             domain=None,
             source=None,
+            verified=True,
         )
 
         data = {
@@ -1106,6 +1350,7 @@ class EventCustomFilterTests(APITestCase):
             ],
             domain=None,
             source=None,
+            verified=True,
         )
 
         data = {
@@ -1160,6 +1405,7 @@ class EventCustomFilterTests(APITestCase):
             ],
             domain=None,
             source=None,
+            verified=True,
         )
 
         data = {
@@ -1218,6 +1464,7 @@ class EventCustomFilterTests(APITestCase):
             ],
             domain=None,
             source=None,
+            verified=True,
         )
 
         data = {
@@ -1284,6 +1531,7 @@ class EventCustomFilterTests(APITestCase):
             ],
             domain=None,
             source=None,
+            verified=True,
         )
 
         data = {
@@ -1332,6 +1580,7 @@ class EventCustomFilterTests(APITestCase):
             ],
             domain=None,
             source=None,
+            verified=True,
         )
 
         data = {
@@ -1391,6 +1640,7 @@ class EventCustomFilterTests(APITestCase):
             ],
             domain=None,
             source=None,
+            verified=True,
         )
 
         data = {
@@ -1441,6 +1691,7 @@ class EventCustomFilterCombinationTests(APITestCase):
             ],
             domain=domain,
             source=None,
+            verified=True,
         )
 
         data = {
@@ -1502,6 +1753,7 @@ class EventCustomFilterCombinationTests(APITestCase):
             ],
             domain=None,
             source="urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+            verified=True,
         )
 
         data = {
@@ -1586,6 +1838,7 @@ class EventCustomFilterCombinationTests(APITestCase):
             ],
             domain=domain,
             source="urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+            verified=True,
         )
 
         data = {
@@ -1635,6 +1888,7 @@ class EventCustomFilterCombinationTests(APITestCase):
             ],
             domain=None,
             source="urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+            verified=True,
         )
 
         data = {
@@ -1684,6 +1938,7 @@ class EventCustomFilterCombinationTests(APITestCase):
             ],
             domain=None,
             source="urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+            verified=True,
         )
 
         data = {
@@ -1717,3 +1972,110 @@ class EventCustomFilterCombinationTests(APITestCase):
         self.assertEqual(
             m.last_request.json(), {**data, "subscription": str(subscription.uuid)}
         )
+
+
+class EventResponseBufferTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.domain = DomainFactory(name="nl.vng.zaken")
+        self.event = EventFactory.create(
+            forwarded_msg={
+                "id": str(uuid4()),
+                "specversion": "1.0",
+                "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+                "domain": "nl.vng.zaken",
+                "type": "nl.vng.zaken.status_gewijzigd",
+                "data": {"foo": "bar", "bar": "foo"},
+            },
+            domain=self.domain,
+        )
+
+    def test_responses_written_in_bulk(self):
+        subscriptions = SubscriptionFactory.create_batch(
+            3, domain=self.domain, source=None, types=None, verified=True
+        )
+
+        with requests_mock.mock() as m:
+            for subscription in subscriptions:
+                m.post(subscription.sink, status_code=204)
+
+            # fetching the event and subscriptions, and a single insert and
+            # update of the counters in a transaction
+            with self.assertNumQueries(6):
+                deliver_to_subscriptions(
+                    self.event.id, [subscription.pk for subscription in subscriptions]
+                )
+
+        self.assertEqual(len(m.request_history), 3)
+        self.assertEqual(
+            EventResponse.objects.filter(event=self.event, response_status=204).count(),
+            3,
+        )
+
+    @override_settings(DELIVERY_RESPONSE_BATCH_SIZE=2)
+    def test_responses_written_in_batches(self):
+        subscriptions = SubscriptionFactory.create_batch(
+            3, domain=self.domain, source=None, types=None, verified=True
+        )
+
+        with requests_mock.mock() as m:
+            for subscription in subscriptions:
+                m.post(subscription.sink, status_code=204)
+
+            with self.assertNumQueries(10):
+                deliver_to_subscriptions(
+                    self.event.id, [subscription.pk for subscription in subscriptions]
+                )
+
+        self.assertEqual(EventResponse.objects.filter(event=self.event).count(), 3)
+
+
+class EventPayloadTests(APITestCase):
+    def test_render(self):
+        data = {
+            "id": str(uuid4()),
+            "specversion": "1.0",
+            "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+            "domain": "nl.vng.zaken",
+            "type": "nl.vng.zaken.status_gewijzigd",
+            "subscription": str(uuid4()),
+            "subscriberReference": "ns1",
+            "data": {"foo": "bar", "bar": ["foo"]},
+        }
+        event = EventFactory.create(forwarded_msg=data)
+        subscription = SubscriptionFactory.create(
+            subscriber_reference="ns2", verified=True
+        )
+        subscription_without_reference = SubscriptionFactory.create(verified=True)
+
+        payload = EventPayload(event)
+
+        self.assertEqual(
+            json.loads(payload.render(subscription)),
+            {
+                **data,
+                "subscription": str(subscription.uuid),
+                "subscriberReference": "ns2",
+            },
+        )
+
+        expected_data = {
+            **data,
+            "subscription": str(subscription_without_reference.uuid),
+        }
+        del expected_data["subscriberReference"]
+
+        self.assertEqual(
+            json.loads(payload.render(subscription_without_reference)),
+            expected_data,
+        )
+
+    def test_render_empty_event(self):
+        event = EventFactory.create(forwarded_msg={})
+        subscription = SubscriptionFactory.create(verified=True)
+
+        self.assertEqual(
+            json.loads(EventPayload(event).render(subscription)),
+            {"subscription": str(subscription.uuid)},
+        )
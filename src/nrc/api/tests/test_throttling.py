@@ -0,0 +1,214 @@
+import threading
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+import requests
+import requests_mock
+from rest_framework.test import APITestCase
+
+from nrc.datamodel.models import EventResponse
+from nrc.datamodel.tests.factories import (
+    DomainFactory,
+    EventFactory,
+    SubscriptionFactory,
+)
+
+from ..tasks import deliver_message
+from ..throttling import HostThrottle, ThrottledError
+
+
+class ThrottleTestMixin:
+    def setUp(self):
+        super().setUp()
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+
+@override_settings(THROTTLE_MAX_WAIT=0, THROTTLE_LATENCY_THRESHOLD=5)
+class HostThrottleTests(ThrottleTestMixin, SimpleTestCase):
+    def test_concurrency_limit(self):
+        throttle = HostThrottle("https://example.com", max_concurrency=2, rate=0)
+
+        with throttle.limit(), throttle.limit():
+            with self.assertRaises(ThrottledError):
+                with throttle.limit():
+                    pass
+
+        # the slots are released
+        with throttle.limit(), throttle.limit():
+            pass
+
+    def test_no_concurrency_limit(self):
+        throttle = HostThrottle("https://example.com", max_concurrency=0, rate=0)
+
+        with throttle.limit(), throttle.limit(), throttle.limit():
+            pass
+
+    def test_rate_limit(self):
+        throttle = HostThrottle("https://example.com", max_concurrency=0, rate=2)
+
+        with patch("nrc.api.throttling.time.time", return_value=1000.1):
+            for _ in range(2):
+                with throttle.limit():
+                    pass
+
+            with self.assertRaises(ThrottledError):
+                with throttle.limit():
+                    pass
+
+        with patch("nrc.api.throttling.time.time", return_value=1001.1):
+            with throttle.limit():
+                pass
+
+    def test_cache_unavailable(self):
+        throttle = HostThrottle("https://example.com", max_concurrency=1, rate=1)
+
+        # e.g. a Redis cache ignoring connection errors returns None
+        with patch("nrc.api.throttling.cache") as mocked_cache:
+            mocked_cache.get.return_value = None
+            mocked_cache.add.return_value = None
+            mocked_cache.incr.return_value = None
+
+            with throttle.limit(), throttle.limit():
+                pass
+
+    def test_from_subscription(self):
+        subscription = SubscriptionFactory.build(
+            sink="https://example.com/callback",
+            protocol_settings={"throttle": {"max_concurrency": 2, "rate": 5}},
+        )
+
+        throttle = HostThrottle.for_subscription(subscription)
+
+        self.assertEqual(throttle.origin, "https://example.com")
+        self.assertEqual(throttle.max_concurrency, 2)
+        self.assertEqual(throttle.rate, 5)
+
+    def test_adaptive_limit(self):
+        throttle = HostThrottle("https://example.com", max_concurrency=8, rate=0)
+
+        throttle.record(429, 0.1)
+        self.assertEqual(throttle.get_limit(), 4)
+
+        throttle.record(200, 10)
+        self.assertEqual(throttle.get_limit(), 2)
+
+        throttle.decrease()
+        throttle.decrease()
+        self.assertEqual(throttle.get_limit(), 1)
+
+        # additive increase of one per round of requests
+        throttle.record(204, 0.1)
+        self.assertEqual(throttle.get_limit(), 2)
+
+        throttle.record(204, 0.1)
+        throttle.record(204, 0.1)
+        self.assertEqual(int(throttle.get_limit()), 2)
+
+        throttle.record(204, 0.1)
+        self.assertEqual(int(throttle.get_limit()), 3)
+
+        for _ in range(100):
+            throttle.record(204, 0.1)
+        self.assertEqual(throttle.get_limit(), 8)
+
+    def test_adaptive_limit_applied(self):
+        throttle = HostThrottle("https://example.com", max_concurrency=4, rate=0)
+
+        throttle.record(503, 0.1)
+
+        with throttle.limit(), throttle.limit():
+            with self.assertRaises(ThrottledError):
+                with throttle.limit():
+                    pass
+
+
+@override_settings(
+    DELIVERY_MAX_WORKERS=4, DELIVERY_CHUNK_SIZE=4, DELIVERY_MAX_RETRIES=0
+)
+class EventThrottleTests(ThrottleTestMixin, APITestCase):
+    def test_concurrency_per_host(self):
+        domain = DomainFactory.create(name="nl.vng.zaken")
+        subscriptions = [
+            SubscriptionFactory.create(
+                domain=domain,
+                source=None,
+                types=None,
+                sink=f"https://example.com/callback/{i}",
+                protocol_settings={"throttle": {"max_concurrency": 2}},
+                verified=True,
+            )
+            for i in range(4)
+        ]
+        event = EventFactory.create(
+            domain=domain,
+            forwarded_msg={
+                "id": str(uuid4()),
+                "specversion": "1.0",
+                "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+                "domain": "nl.vng.zaken",
+                "type": "nl.vng.zaken.status_gewijzigd",
+            },
+        )
+
+        lock = threading.Lock()
+        active = []
+        max_active = []
+
+        def callback(request, context):
+            with lock:
+                active.append(request)
+                max_active.append(len(active))
+
+            threading.Event().wait(0.1)
+
+            with lock:
+                active.remove(request)
+
+            context.status_code = 204
+            return ""
+
+        with requests_mock.mock() as m:
+            for subscription in subscriptions:
+                m.post(subscription.sink, text=callback)
+
+            deliver_message(event.id)
+
+        self.assertEqual(m.call_count, 4)
+        self.assertEqual(max(max_active), 2)
+        self.assertEqual(
+            set(EventResponse.objects.values_list("response_status", flat=True)),
+            {204},
+        )
+
+    def test_timeout_lowers_limit(self):
+        domain = DomainFactory.create(name="nl.vng.zaken")
+        subscription = SubscriptionFactory.create(
+            domain=domain,
+            source=None,
+            types=None,
+            sink="https://example.com/callback",
+            protocol_settings={"throttle": {"max_concurrency": 4}},
+            verified=True,
+        )
+        event = EventFactory.create(
+            domain=domain,
+            forwarded_msg={
+                "id": str(uuid4()),
+                "specversion": "1.0",
+                "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+                "domain": "nl.vng.zaken",
+                "type": "nl.vng.zaken.status_gewijzigd",
+            },
+        )
+
+        with requests_mock.mock() as m:
+            m.post(subscription.sink, exc=requests.exceptions.ReadTimeout)
+
+            deliver_message(event.id)
+
+        self.assertEqual(HostThrottle.for_subscription(subscription).get_limit(), 2)
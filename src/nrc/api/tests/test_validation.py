@@ -1,6 +1,5 @@
 from base64 import b64encode
 from unittest.case import expectedFailure
-from unittest.mock import patch
 from uuid import uuid4
 
 from django.test import override_settings
@@ -12,7 +11,7 @@ from rest_framework.test import APITestCase
 from vng_api_common.tests import JWTAuthMixin, get_operation_url, get_validation_errors
 
 from nrc.api.choices import CredentialTypeChoices, SequencetypeChoices
-from nrc.datamodel.choices import ProtocolChoices
+from nrc.datamodel.choices import ProtocolChoices, VerificationStatusChoices
 from nrc.datamodel.models import Event, Subscription
 from nrc.datamodel.tests.factories import DomainFactory
 
@@ -73,7 +72,7 @@ class SubscriptionsValidationTests(JWTAuthMixin, APITestCase):
             subscription.protocol_settings,
             {
                 "headers": {
-                    "Authorization": "bearer super-sekrit-token",
+                    "Authorization": "Bearer super-sekrit-token",
                 },
                 "method": "POST",
             },
@@ -198,15 +197,17 @@ class SubscriptionsValidationTests(JWTAuthMixin, APITestCase):
             m.register_uri(
                 "POST", "https://endpoint.example.com/webhook", status_code=201
             )
-            response = self.client.post(subscription_create_url, data)
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(subscription_create_url, data)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.json()["verificationStatus"], "pending")
 
+        subscription = Subscription.objects.get()
         self.assertEqual(
-            response.status_code, status.HTTP_400_BAD_REQUEST, response.data
+            subscription.verification_status, VerificationStatusChoices.failed
         )
 
-        error = get_validation_errors(response, "nonFieldErrors")
-        self.assertEqual(error["code"], "invalid-callback-url")
-
     @override_settings(
         LINK_FETCHER="vng_api_common.mocks.link_fetcher_404",
         ZDS_CLIENT_CLASS="vng_api_common.mocks.MockClient",
@@ -235,7 +236,8 @@ class SubscriptionsValidationTests(JWTAuthMixin, APITestCase):
                 "https://endpoint.example.com/webhook",
                 status_code=204,
             )
-            self.client.post(subscription_create_url, data)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(subscription_create_url, data)
 
         self.assertEqual(
             m.last_request.headers["Authorization"], "Bearer super-sekrit-token"
@@ -270,7 +272,8 @@ class SubscriptionsValidationTests(JWTAuthMixin, APITestCase):
                 "https://endpoint.example.com/webhook",
                 status_code=204,
             )
-            self.client.post(subscription_create_url, data)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(subscription_create_url, data)
 
         self.assertEqual(
             m.last_request.headers["Authorization"], "bearer super-sekrit-token"
@@ -313,7 +316,8 @@ class SubscriptionsValidationTests(JWTAuthMixin, APITestCase):
                 "https://endpoint.example.com/webhook",
                 status_code=204,
             )
-            self.client.post(subscription_create_url, data)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(subscription_create_url, data)
 
         self.assertEqual(m.last_request.headers["Authorization"], "bearer sink-token")
         self.assertEqual(m.last_request.headers["X-Custom-Header"], "foobar")
@@ -364,11 +368,10 @@ class DomainsValidationTests(JWTAuthMixin, APITestCase):
         self.assertEqual(error["code"], "bad-url")
 
 
-@patch("nrc.api.serializers.deliver_message.delay")
 class EventsValidationTests(JWTAuthMixin, APITestCase):
     heeft_alle_autorisaties = True
 
-    def test_required_fields(self, mock_task):
+    def test_required_fields(self):
         event_url = get_operation_url("events_create")
 
         data = {
@@ -392,7 +395,7 @@ class EventsValidationTests(JWTAuthMixin, APITestCase):
             with self.subTest(field=field):
                 self.assertEqual(error["code"], "required")
 
-    def test_extra_fields(self, mock_task):
+    def test_extra_fields(self):
         """
         The client application should be able to add custom attributes prefixed
         with the domain name.
@@ -431,7 +434,7 @@ class EventsValidationTests(JWTAuthMixin, APITestCase):
         self.assertEqual(event.forwarded_msg["nl.vng.zaken.bar"], "foo")
         self.assertEqual(event.forwarded_msg["nl.vng.documenten.bar"], "foo")
 
-    def test_unknown_domain(self, mock_task):
+    def test_unknown_domain(self):
         DomainFactory.create(name="nl.vng.zaken")
 
         data = {
@@ -458,7 +461,7 @@ class EventsValidationTests(JWTAuthMixin, APITestCase):
 
         self.assertEqual(error["reason"], _("Domain bestaat niet."))
 
-    def test_base64(self, mock_task):
+    def test_base64(self):
         DomainFactory.create(name="nl.vng.zaken")
 
         base64_data = b64encode(b"Some base64 encoded data")
@@ -491,7 +494,7 @@ class EventsValidationTests(JWTAuthMixin, APITestCase):
 
     # TODO: this should return an DSO compliant error response
     @expectedFailure
-    def test_invalid_base64(self, mock_task):
+    def test_invalid_base64(self):
         DomainFactory.create(name="nl.vng.zaken")
 
         data = {
@@ -520,7 +523,7 @@ class EventsValidationTests(JWTAuthMixin, APITestCase):
             error["reason"], _("De opgegeven waarde is geen valide base64.")
         )
 
-    def test_data_or_base64(self, mock_task):
+    def test_data_or_base64(self):
         """
         Events may not contain the data_base64 attribute and the data attribute.
         """
@@ -551,7 +554,7 @@ class EventsValidationTests(JWTAuthMixin, APITestCase):
             error["reason"], _("Data of data_base64 dient aanwezig te zijn.")
         )
 
-    def test_data_data_base64_validation(self, mock_task):
+    def test_data_data_base64_validation(self):
         """
         Events may not contain the data_base64 attribute and the data attribute.
         """
@@ -590,7 +593,7 @@ class EventsValidationTests(JWTAuthMixin, APITestCase):
             _("Data en data_base64 in combinatie met elkaar zijn niet toegestaan."),
         )
 
-    def test_non_uuid_id(self, mock_task):
+    def test_non_uuid_id(self):
         DomainFactory.create(name="nl.vng.zaken")
 
         data = {
@@ -617,7 +620,7 @@ class EventsValidationTests(JWTAuthMixin, APITestCase):
 
         self.assertEqual(event.forwarded_msg, data)
 
-    def test_sequence_without_sequencetype(self, mock_task):
+    def test_sequence_without_sequencetype(self):
         """
         Events should contain both the sequence and the sequencetype or both should
         not be present.
@@ -650,7 +653,7 @@ class EventsValidationTests(JWTAuthMixin, APITestCase):
             _("Velden sequencetype zijn verplicht bij het gebruik van sequence."),
         )
 
-    def test_no_sequence_and_no_sequencetype(self, mock_task):
+    def test_no_sequence_and_no_sequencetype(self):
         """
         Events should contain both the sequence and the sequencetype or both should
         not be present.
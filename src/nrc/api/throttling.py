@@ -0,0 +1,170 @@
+"""
+Throttling of the requests to the sinks of the subscriptions.
+
+The number of concurrent requests and the number of requests per second to a
+sink origin are limited, so a small subscriber backend is not overloaded by the
+parallel deliveries. The concurrency adapts to the sink (AIMD): it is halved
+when the sink responds with 429/503, times out or responds slowly, and grows
+back by one per round of successful requests. The state is kept in the cache,
+so the limits apply to all workers when the cache is shared (e.g. Redis).
+"""
+import logging
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+import requests
+
+from nrc.api.sessions import get_origin
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "nrc:throttle"
+
+# status codes with which a sink signals it is overloaded
+OVERLOADED_STATUS_CODES = (429, 503)
+
+# seconds after which a concurrency slot of a lost worker is released
+SLOT_TIMEOUT = 60
+
+# seconds after which a lowered concurrency limit of an idle sink is reset
+LIMIT_TIMEOUT = 3600
+
+DECREASE_FACTOR = 0.5
+
+POLL_INTERVAL = 0.05
+
+
+class ThrottledError(requests.exceptions.RequestException):
+    """
+    The delivery is skipped as the sink is at its limits
+    """
+
+
+class HostThrottle:
+    def __init__(self, origin: str, max_concurrency: int, rate: int):
+        self.origin = origin
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.limit_key = f"{CACHE_KEY_PREFIX}:{origin}:limit"
+
+    @classmethod
+    def for_subscription(cls, subscription) -> "HostThrottle":
+        protocol_settings = subscription.protocol_settings or {}
+        throttle_settings = protocol_settings.get("throttle") or {}
+
+        return cls(
+            get_origin(subscription.sink),
+            max_concurrency=throttle_settings.get(
+                "max_concurrency", settings.THROTTLE_MAX_CONCURRENCY
+            ),
+            rate=throttle_settings.get("rate", settings.THROTTLE_RATE),
+        )
+
+    def get_limit(self) -> float:
+        """
+        Return the current (adaptive) concurrency limit
+        """
+        limit = cache.get(self.limit_key)
+        if limit is None:
+            return self.max_concurrency
+
+        return max(1, min(self.max_concurrency, limit))
+
+    def set_limit(self, limit: float) -> None:
+        cache.set(
+            self.limit_key,
+            max(1, min(self.max_concurrency, limit)),
+            timeout=LIMIT_TIMEOUT,
+        )
+
+    def _acquire_slot(self):
+        if not self.max_concurrency:
+            return ""
+
+        for i in range(int(self.get_limit())):
+            key = f"{CACHE_KEY_PREFIX}:{self.origin}:slot:{i}"
+            added = cache.add(key, True, timeout=SLOT_TIMEOUT)
+            # the cache is unavailable, e.g. Redis errors which are ignored
+            # by the cache backend, so the deliveries are not limited
+            if added is None:
+                return ""
+            if added:
+                return key
+
+        return None
+
+    def _acquire_token(self) -> bool:
+        if not self.rate:
+            return True
+
+        # the requests are counted per window of a second
+        key = f"{CACHE_KEY_PREFIX}:{self.origin}:rate:{int(time.time())}"
+        cache.add(key, 0, timeout=2)
+        try:
+            count = cache.incr(key)
+        except ValueError:
+            return False
+
+        # not limited when the cache is unavailable, like the concurrency
+        return count is None or count <= self.rate
+
+    @contextmanager
+    def limit(self):
+        """
+        Hold a concurrency slot and a request token of the sink during the block
+
+        Waits at most ``settings.THROTTLE_MAX_WAIT`` seconds for them, after
+        which ``ThrottledError`` is raised.
+        """
+        deadline = time.monotonic() + settings.THROTTLE_MAX_WAIT
+
+        slot = self._acquire_slot()
+        while slot is None:
+            if time.monotonic() >= deadline:
+                raise ThrottledError(f"Concurrency limit for {self.origin} is reached")
+            time.sleep(POLL_INTERVAL)
+            slot = self._acquire_slot()
+
+        try:
+            while not self._acquire_token():
+                if time.monotonic() >= deadline:
+                    raise ThrottledError(f"Rate limit for {self.origin} is reached")
+                time.sleep(POLL_INTERVAL)
+
+            yield
+        finally:
+            if slot:
+                cache.delete(slot)
+
+    def decrease(self) -> None:
+        if not self.max_concurrency:
+            return
+
+        limit = self.get_limit()
+        if limit > 1:
+            logger.info(
+                f"Lowering concurrency limit for {self.origin} to "
+                f"{max(1, int(limit * DECREASE_FACTOR))}"
+            )
+
+        self.set_limit(limit * DECREASE_FACTOR)
+
+    def increase(self) -> None:
+        if not self.max_concurrency:
+            return
+
+        limit = self.get_limit()
+        if limit < self.max_concurrency:
+            self.set_limit(limit + 1 / limit)
+
+    def record(self, response_status: int, elapsed: float) -> None:
+        if (
+            response_status in OVERLOADED_STATUS_CODES
+            or elapsed > settings.THROTTLE_LATENCY_THRESHOLD
+        ):
+            self.decrease()
+        elif response_status < 500:
+            self.increase()
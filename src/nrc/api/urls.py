@@ -4,7 +4,12 @@ from django.urls import include, path
 from vng_api_common import routers
 from vng_api_common.schema import SchemaView
 
-from .viewsets import DomainViewSet, EventAPIView, SubscriptionViewSet
+from .viewsets import (
+    DomainViewSet,
+    EventAPIView,
+    EventBatchAPIView,
+    SubscriptionViewSet,
+)
 
 router = routers.DefaultRouter()
 router.register("subscriptions", SubscriptionViewSet)
@@ -28,6 +33,11 @@ urlpatterns = [
                     name="schema-redoc",
                 ),
                 # actual API
+                url(
+                    r"^events/batch$",
+                    EventBatchAPIView.as_view(),
+                    name="event-batch",
+                ),
                 url(
                     r"^events",
                     EventAPIView.as_view(),
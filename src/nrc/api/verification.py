@@ -0,0 +1,93 @@
+"""
+Verification of the sinks of the subscriptions.
+
+A test event is sent to the sink in a background task, instead of in the
+request which creates or updates the subscription. Successful verifications
+are kept in the cache per sink and headers (including the credential), so
+the same sink is not probed again for every subscription.
+"""
+import hashlib
+import logging
+from typing import Optional
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+import requests
+
+from nrc.api.choices import SequencetypeChoices
+from nrc.api.sessions import get_session
+from nrc.datamodel.models import Subscription
+from nrc.utils.json import dumps
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "nrc:sink-verification"
+
+
+def get_sink_headers(subscription: Subscription) -> dict:
+    """
+    Return the headers sent with every request to the sink
+    """
+    headers = {}
+
+    if subscription.protocol_settings:
+        headers = {**subscription.protocol_settings.get("headers", {})}
+
+    if subscription.sink_credential and subscription.sink_credential.get(
+        "access_token"
+    ):
+        access_token = subscription.sink_credential["access_token"]
+        headers.update({"Authorization": f"bearer {access_token}"})
+
+    return headers
+
+
+def get_verification_key(subscription: Subscription) -> str:
+    """
+    Return the key identifying the sink together with its credential
+    """
+    data = dumps([subscription.sink, sorted(get_sink_headers(subscription).items())])
+    return hashlib.sha256(data).hexdigest()
+
+
+def is_verified(key: str) -> bool:
+    return bool(cache.get(f"{CACHE_KEY_PREFIX}:{key}"))
+
+
+def remember_verified(key: str) -> None:
+    cache.set(f"{CACHE_KEY_PREFIX}:{key}", True, timeout=settings.SINK_VERIFICATION_TTL)
+
+
+def probe_sink(subscription: Subscription) -> Optional[int]:
+    """
+    Send a test event to the sink, which has to respond with 204 No Content
+
+    Returns the response status, or None when the sink could not be reached.
+    """
+    try:
+        response = get_session(subscription.sink).post(
+            subscription.sink,
+            json={
+                "id": str(uuid4()),
+                "specversion": "1.0",
+                "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+                "domain": "nl.vng.test",
+                "type": "nl.vng.test.status_gewijzigd",
+                "time": "2022-03-16T15:29:30.833664Z",
+                "subscription": str(subscription.uuid),
+                "datacontenttype": "application/json",
+                "dataschema": "https://vng.nl/zgw/zaken/status_gewijzigd_schema.json",
+                "sequence": "1",
+                "sequencetype": SequencetypeChoices.integer,
+                "data": {"foo": "bar", "bar": "foo"},
+            },
+            headers=get_sink_headers(subscription),
+            timeout=10,
+        )
+    except requests.RequestException:
+        logger.info(f"Sink of subscription {subscription.uuid} could not be reached")
+        return None
+
+    return response.status_code
@@ -2,12 +2,12 @@ import logging
 
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import mixins, status, views, viewsets
-from rest_framework.parsers import JSONParser
-from rest_framework.renderers import JSONRenderer
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from vng_api_common.viewsets import CheckQueryParamsMixin
 
-from nrc.api.parsers import SubscriptionParser
+from nrc.api.parsers import CloudEventsBatchParser, JSONParser, SubscriptionParser
+from nrc.api.renderers import JSONRenderer
 from nrc.api.serializers import (
     DomainSerializer,
     EventSerializer,
@@ -148,3 +148,37 @@ class EventAPIView(views.APIView):
         serializer.save()
 
         return Response(data, status=status.HTTP_200_OK)
+
+
+class EventBatchAPIView(views.APIView):
+    """
+    Publish a batch of events.
+
+    The events are sent as a JSON array, using the CloudEvents JSON batch format
+    (`application/cloudevents-batch+json`). The batch is only published when all
+    events are valid, otherwise the errors are reported per event.
+    """
+
+    required_scopes = {"create": SCOPE_EVENTS_PUBLISH}
+    # Exposed action of the view used by the vng_api_common
+    action = "create"
+
+    parser_classes = (CloudEventsBatchParser, JSONParser)
+    renderer_classes = (JSONRenderer,)
+
+    @swagger_auto_schema(
+        request_body=EventSerializer(many=True),
+        responses={200: EventSerializer(many=True)},
+    )
+    def create(self, request, *args, **kwargs):
+        return self.post(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        serializer = EventSerializer(data=request.data, many=True)
+
+        if not serializer.is_valid():
+            raise ValidationError({"events": serializer.errors})
+
+        serializer.save()
+
+        return Response(serializer.validated_data, status=status.HTTP_200_OK)
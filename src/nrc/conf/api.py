@@ -15,6 +15,7 @@ SWAGGER_SETTINGS = BASE_SWAGGER_SETTINGS.copy()
 SWAGGER_SETTINGS.update(
     {
         "DEFAULT_INFO": "nrc.api.schema.info",
+        "DEFAULT_GENERATOR_CLASS": "nrc.api.schema.OpenAPISchemaGenerator",
         "SECURITY_DEFINITIONS": {
             SECURITY_DEFINITION_NAME: {
                 # OAS 3.0
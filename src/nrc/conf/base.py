@@ -320,5 +320,108 @@ CHANNEL = QueueChannel(params=BROKER_URL)
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "amqp://127.0.0.1:5672//")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "rpc://127.0.0.1:5672//")
 
+# JSON backend used to parse and encode the events, either "orjson" or "json"
+JSON_BACKEND = os.getenv("JSON_BACKEND", "orjson")
+
+# seconds the source + id of a published event are kept in the cache, to answer
+# a replay of the event without a query
+EVENT_DEDUPLICATION_TTL = int(os.getenv("EVENT_DEDUPLICATION_TTL", 3600))
+
+# maximum number of events published in a single batch
+EVENT_BATCH_MAX_SIZE = int(os.getenv("EVENT_BATCH_MAX_SIZE", 1000))
+# seconds after which the in-process domain cache is reloaded, a fallback for
+# process-local caches like the subscription index
+DOMAIN_CACHE_MAX_AGE = int(os.getenv("DOMAIN_CACHE_MAX_AGE", 300))
+
+# Outbox relay, publishing the events to the broker
+# number of events published at once
+OUTBOX_RELAY_BATCH_SIZE = int(os.getenv("OUTBOX_RELAY_BATCH_SIZE", 100))
+# seconds between polls of an empty outbox
+OUTBOX_RELAY_INTERVAL = float(os.getenv("OUTBOX_RELAY_INTERVAL", 0.5))
+
+# Retention of the events and their delivery logs, purged by the purge_events
+# command. Number of days the events are kept, 0 to keep them indefinitely
+EVENT_RETENTION_DAYS = int(os.getenv("EVENT_RETENTION_DAYS", 0))
+# number of events deleted at once, and the seconds between the batches
+EVENT_PURGE_BATCH_SIZE = int(os.getenv("EVENT_PURGE_BATCH_SIZE", 1000))
+EVENT_PURGE_INTERVAL = float(os.getenv("EVENT_PURGE_INTERVAL", 0.5))
+# directory of the archive written by the archive_events command, the number of
+# events per segment file, and the compression of the segments, either "gzip"
+# or "zstd" (requires zstandard)
+ARCHIVE_DIRECTORY = os.getenv("ARCHIVE_DIRECTORY", os.path.join(BASE_DIR, "archive"))
+ARCHIVE_SEGMENT_SIZE = int(os.getenv("ARCHIVE_SEGMENT_SIZE", 100000))
+ARCHIVE_COMPRESSION = os.getenv("ARCHIVE_COMPRESSION", "gzip")
+# number of events read from the database or the archive at once
+ARCHIVE_CHUNK_SIZE = int(os.getenv("ARCHIVE_CHUNK_SIZE", 1000))
+
+# Event delivery
+# maximum number of sinks an event is sent to simultaneously
+DELIVERY_MAX_WORKERS = int(os.getenv("DELIVERY_MAX_WORKERS", 10))
+# number of matched subscriptions handled by a single delivery task
+DELIVERY_CHUNK_SIZE = int(os.getenv("DELIVERY_CHUNK_SIZE", 1))
+# number of delivery tasks sent to the broker at once
+DELIVERY_DISPATCH_SIZE = int(os.getenv("DELIVERY_DISPATCH_SIZE", 100))
+# number of subscriptions fetched at once by a delivery task
+DELIVERY_ITERATOR_CHUNK_SIZE = int(os.getenv("DELIVERY_ITERATOR_CHUNK_SIZE", 500))
+# the delivery results are written once this many results are collected or
+# after this number of seconds, whichever comes first
+DELIVERY_RESPONSE_BATCH_SIZE = int(os.getenv("DELIVERY_RESPONSE_BATCH_SIZE", 100))
+DELIVERY_RESPONSE_FLUSH_INTERVAL = int(os.getenv("DELIVERY_RESPONSE_FLUSH_INTERVAL", 5))
+# seconds after which the in-process subscription index is rebuilt. Changes to
+# the subscriptions are picked up directly when the cache is shared between the
+# API and the workers (e.g. Redis), this is a fallback for process-local caches.
+ROUTING_INDEX_MAX_AGE = int(os.getenv("ROUTING_INDEX_MAX_AGE", 300))
+# default retry policy of failed deliveries, which subscriptions can override.
+# The delay in seconds before the first retry is doubled for every next retry.
+DELIVERY_MAX_RETRIES = int(os.getenv("DELIVERY_MAX_RETRIES", 5))
+DELIVERY_RETRY_BACKOFF = int(os.getenv("DELIVERY_RETRY_BACKOFF", 30))
+DELIVERY_RETRY_BACKOFF_MAX = int(os.getenv("DELIVERY_RETRY_BACKOFF_MAX", 3600))
+
+# number of delivery tasks per second scheduled when redriving dead letters
+DEAD_LETTER_REDRIVE_RATE = int(os.getenv("DEAD_LETTER_REDRIVE_RATE", 10))
+# consecutive failed deliveries after which a sink is no longer called (0 to
+# disable), until a probe succeeds after the reset timeout in seconds. Skipped
+# deliveries are retried, or stored as dead letter directly when failing fast.
+# The state is kept in the cache, which must be shared by the workers (e.g.
+# Redis, see conf/docker.py): with a local memory cache every process has its
+# own breakers.
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(
+    os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", 5)
+)
+CIRCUIT_BREAKER_RESET_TIMEOUT = int(os.getenv("CIRCUIT_BREAKER_RESET_TIMEOUT", 60))
+CIRCUIT_BREAKER_FAIL_FAST = os.getenv("CIRCUIT_BREAKER_FAIL_FAST", "0").lower() in [
+    "true",
+    "1",
+    "yes",
+]
+# limits of the concurrent requests and of the requests per second (0 for no
+# limits) to a sink origin, which subscriptions can override. The concurrency is
+# halved when the sink responds with 429/503 or slower than the latency
+# threshold in seconds, and restored gradually when it recovers. Deliveries
+# waiting longer than the max wait in seconds for the sink are retried.
+# Like the circuit breakers, the limits apply to all workers only when the
+# cache is shared, otherwise every process sends up to the limits.
+THROTTLE_MAX_CONCURRENCY = int(os.getenv("THROTTLE_MAX_CONCURRENCY", 10))
+THROTTLE_RATE = int(os.getenv("THROTTLE_RATE", 0))
+THROTTLE_LATENCY_THRESHOLD = int(os.getenv("THROTTLE_LATENCY_THRESHOLD", 5))
+THROTTLE_MAX_WAIT = int(os.getenv("THROTTLE_MAX_WAIT", 10))
+# default maximum number of events in a batch and the window in seconds over
+# which the events are collected, for subscriptions receiving batches
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 100))
+BATCH_WINDOW = int(os.getenv("BATCH_WINDOW", 5))
+# seconds the events of a batch being sent are claimed, after which they are
+# sent again when the batch was lost (e.g. the worker crashed)
+BATCH_CLAIM_TIMEOUT = int(os.getenv("BATCH_CLAIM_TIMEOUT", 300))
+
+# seconds a successful verification of a sink and its credential is kept in
+# the cache, during which subscriptions to the same sink are not probed again
+SINK_VERIFICATION_TTL = int(os.getenv("SINK_VERIFICATION_TTL", 3600))
+
+# Pooled HTTP sessions used to call the sinks
+# maximum number of kept-alive connections per sink origin
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", DELIVERY_MAX_WORKERS))
+# seconds after which the connections to an unused sink origin are closed
+HTTP_POOL_IDLE_TIMEOUT = int(os.getenv("HTTP_POOL_IDLE_TIMEOUT", 60))
+
 # URL for documentation that's shown in API schema
 DOCUMENTATION_URL = "https://vng-realisatie.github.io/gemma-zaken"
@@ -34,3 +34,18 @@ LOGGING["loggers"][""] = {"level": "CRITICAL", "handlers": []}
 ENVIRONMENT = "ci"
 
 TEST_CALLBACK_AUTH = False
+
+# run the tasks (and their fan-out) in-process
+CELERY_TASK_ALWAYS_EAGER = True
+
+# deliver serially, so the order of the requests to the sinks is predictable
+DELIVERY_MAX_WORKERS = 1
+
+# the cache outlives the tests, so a breaker opened or a concurrency limit
+# lowered by one test would affect the deliveries of the next, and an event
+# published by one test would be a replay in the next, and a sink verified by
+# one test would not be probed in the next
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 0
+THROTTLE_MAX_CONCURRENCY = 0
+EVENT_DEDUPLICATION_TTL = 0
+SINK_VERIFICATION_TTL = 0
@@ -34,8 +34,18 @@ MANAGERS = ADMINS
 # See https://docs.djangoproject.com/en/1.5/ref/settings/#allowed-hosts
 ALLOWED_HOSTS = getenv("ALLOWED_HOSTS", "*", split=True)
 
+# The cache is shared by the API and the Celery workers: the subscription
+# index and domain versions, the circuit breakers, the throttling of the sinks
+# and the deduplication of events rely on it.
 CACHES = {
-    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": getenv("CACHE_LOCATION", "redis://redis:6379/1"),
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "IGNORE_EXCEPTIONS": True,
+        },
+    }
 }
 
 # Deal with being hosted on a subpath
@@ -62,18 +72,6 @@ GEOS_LIBRARY_PATH = "/usr/lib/libgeos_c.so.1"
 #         'INDEX_NAME': 'notifications',
 #     },
 # }
-#
-# # Caching
-# CACHES = {
-#     'default': {
-#         'BACKEND': 'django_redis.cache.RedisCache',
-#         'LOCATION': getenv('CACHE_LOCATION', 'redis://redis:6379/1'),
-#         'OPTIONS': {
-#             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-#             'IGNORE_EXCEPTIONS': True,
-#         }
-#     }
-# }
 
 #
 # Additional Django settings
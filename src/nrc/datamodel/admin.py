@@ -2,11 +2,15 @@ from json.encoder import JSONEncoder
 
 from django import forms
 from django.contrib import admin
-from django.utils.translation import gettext_lazy as _
+from django.utils.translation import gettext_lazy as _, ngettext
 
 from django_better_admin_arrayfield.admin.mixins import DynamicArrayMixin
 
-from .models import Domain, Event, EventResponse, Subscription
+from nrc.api.dead_letters import redrive
+from nrc.api.tasks import verify_sink
+
+from .choices import VerificationStatusChoices
+from .models import DeadLetter, Domain, Event, EventResponse, Subscription
 
 
 @admin.register(Domain)
@@ -35,11 +39,12 @@ class SubscriptionAdminForm(forms.ModelForm):
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin, DynamicArrayMixin):
-    list_display = ("uuid", "sink", "source", "domain")
-    list_filter = ("domain",)
+    list_display = ("uuid", "sink", "source", "domain", "verification_status")
+    list_filter = ("domain", "verification_status")
 
-    readonly_fields = ("uuid",)
+    readonly_fields = ("uuid", "verification_status")
     autocomplete_fields = ("domain",)
+    actions = ["verify_sinks"]
 
     form = SubscriptionAdminForm
 
@@ -73,11 +78,41 @@ class SubscriptionAdmin(admin.ModelAdmin, DynamicArrayMixin):
                 "fields": (
                     "sink",
                     "sink_credential",
+                    "verification_status",
                 )
             },
         ),
     )
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+
+        # like the API, the sink is verified again when it or its headers
+        # changed, or when its verification failed
+        if (
+            not change
+            or {"sink", "sink_credential", "protocol_settings"} & set(form.changed_data)
+            or obj.verification_status == VerificationStatusChoices.failed
+        ):
+            verify_sink(obj)
+
+    @admin.action(description=_("Verify the sinks of the selected subscriptions"))
+    def verify_sinks(self, request, queryset):
+        count = 0
+        for subscription in queryset.iterator():
+            verify_sink(subscription, cached=False)
+            count += 1
+
+        self.message_user(
+            request,
+            ngettext(
+                "The verification of %d sink is queued.",
+                "The verification of %d sinks is queued.",
+                count,
+            )
+            % count,
+        )
+
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
@@ -96,10 +131,46 @@ class EventResponseAdmin(admin.ModelAdmin):
         "event",
         "subscription",
         "response_status",
+        "attempt",
+    )
+    readonly_fields = (
+        "event",
+        "subscription",
+        "exception",
+        "response_status",
+        "attempt",
+    )
+
+
+@admin.register(DeadLetter)
+class DeadLetterAdmin(admin.ModelAdmin):
+    list_display = (
+        "event",
+        "subscription",
+        "response_status",
+        "attempts",
+        "created_on",
     )
+    list_filter = ("subscription__domain",)
     readonly_fields = (
         "event",
         "subscription",
         "exception",
         "response_status",
+        "attempts",
     )
+    actions = ["redrive_dead_letters"]
+
+    @admin.action(description=_("Redrive selected dead letters"))
+    def redrive_dead_letters(self, request, queryset):
+        count = redrive(queryset)
+
+        self.message_user(
+            request,
+            ngettext(
+                "%d dead letter is redriven.",
+                "%d dead letters are redriven.",
+                count,
+            )
+            % count,
+        )
@@ -2,6 +2,12 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 
 
+class VerificationStatusChoices(models.TextChoices):
+    pending = ("pending", _("Pending"))
+    verified = ("verified", _("Verified"))
+    failed = ("failed", _("Failed"))
+
+
 class ProtocolChoices(models.TextChoices):
     HTTP = (
         "HTTP",
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.14 on 2026-10-18 09:18
+
+from django.db import migrations, models
+
+import nrc.utils.json
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datamodel", "0033_auto_20220614_1213"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="event",
+            name="forwarded_msg",
+            field=models.JSONField(
+                decoder=nrc.utils.json.JSONDecoder, encoder=nrc.utils.json.JSONEncoder
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.14 on 2026-10-18 09:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datamodel", "0034_event_forwarded_msg_codec"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="eventresponse",
+            name="attempt",
+            field=models.IntegerField(
+                default=1, help_text="Number of the delivery attempt."
+            ),
+        ),
+    ]
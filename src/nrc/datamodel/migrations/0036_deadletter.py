@@ -0,0 +1,72 @@
+# Generated by Django 3.2.14 on 2026-10-18 09:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datamodel", "0035_eventresponse_attempt"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeadLetter",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_on",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="Aanmaakdatum"
+                    ),
+                ),
+                (
+                    "last_updated",
+                    models.DateTimeField(auto_now=True, verbose_name="Laatst bewerkt"),
+                ),
+                ("exception", models.CharField(blank=True, max_length=1000)),
+                ("response_status", models.IntegerField(null=True)),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(
+                        help_text="Number of delivery attempts made."
+                    ),
+                ),
+                (
+                    "event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="datamodel.event",
+                    ),
+                ),
+                (
+                    "subscription",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="datamodel.subscription",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "dead letter",
+                "verbose_name_plural": "dead letters",
+                "ordering": ("-created_on",),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="deadletter",
+            constraint=models.UniqueConstraint(
+                fields=("event", "subscription"), name="unique_dead_letter"
+            ),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 3.2.14 on 2026-10-18 09:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datamodel", "0036_deadletter"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PendingDelivery",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_on",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="Aanmaakdatum"
+                    ),
+                ),
+                (
+                    "last_updated",
+                    models.DateTimeField(auto_now=True, verbose_name="Laatst bewerkt"),
+                ),
+                (
+                    "attempt",
+                    models.PositiveIntegerField(
+                        default=1, help_text="Number of the delivery attempt."
+                    ),
+                ),
+                (
+                    "event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="datamodel.event",
+                    ),
+                ),
+                (
+                    "subscription",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="datamodel.subscription",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "pending delivery",
+                "verbose_name_plural": "pending deliveries",
+                "ordering": ("created_on",),
+            },
+        ),
+    ]
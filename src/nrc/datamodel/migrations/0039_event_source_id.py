@@ -0,0 +1,29 @@
+# Generated by Django 3.2.14 on 2026-10-18 09:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datamodel", "0038_outboxentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="cloudevent_id",
+            field=models.TextField(help_text="Identifier of the event.", null=True),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="source",
+            field=models.TextField(help_text="Source of the event.", null=True),
+        ),
+        migrations.AddConstraint(
+            model_name="event",
+            constraint=models.UniqueConstraint(
+                fields=("source", "cloudevent_id"), name="unique_event_source_id"
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.14 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datamodel", "0039_event_source_id"),
+    ]
+
+    operations = [
+        # the sinks of the existing subscriptions were verified on create
+        migrations.AddField(
+            model_name="subscription",
+            name="verification_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("verified", "Verified"),
+                    ("failed", "Failed"),
+                ],
+                default="verified",
+                help_text="Whether the sink was verified to receive events. Events are only delivered to verified sinks.",
+                max_length=20,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="subscription",
+            name="verification_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("verified", "Verified"),
+                    ("failed", "Failed"),
+                ],
+                default="pending",
+                help_text="Whether the sink was verified to receive events. Events are only delivered to verified sinks.",
+                max_length=20,
+            ),
+        ),
+    ]
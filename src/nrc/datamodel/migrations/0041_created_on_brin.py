@@ -0,0 +1,26 @@
+# Generated by Django 3.2.14 on 2026-10-18 09:42
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datamodel", "0040_subscription_verification_status"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="event",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                fields=["created_on"], name="event_created_on_brin"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="eventresponse",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                fields=["created_on"], name="eventresponse_created_on_brin"
+            ),
+        ),
+    ]
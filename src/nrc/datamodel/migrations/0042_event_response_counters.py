@@ -0,0 +1,34 @@
+# Generated by Django 3.2.14 on 2026-10-18 09:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datamodel", "0041_created_on_brin"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="responses_failed",
+            field=models.IntegerField(
+                default=0, help_text="Number of failed delivery attempts."
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="responses_succeeded",
+            field=models.IntegerField(
+                default=0, help_text="Number of successful delivery attempts."
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="responses_total",
+            field=models.IntegerField(
+                default=0, help_text="Number of delivery attempts."
+            ),
+        ),
+    ]
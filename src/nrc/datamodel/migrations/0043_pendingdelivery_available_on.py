@@ -0,0 +1,22 @@
+# Generated by Django 3.2.14 on 2026-10-18 09:58
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datamodel", "0042_event_response_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pendingdelivery",
+            name="available_on",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now,
+                help_text="Time from which the delivery is sent in a batch. Later while the delivery is claimed by a batch being sent, or waits for its retry.",
+            ),
+        ),
+    ]
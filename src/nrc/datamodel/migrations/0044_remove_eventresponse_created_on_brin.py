@@ -0,0 +1,17 @@
+# Generated by Django 3.2.14 on 2026-10-18 10:03
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datamodel", "0043_pendingdelivery_available_on"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="eventresponse",
+            name="eventresponse_created_on_brin",
+        ),
+    ]
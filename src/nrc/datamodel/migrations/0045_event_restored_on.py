@@ -0,0 +1,22 @@
+# Generated by Django 3.2.14 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datamodel", "0044_remove_eventresponse_created_on_brin"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="restored_on",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Time the event was restored from the archive, from which its retention period starts again.",
+                null=True,
+            ),
+        ),
+    ]
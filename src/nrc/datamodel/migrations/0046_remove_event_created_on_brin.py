@@ -0,0 +1,17 @@
+# Generated by Django 3.2.14 on 2026-10-18 10:16
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datamodel", "0045_event_restored_on"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="event",
+            name="event_created_on_brin",
+        ),
+    ]
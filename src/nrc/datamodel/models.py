@@ -1,6 +1,5 @@
 import uuid as _uuid
 
-from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.db.models import JSONField
 from django.utils import timezone
@@ -8,7 +7,8 @@ from django.utils.translation import ugettext_lazy as _
 
 from django_better_admin_arrayfield.models.fields import ArrayField
 
-from nrc.datamodel.choices import ProtocolChoices
+from nrc.datamodel.choices import ProtocolChoices, VerificationStatusChoices
+from nrc.utils.json import JSONDecoder, JSONEncoder
 
 
 class Timestamped(models.Model):
@@ -91,6 +91,16 @@ class Subscription(Timestamped):
 
     sink_credential = models.JSONField(null=True, blank=True)
 
+    verification_status = models.CharField(
+        help_text=_(
+            "Whether the sink was verified to receive events. Events are only "
+            "delivered to verified sinks."
+        ),
+        choices=VerificationStatusChoices.choices,
+        default=VerificationStatusChoices.pending,
+        max_length=20,
+    )
+
     config = models.JSONField(
         help_text=_(
             "Implementation-specific configuration parameters needed by the subscription "
@@ -145,11 +155,39 @@ class Subscription(Timestamped):
 
 # Event
 class Event(Timestamped):
-    forwarded_msg = JSONField(encoder=DjangoJSONEncoder)
+    forwarded_msg = JSONField(encoder=JSONEncoder, decoder=JSONDecoder)
     domain = models.ForeignKey("datamodel.Domain", on_delete=models.CASCADE)
+    # source + id identify the event, to not deliver a published event again
+    source = models.TextField(null=True, help_text=_("Source of the event."))
+    cloudevent_id = models.TextField(null=True, help_text=_("Identifier of the event."))
+    # counters of the event responses, kept up to date with the responses so
+    # the logviewer doesn't aggregate them. Without check constraints, like
+    # the attempt of the event responses.
+    responses_total = models.IntegerField(
+        default=0, help_text=_("Number of delivery attempts.")
+    )
+    responses_succeeded = models.IntegerField(
+        default=0, help_text=_("Number of successful delivery attempts.")
+    )
+    responses_failed = models.IntegerField(
+        default=0, help_text=_("Number of failed delivery attempts.")
+    )
+    restored_on = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text=_(
+            "Time the event was restored from the archive, from which its "
+            "retention period starts again."
+        ),
+    )
 
     class Meta:
         ordering = ("-created_on",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=["source", "cloudevent_id"], name="unique_event_source_id"
+            )
+        ]
 
     def __str__(self) -> str:
         return f"Event {self.id} ({self.domain})"
@@ -161,6 +199,11 @@ class EventResponse(Timestamped):
     subscription = models.ForeignKey("datamodel.Subscription", on_delete=models.CASCADE)
     exception = models.CharField(max_length=1000, blank=True)
     response_status = models.IntegerField(null=True)
+    # without a check constraint, which would be validated by scanning the
+    # whole table while it is locked when the column is added
+    attempt = models.IntegerField(
+        default=1, help_text=_("Number of the delivery attempt.")
+    )
 
     class Meta:
         ordering = (
@@ -170,3 +213,65 @@ class EventResponse(Timestamped):
 
     def __str__(self) -> str:
         return "{} {}".format(self.subscription, self.response_status or self.exception)
+
+
+# Deliveries which failed after all retries, kept for redelivery
+class DeadLetter(Timestamped):
+    event = models.ForeignKey("datamodel.Event", on_delete=models.CASCADE)
+    subscription = models.ForeignKey("datamodel.Subscription", on_delete=models.CASCADE)
+    exception = models.CharField(max_length=1000, blank=True)
+    response_status = models.IntegerField(null=True)
+    attempts = models.PositiveIntegerField(
+        help_text=_("Number of delivery attempts made.")
+    )
+
+    class Meta:
+        verbose_name = _("dead letter")
+        verbose_name_plural = _("dead letters")
+        ordering = ("-created_on",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=["event", "subscription"], name="unique_dead_letter"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return "{} {}".format(self.subscription, self.response_status or self.exception)
+
+
+# Events queued for the next batch of a subscription receiving batches
+class PendingDelivery(Timestamped):
+    event = models.ForeignKey("datamodel.Event", on_delete=models.CASCADE)
+    subscription = models.ForeignKey("datamodel.Subscription", on_delete=models.CASCADE)
+    attempt = models.PositiveIntegerField(
+        default=1, help_text=_("Number of the delivery attempt.")
+    )
+    available_on = models.DateTimeField(
+        default=timezone.now,
+        help_text=_(
+            "Time from which the delivery is sent in a batch. Later while the "
+            "delivery is claimed by a batch being sent, or waits for its retry."
+        ),
+    )
+
+    class Meta:
+        verbose_name = _("pending delivery")
+        verbose_name_plural = _("pending deliveries")
+        ordering = ("created_on",)
+
+    def __str__(self) -> str:
+        return f"{self.subscription} {self.event}"
+
+
+# Events to publish to the broker, written in the transaction creating the event
+class OutboxEntry(models.Model):
+    event = models.ForeignKey("datamodel.Event", on_delete=models.CASCADE)
+    created_on = models.DateTimeField(_("Aanmaakdatum"), default=timezone.now)
+
+    class Meta:
+        verbose_name = _("outbox entry")
+        verbose_name_plural = _("outbox entries")
+        ordering = ("pk",)
+
+    def __str__(self) -> str:
+        return f"{self.event}"
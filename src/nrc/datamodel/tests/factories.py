@@ -1,6 +1,8 @@
 import factory
 import factory.fuzzy
 
+from nrc.datamodel.choices import VerificationStatusChoices
+
 
 class SubscriptionFactory(factory.django.DjangoModelFactory):
     uuid = factory.Faker("uuid4")
@@ -9,6 +11,9 @@ class SubscriptionFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = "datamodel.Subscription"
 
+    class Params:
+        verified = factory.Trait(verification_status=VerificationStatusChoices.verified)
+
 
 class DomainFactory(factory.django.DjangoModelFactory):
     name = factory.Faker("word")
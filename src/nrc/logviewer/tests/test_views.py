@@ -0,0 +1,23 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from nrc.datamodel.models import EventResponse
+from nrc.datamodel.tests.factories import EventFactory, SubscriptionFactory
+
+
+class LogListViewTests(TestCase):
+    def test_delivery_counters(self):
+        events = EventFactory.create_batch(
+            3, forwarded_msg={}, responses_total=4, responses_failed=1
+        )
+        EventResponse.objects.create(
+            event=events[0], subscription=SubscriptionFactory.create()
+        )
+
+        # the page and the count of the pagination, without aggregating the
+        # responses
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("logviewer:event_log"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "(1 mislukt)", count=3)
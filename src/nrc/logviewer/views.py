@@ -1,4 +1,3 @@
-from django.db.models import Count
 from django.views.generic.list import ListView
 
 from nrc.datamodel.models import Event, EventResponse
@@ -6,9 +5,9 @@ from nrc.datamodel.models import Event, EventResponse
 
 class LogListView(ListView):
     template_name = "notifications/logviewer/notificatie-list.html"
-    queryset = Event.objects.annotate(
-        nr_of_subscribers=Count("eventresponse")
-    ).order_by("-id")
+    # the delivery counters of the events are used instead of counting the
+    # responses
+    queryset = Event.objects.select_related("domain").order_by("-id")
     context_object_name = "log"
 
     paginate_by = 10
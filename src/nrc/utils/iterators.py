@@ -0,0 +1,14 @@
+from itertools import islice
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Split the iterable in lists of (at most) the given size, lazily
+    """
+    iterator = iter(iterable)
+
+    while chunk := list(islice(iterator, size)):
+        yield chunk
@@ -0,0 +1,124 @@
+"""
+Fast JSON encoding and decoding.
+
+orjson is used when it is installed and selected with ``settings.JSON_BACKEND``,
+the standard library otherwise. Both backends represent dates, times, decimals
+and UUIDs the same way as the Django JSON encoder.
+"""
+import json
+import re
+from typing import Any, Callable, Union
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+_django_encoder = DjangoJSONEncoder()
+
+
+def get_backend() -> str:
+    if orjson is not None and settings.JSON_BACKEND == "orjson":
+        return "orjson"
+
+    return "json"
+
+
+def dumps(obj: Any, default: Callable[[Any], Any] = None) -> bytes:
+    """
+    Encode the object as compact UTF-8 JSON.
+
+    `default` is called for objects which can not be encoded natively, the
+    Django JSON encoder is used when it is not given.
+    """
+    default = default or _django_encoder.default
+
+    if get_backend() == "orjson":
+        try:
+            return orjson.dumps(
+                obj, default=default, option=orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        except orjson.JSONEncodeError:
+            # e.g. integers exceeding 64 bits, which are supported by the
+            # standard library
+            pass
+
+    return json.dumps(
+        obj, default=default, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+def _reject_constant(name: str) -> Any:
+    raise ValueError(f"Out of range float value {name}")
+
+
+# runs of 19 digits or more are integers which might not fit in 64 bits. The
+# runs are found with bytes operations, as a regular expression search over
+# the whole input takes longer than decoding it with orjson.
+_digits = bytes.maketrans(b"123456789", b"000000000")
+_digit_run = b"0" * 19
+_zeros = re.compile(rb"0*")
+
+# digits inside strings, like the OIN in a source, are mostly not delimited
+# like a number
+_before_number = {b"", b" ", b"\t", b"\n", b"\r", b":", b",", b"["}
+_after_number = {b"", b" ", b"\t", b"\n", b"\r", b",", b"]", b"}"}
+
+
+def _has_large_integer(data: Union[bytes, str]) -> bool:
+    if isinstance(data, str):
+        data = data.encode()
+
+    runs = data.translate(_digits)
+    start = runs.find(_digit_run)
+
+    while start != -1:
+        end = _zeros.match(runs, start).end()
+        if data[start - 1 : start] == b"-":
+            start -= 1
+
+        if (
+            data[max(start - 1, 0) : start] in _before_number
+            and data[end : end + 1] in _after_number
+        ):
+            return True
+
+        start = runs.find(_digit_run, end)
+
+    return False
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Decode the JSON, rejecting NaN and infinity like the strict JSON parser of
+    DRF
+    """
+    if get_backend() == "orjson":
+        # orjson decodes integers exceeding 64 bits as floats, the standard
+        # library decodes them exactly. The input is checked instead of the
+        # decoded values, which would take longer than decoding.
+        if not _has_large_integer(data):
+            return orjson.loads(data)
+
+    return json.loads(data, parse_constant=_reject_constant)
+
+
+class JSONEncoder(DjangoJSONEncoder):
+    """
+    Encoder for model JSON fields, using the selected backend
+    """
+
+    def encode(self, o):
+        return dumps(o).decode()
+
+
+class JSONDecoder(json.JSONDecoder):
+    """
+    Decoder for model JSON fields, using the selected backend
+    """
+
+    def decode(self, s, *args, **kwargs):
+        return loads(s)
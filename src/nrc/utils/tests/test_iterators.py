@@ -0,0 +1,18 @@
+from django.test import SimpleTestCase
+
+from ..iterators import chunked
+
+
+class ChunkedTests(SimpleTestCase):
+    def test_chunked(self):
+        self.assertEqual(list(chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(chunked(range(4), 2)), [[0, 1], [2, 3]])
+        self.assertEqual(list(chunked([], 2)), [])
+
+    def test_chunked_lazy(self):
+        def generate():
+            yield 1
+            yield 2
+            raise AssertionError("consumed too far")
+
+        self.assertEqual(next(chunked(generate(), 2)), [1, 2])
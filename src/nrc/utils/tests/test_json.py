@@ -0,0 +1,138 @@
+import json
+import os
+import timeit
+from datetime import datetime
+from decimal import Decimal
+from unittest import skipIf, skipUnless
+from uuid import UUID
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+
+from ..json import _has_large_integer, dumps, get_backend, loads, orjson
+
+# a CloudEvent as published by a ZRC
+EVENT = {
+    "id": "f347fd1f-dac1-4870-9dd0-f6c00edf4bf7",
+    "specversion": "1.0",
+    "source": "urn:nld:oin:00000001234567890000:systeem:Zaaksysteem",
+    "domain": "nl.vng.zaken",
+    "type": "nl.vng.zaken.status_gewijzigd",
+    "time": "2022-03-16T15:29:30.833664Z",
+    "subscription": "4d1ad6e5-5b4b-4c7e-b2b8-9ee5c5b7a9a6",
+    "datacontenttype": "application/json",
+    "dataschema": "https://vng.nl/zgw/zaken/status_gewijzigd_schema.json",
+    "sequence": "42",
+    "sequencetype": "Integer",
+    "bronorganisatie": "000000000",
+    "zaaktype": "https://ztc.example.com/api/v1/zaaktypen/1",
+    "data": {
+        "url": "https://zrc.example.com/api/v1/zaken/1",
+        "identificatie": "ZAAK-2022-0000000001",
+        "omschrijving": "Aanvraag evenementenvergunning",
+        "toelichting": "Een zaak met speciale tekens: é, ü, ß en €",
+        "registratiedatum": "2022-03-16",
+        "startdatum": "2022-03-16",
+        "kenmerken": [
+            {"kenmerk": f"kenmerk-{i}", "bron": "Zaaksysteem"} for i in range(20)
+        ],
+        "statussen": [
+            f"https://zrc.example.com/api/v1/statussen/{i}" for i in range(20)
+        ],
+    },
+}
+
+
+class JSONCodecTests(SimpleTestCase):
+    values = {
+        "datetime": timezone.make_aware(datetime(2022, 3, 16, 15, 29, 30, 833664)),
+        "uuid": UUID("f347fd1f-dac1-4870-9dd0-f6c00edf4bf7"),
+        "decimal": Decimal("1.10"),
+        "text": "speciale tekens: é en €",
+    }
+
+    def test_backends_encode_like_django(self):
+        expected = json.loads(json.dumps(self.values, cls=DjangoJSONEncoder))
+
+        for backend in ("orjson", "json"):
+            with self.subTest(backend=backend), override_settings(JSON_BACKEND=backend):
+                self.assertEqual(loads(dumps(self.values)), expected)
+
+    def test_roundtrip(self):
+        for backend in ("orjson", "json"):
+            with self.subTest(backend=backend), override_settings(JSON_BACKEND=backend):
+                self.assertEqual(loads(dumps(EVENT)), EVENT)
+
+    def test_large_integer_fallback(self):
+        data = {"values": [2**70 + 1, -(2**63) - 1, 1.5e300, 2**64 - 1]}
+
+        for backend in ("orjson", "json"):
+            with self.subTest(backend=backend), override_settings(JSON_BACKEND=backend):
+                self.assertEqual(loads(dumps(data)), data)
+
+    def test_large_integer_detected(self):
+        for data in (
+            str(2**70 + 1),
+            f'{{"a": [1, {{"b": {-(2**63) - 1}}}]}}',
+            f'{{"a":{2**64 - 1}}}',
+        ):
+            with self.subTest(data=data):
+                self.assertTrue(_has_large_integer(data))
+                self.assertTrue(_has_large_integer(data.encode()))
+
+        for data in (
+            dumps(EVENT),
+            b'{"a": 123456789012345678}',
+            b'{"a": 12345678901234567890.5}',
+            b'{"a": "12345678901234567890"}',
+        ):
+            with self.subTest(data=data):
+                self.assertFalse(_has_large_integer(data))
+
+    def test_constants_rejected(self):
+        for backend in ("orjson", "json"):
+            for data in ('{"value": NaN}', '{"value": Infinity}', "-Infinity"):
+                with self.subTest(backend=backend, data=data), override_settings(
+                    JSON_BACKEND=backend
+                ):
+                    with self.assertRaises(ValueError):
+                        loads(data)
+
+    @override_settings(JSON_BACKEND="json")
+    def test_stdlib_backend(self):
+        self.assertEqual(get_backend(), "json")
+
+    # timings are unreliable on shared CI runners, run with RUN_BENCHMARKS=1
+    @skipIf(orjson is None, "orjson is not installed")
+    @skipUnless(os.getenv("RUN_BENCHMARKS"), "benchmarks are not enabled")
+    def test_backend_benchmark(self):
+        # a flat event, and a batch of nested events like a delivery log
+        payloads = {
+            "event": (dumps(EVENT), 1000),
+            "nested": (
+                dumps({"events": [{**EVENT, "responses": [EVENT["data"]] * 5}] * 50}),
+                20,
+            ),
+        }
+
+        for name, (body, number) in payloads.items():
+            results = {}
+
+            for backend in ("orjson", "json"):
+                with override_settings(JSON_BACKEND=backend):
+                    results[backend] = {
+                        operation: min(timeit.repeat(func, number=number, repeat=3))
+                        for operation, func in (
+                            ("loads", lambda: loads(body)),
+                            ("roundtrip", lambda: dumps(loads(body))),
+                        )
+                    }
+
+            # decoding checks the input for large integers, besides decoding
+            with self.subTest(payload=name, operation="loads"):
+                self.assertLess(results["orjson"]["loads"], results["json"]["loads"])
+            with self.subTest(payload=name, operation="roundtrip"):
+                self.assertLess(
+                    results["orjson"]["roundtrip"] * 2, results["json"]["roundtrip"]
+                )